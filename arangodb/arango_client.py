@@ -1,13 +1,98 @@
 from __future__ import annotations
 
-import json
+import hashlib
 import logging
-from typing import Callable
+import math
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING, Callable, TypeVar
 
-import requests
-from arango import ArangoClient as ArangoDbClient
 from arango.database import StandardDatabase
 
+from arangodb.checksum_cache import ChecksumCache
+from arangodb.http_pool import shared_database
+from arangodb.parallel_scan import ParallelScan
+from arangodb.settings import (
+    COMPARE_TIERS,
+    DEFAULT_BACKOFF_FACTOR,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_REQUEST_TIMEOUT,
+    DEFAULT_RETRY_ATTEMPTS,
+)
+from diff.document_diff import DEFAULT_EXCLUDED_FIELDS, document_hash, fingerprints_checksum
+from diff.excluded_fields import ExcludedFields
+from diff.sample_diff import SampleDiff, SampleEstimate, SampleSize
+from metrics import METRICS
+
+if TYPE_CHECKING:
+    from arangodb.dump_client import DumpClient
+    from arangodb.fingerprint_index import FingerprintIndex
+
+
+# Half-open `_key` range [from, to), None means unbounded.
+KeyRange = tuple[str | None, str | None]
+FULL_RANGE: KeyRange = (None, None)
+# ArangoDB error number of a missing document.
+DOCUMENT_NOT_FOUND = 1202
+KEY_RANGE_FILTER = "(@lower == null OR d._key >= @lower) AND (@upper == null OR d._key < @upper)"
+# Attributes never removed from the documents sent by the server, the diffs and the fingerprint index need them.
+KEPT_FIELDS = frozenset(("_key", "_id", "_rev"))
+# Keys sampled per part by `get_key_boundaries`, the parts are of the same size within a few percent.
+BOUNDARY_SAMPLES_PER_PART = 64
+# Numbers of 24 bits taken from the SHA1 of every document and summed per range by `get_range_hashes`.
+RANGE_HASH_PARTS = 4
+HEX_BYTES = {f"{i:02x}": i for i in range(256)}
+# Documents per range a collection is split into before it is hashed by ranges.
+RANGE_BUCKET_SIZE = 100000
+MAX_RANGE_BUCKETS = 4096
+RANGE_SUMS = ", ".join(
+    f"p{i} = SUM(TRANSLATE(SUBSTRING(h, {6 * i}, 2), @hex) * 65536 + TRANSLATE(SUBSTRING(h, {6 * i + 2}, 2), @hex) * 256"
+    f" + TRANSLATE(SUBSTRING(h, {6 * i + 4}, 2), @hex))"
+    for i in range(RANGE_HASH_PARTS)
+)
+
+T = TypeVar("T")
+
+
+def range_hash(sums: Iterable[int]) -> dict:
+    """Returns `{"count": int, "hash": str}` of a range from its document count and sums, see `ArangoClient.get_range_sums`."""
+    sums = list(sums)
+    return {"count": sums[0], "hash": hashlib.sha1(":".join(map(str, sums)).encode()).hexdigest()}
+
+
+def sample_boundaries(sample: list[str], parts: int) -> list[str]:
+    """Returns up to `parts - 1` keys splitting the sorted sample into parts of the same size, without repeats."""
+    indexes = (len(sample) * i // parts for i in range(1, parts))
+    return list(dict.fromkeys(sample[i] for i in indexes if i > 0))
+
+
+class SharedChecks:
+    """
+    Results of the checks of one side of a comparison, shared by the comparisons of that side with several targets.
+    Every check runs once, a thread asking for a check which is running waits for its result.
+    """
+
+    def __init__(self):
+        self.__results: dict[tuple, Future] = {}
+        self.__lock = threading.Lock()
+
+    def get(self, key: tuple, check: Callable[[], T]) -> T:
+        with self.__lock:
+            future = self.__results.get(key)
+            owner = future is None
+            if owner:
+                future = self.__results[key] = Future()
+
+        if owner:
+            try:
+                future.set_result(check())
+            except Exception as ex:
+                future.set_exception(ex)
+        return future.result()
+
 
 class ArangoClient:
     """
@@ -20,6 +105,11 @@ class ArangoClient:
         password (str, optional): The password for authentication.
         need_auth (bool, optional): Whether authentication
                                     is required. Defaults to True.
+        pool_size (int, optional): Number of keep-alive connections to the server, shared by all clients of the server.
+        request_timeout (float, optional): Seconds to wait for a response.
+        retry_attempts (int, optional): Number of retries of failed idempotent requests.
+        backoff_factor (float, optional): Backoff factor of the retries.
+        auth_method (str, optional): `jwt` to authenticate with a JWT shared by the process, `basic` to send the password.
     """
 
     def __init__(
@@ -29,56 +119,282 @@ class ArangoClient:
         username: str | None = None,
         password: str | None = None,
         need_auth: bool = True,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        retry_attempts: int = DEFAULT_RETRY_ATTEMPTS,
+        backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+        auth_method: str = "jwt",
     ):
         self.__url = url
         self.__database = database
         self.__username = username
         self.__password = password
         self.__need_auth = need_auth
-        self.__token = None
-        self.__db = ArangoDbClient(self.__url).db(self.__database, username=self.__username, password=self.__password)
+        self.__db = shared_database(
+            self.__url,
+            self.__database,
+            self.__username,
+            self.__password,
+            pool_size,
+            request_timeout,
+            retry_attempts,
+            backoff_factor,
+            auth_method if need_auth else "basic",
+        )
         self.logger = logging.getLogger("rich")
+        self.checksum_cache: ChecksumCache | None = None
+        self.fingerprint_index: FingerprintIndex | None = None
 
     @property
     def get_database(self):
         return self.__db
 
-    def compare_collections(self, other: ArangoClient, on_collection_compared: Callable[[], None]) -> list:
+    def compare_collections(
+        self,
+        other: ArangoClient | DumpClient,
+        on_collection_compared: Callable[[], None],
+        jobs: int = 1,
+        tier: str = "data",
+        shared: SharedChecks | None = None,
+        excluded: ExcludedFields | None = None,
+    ) -> list:
         """
         Compare the collections of this object with the collections of another object.
+        Collections are compared in tiers from the cheapest to the most expensive one, a collection goes to the next tier
+        only while the earlier tiers find no difference: `metadata` compares the type, the count and the properties,
+        `keys` the checksums of the keys, `data` the checksums of the whole documents.
+        Both sides of a collection are checked at the same time, `jobs` collections at once, the largest collections are scheduled first.
         Args:
-            other (ArangoClient): Another object to compare collections with.
-            on_collection_compared (Callable): A callback function to be called for each collection compared.
+            other (ArangoClient | DumpClient): Another object to compare collections with, a database or a dump.
+            on_collection_compared (Callable): A callback function to be called for each collection compared,
+                                               called in the collections order.
+            jobs (int): Number of collections compared at the same time.
+            tier (str): The last tier, collections which do not differ up to it are taken as equal.
+            shared (SharedChecks, optional): Checks of this side shared with the comparisons against other targets.
+            excluded (ExcludedFields, optional): Attributes left out of the `data` tier. A collection with attributes
+                                                 excluded beyond the default ones is compared by `content_hash` instead of `checksum`.
         Returns:
-            booL: True if the collections are equal, False otherwise.
+            list: The mismatched collections, the collections to create and the collections to delete.
+        """
+        return ArangoClient.compare_clients(self, other, on_collection_compared, jobs, tier, shared, excluded)
+
+    @staticmethod
+    def compare_clients(
+        reference: ArangoClient | DumpClient,
+        compared: ArangoClient | DumpClient,
+        on_collection_compared: Callable[[], None],
+        jobs: int = 1,
+        tier: str = "data",
+        shared: SharedChecks | None = None,
+        excluded: ExcludedFields | None = None,
+    ) -> list:
         """
-        self_collections = self.get_all_collections()
-        other_collections = other.get_all_collections()
+        Compare the collections of two databases or dumps, see `compare_collections`.
+        Two databases are compared by the server checksums, a dump can only be compared by the checksums calculated on the client.
+        """
+        if tier not in COMPARE_TIERS:
+            raise Exception(f"Unknown tier {tier}, expected one of {', '.join(COMPARE_TIERS)}")
+
+        shared = shared or SharedChecks()
+        excluded = excluded or ExcludedFields()
+        self_collections = shared.get(("collections",), reference.get_all_collections)
+        other_collections = compared.get_all_collections()
 
         mismatches = []
         if len(self_collections) != len(other_collections):
-            self.logger.info(f"Collection count mismatch. {len(self_collections)} != {len(other_collections)}")
+            reference.logger.info(f"Collection count mismatch. {len(self_collections)} != {len(other_collections)}")
+
+        collections = [c for c in self_collections if c["name"] != "migrations"]
+        other_types = {c["name"]: c["type"] for c in other_collections}
+        databases = isinstance(reference, ArangoClient) and isinstance(compared, ArangoClient)
+        self_checks = ArangoClient.__tier_checks(reference, databases, excluded)
+        other_checks = ArangoClient.__tier_checks(compared, databases, excluded)
+        tiers = COMPARE_TIERS[: COMPARE_TIERS.index(tier) + 1]
+
+        def mismatched_tier(collection: dict) -> str | None:
+            """Returns the first tier the collection differs on, None if it does not differ up to the last tier."""
+            name = collection["name"]
+            if name not in other_types:
+                return None
+            if other_types[name] != collection["type"]:
+                return "metadata"
+
+            for current in tiers:
+                other = other_pool.submit(other_checks[current], name)
+                own = shared.get((current, name, databases), partial(self_checks[current], name))
+                if not ArangoClient.__same(current, own, other.result()):
+                    return current
+            return None
+
+        with ThreadPoolExecutor(max_workers=jobs) as self_pool, ThreadPoolExecutor(max_workers=jobs) as other_pool:
+            results = {}
+            for collection in ArangoClient.__order_by_size(reference, collections, jobs, self_pool):
+                results[collection["name"]] = self_pool.submit(mismatched_tier, collection)
+
+            for collection in collections:
+                mismatched = results[collection["name"]].result()
+                if mismatched is not None:
+                    reference.logger.debug(f'Collection {collection["name"]} differs on the {mismatched} tier')
+                    mismatches.append(collection)
+
+                on_collection_compared()
+
+        collection_for_create_or_delete = ArangoClient.__get_collections_for_remove_and_for_crete(other_collections, self_collections)
 
-        for collection in self_collections:
-            if collection["name"] == "migrations":
-                continue
+        return [mismatches, collection_for_create_or_delete["create"], collection_for_create_or_delete["delete"]]
 
-            self_checksum = self.__db.collection(collection["name"]).checksum(
-                with_rev=False,
-                with_data=True,
+    @staticmethod
+    def sample_clients(
+        reference: ArangoClient | DumpClient,
+        compared: ArangoClient | DumpClient,
+        sample: SampleSize,
+        on_collection_compared: Callable[[], None],
+        jobs: int = 1,
+        seed: int = 0,
+        excluded: ExcludedFields | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> list:
+        """
+        Estimates the drift of the collections of two databases or dumps from a sample of their documents, see `SampleDiff`.
+        The approximate counterpart of `compare_clients`, no checksum is calculated and only the sampled documents are read.
+        Returns:
+            list: The estimates of the collections on both sides, the collections to create and the collections to delete.
+        """
+        excluded = excluded or ExcludedFields()
+        self_collections = reference.get_all_collections()
+        other_collections = compared.get_all_collections()
+        other_names = {c["name"] for c in other_collections}
+        collections = [c for c in self_collections if c["name"] != "migrations" and c["name"] in other_names]
+
+        def estimate(collection: dict) -> SampleEstimate:
+            name = collection["name"]
+            with METRICS.phase("sample", name):
+                return SampleDiff(reference, compared, name, sample, seed, excluded.of(name), batch_size).estimate()
+
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(estimate, c) for c in collections]
+            estimates = []
+            for future in futures:
+                estimates.append(future.result())
+                on_collection_compared()
+
+        collection_for_create_or_delete = ArangoClient.__get_collections_for_remove_and_for_crete(other_collections, self_collections)
+
+        return [estimates, collection_for_create_or_delete["create"], collection_for_create_or_delete["delete"]]
+
+    @staticmethod
+    def __tier_checks(client: ArangoClient | DumpClient, databases: bool, excluded: ExcludedFields) -> dict[str, Callable[[str], object]]:
+        """
+        What is compared on every tier, server checksums if both sides are databases.
+        The built-in checksum covers all attributes, it is replaced by a content hash without the excluded attributes.
+        """
+
+        def data(name: str) -> str:
+            if not databases:
+                return client.content_checksum(name, excluded.of(name))
+            if excluded.is_default(name):
+                return client.checksum(name)
+            return client.content_hash(name, excluded.of(name))
+
+        return {
+            "metadata": client.metadata,
+            "keys": (lambda name: client.checksum(name, with_data=False)) if databases else client.key_checksum,
+            "data": data,
+        }
+
+    @staticmethod
+    def __same(tier: str, left: object, right: object) -> bool:
+        if tier == "metadata":
+            # A dump has no collection properties, only what both sides describe is compared.
+            return all(left[k] == right[k] for k in left.keys() & right.keys())
+        return left == right
+
+    def metadata(self, collection_name: str) -> dict:
+        """Returns the count and the properties of the collection which must be equal in equal collections."""
+        with METRICS.phase("metadata", collection_name):
+            properties = self.__db.collection(collection_name).properties()
+            key_options = properties.get("key_options", {})
+            return {
+                "count": self.count(collection_name),
+                "schema": properties.get("schema"),
+                "computed_values": properties.get("computedValues"),
+                "key_generator": key_options.get("key_generator"),
+                "user_keys": key_options.get("user_keys"),
+            }
+
+    def key_checksum(self, collection_name: str) -> str:
+        """Returns the checksum of the keys calculated on the client, only the keys are downloaded. See `content_checksum`."""
+        with METRICS.phase("key_checksum", collection_name):
+            documents = self.iter_documents(collection_name, fields=["_key"])
+            return fingerprints_checksum((d["_key"], "") for d in documents)
+
+    def content_checksum(self, collection_name: str, excluded_fields: Iterable[str] = DEFAULT_EXCLUDED_FIELDS) -> str:
+        """
+        Returns the checksum of the documents content without the excluded attributes, calculated on the client.
+        Unlike `checksum` it can be compared with a dump, but all documents are downloaded, the excluded attributes are not sent.
+        """
+        with METRICS.phase("checksum", collection_name):
+            documents = self.iter_documents(collection_name, excluded_fields=excluded_fields)
+            return fingerprints_checksum((d["_key"], document_hash(d, excluded_fields)) for d in documents)
+
+    def content_hash(self, collection_name: str, excluded_fields: Iterable[str] = DEFAULT_EXCLUDED_FIELDS) -> str:
+        """
+        Returns the hash of the documents content without the excluded attributes, calculated on the server.
+        It stands in for `checksum` when attributes are excluded, only the hash is sent. Cached like `checksum`.
+        The collection is hashed by ranges of `RANGE_BUCKET_SIZE` documents, their sums add up to those of the collection,
+        so the hash does not depend on where the ranges of either server end. See `get_range_sums`.
+        """
+        excluded_fields = sorted({"_rev", *excluded_fields})
+
+        def calculate() -> str:
+            parts = min(MAX_RANGE_BUCKETS, math.ceil(self.count(collection_name) / RANGE_BUCKET_SIZE))
+            sums = self.get_range_sums(collection_name, self.get_key_ranges(collection_name, parts), excluded_fields)
+            return range_hash(map(sum, zip(*sums)))["hash"]
+
+        with METRICS.phase("content_hash", collection_name):
+            return self.__cached(collection_name, f"hash:{','.join(excluded_fields)}", calculate)
+
+    def checksum(self, collection_name: str, with_data: bool = True) -> str:
+        """
+        Returns the checksum of the collection data, revisions are not taken into account. Only of the keys if not `with_data`.
+        With a `checksum_cache` the checksum is calculated only if the collection revision or count changed since it was cached.
+        """
+        with METRICS.phase("checksum" if with_data else "key_checksum", collection_name):
+            return self.__cached(
+                collection_name,
+                "data" if with_data else "keys",
+                lambda: self.__db.collection(collection_name).checksum(with_rev=False, with_data=with_data),
             )
 
-            other_checksum = other.__db.collection(collection["name"]).checksum(with_rev=False, with_data=True)
+    def __cached(self, collection_name: str, kind: str, calculate: Callable[[], str]) -> str:
+        """Returns the cached checksum of the kind while the collection revision and count are unchanged, calculates it otherwise."""
+        if self.checksum_cache is None:
+            return calculate()
 
-            if self_checksum != other_checksum:
-                self.logger.debug(f'Collection {collection["name"]} checksum mismatch. {self_checksum} != {other_checksum}')
-                mismatches.append(collection)
+        revision = self.revision(collection_name)
+        count = self.count(collection_name)
+        checksum = self.checksum_cache.get(self.__url, self.__database, collection_name, revision, count, kind)
+        if checksum is None:
+            checksum = calculate()
+            self.checksum_cache.put(self.__url, self.__database, collection_name, revision, count, checksum, kind)
+        return checksum
 
-            on_collection_compared()
+    def revision(self, collection_name: str) -> str:
+        """Returns the revision of the collection, it changes on every write to the collection."""
+        return self.__db.collection(collection_name).revision()
 
-        collection_for_create_or_delete = self.__get_collections_for_remove_and_for_crete(other_collections, self_collections)
+    def count(self, collection_name: str) -> int:
+        """Returns the number of documents in the collection."""
+        return self.__db.collection(collection_name).count()
 
-        return [mismatches, collection_for_create_or_delete["create"], collection_for_create_or_delete["delete"]]
+    @staticmethod
+    def __order_by_size(client: ArangoClient | DumpClient, collections: list[dict], jobs: int, pool: ThreadPoolExecutor) -> list[dict]:
+        """Returns the collections ordered from the largest to the smallest, keeps the order if there is nothing to schedule."""
+        if jobs < 2:
+            return collections
+
+        counts = pool.map(lambda c: client.count(c["name"]), collections)
+        return [c for _, c in sorted(zip(counts, collections, strict=True), key=lambda x: x[0], reverse=True)]
 
     def get_all_collections(self, sort_by_id: bool = True) -> list:
         """
@@ -88,67 +404,318 @@ class ArangoClient:
         Raise:
             Exception: If the request fails.
         """
-        collections = self.__db.collections()
+        with METRICS.phase("collections"):
+            collections = self.__db.collections()
 
         if sort_by_id:
             collections.sort(key=lambda x: int(x.get("id", 0)))
 
         return list(filter(lambda x: "_" not in x.get("name", False), collections))
 
-    def get_all_documents(self, collection_name: str) -> list:
-        documents = []
-        cursor = self.__db.collection(collection_name).all()
+    def get_all_documents(
+        self,
+        collection_name: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        fields: list[str] | None = None,
+        key_range: KeyRange = FULL_RANGE,
+        parallel: int = 1,
+    ) -> list:
+        """
+        Returns all documents of the collection ordered by `_key`.
+        Prefer `iter_documents` for big collections, this one keeps the whole collection in memory.
+        """
+        return list(self.iter_documents(collection_name, batch_size, fields, key_range, parallel))
 
-        while not cursor.empty():
-            documents.append(cursor.pop())
-        cursor.close()
-        documents.sort(key=lambda x: str(x.get("_id", 0)))
-        return documents
+    def iter_documents(
+        self,
+        collection_name: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        fields: list[str] | None = None,
+        key_range: KeyRange = FULL_RANGE,
+        parallel: int = 1,
+        ordered: bool = True,
+        excluded_fields: Iterable[str] | None = None,
+    ) -> Iterator[dict]:
+        """
+        Streams documents of the collection ordered by `_key`.
+        Documents are fetched from the server in batches, so only one batch is held in memory at a time.
+        With `parallel` > 1 big collections are split into key ranges which are read on their own cursors at the same time.
 
-    def __get_headers(self) -> dict:
+        Args:
+            collection_name (str): The name of the collection.
+            batch_size (int): Number of documents fetched by the cursor in one round trip.
+            fields (list[str], optional): Attributes to keep. `_key` and `_id` are always kept. All attributes if None.
+            key_range (KeyRange): Only documents with `_key` in the range. The whole collection by default.
+            parallel (int): Number of cursors reading the collection at the same time.
+            ordered (bool): Keep the `_key` order of the parallel cursors. The documents come as soon as they are read if False.
+            excluded_fields (Iterable[str], optional): Attributes removed on the server, `_key`, `_id` and `_rev` are always kept.
         """
-        Return a dictionary of headers for the request.
+        if parallel > 1 and self.count(collection_name) >= parallel * batch_size:
+            ranges = self.get_key_ranges(collection_name, parallel, key_range)
+            yield from ParallelScan(
+                lambda r: self.iter_documents(collection_name, batch_size, fields, r, excluded_fields=excluded_fields),
+                ranges,
+                ordered,
+                batch_size,
+            )
+            return
 
-        Returns:
-            dict: A dictionary containing the headers for the request.
-            The keys are the header names and the values are the header values.
+        scan = self.__scan(collection_name, batch_size, fields, key_range, excluded_fields)
+        yield from METRICS.timed(scan, "fetch", collection_name)
 
-        Example:
-            >>> __get_headers()
-            {'accept': 'application/json', 'authorization': 'some_authorization_token'}
+    def __scan(
+        self,
+        collection_name: str,
+        batch_size: int,
+        fields: list[str] | None,
+        key_range: KeyRange,
+        excluded_fields: Iterable[str] | None = None,
+    ) -> Iterator[dict]:
+        """Reads the documents of the range on one cursor, the query is sent on the first `next`."""
+        bind_vars = {"@collection": collection_name, "fields": None, "unset": [], "lower": key_range[0], "upper": key_range[1]}
+        if fields is not None:
+            bind_vars["fields"] = sorted({"_key", "_id", *fields})
+        if excluded_fields is not None:
+            bind_vars["unset"] = sorted(set(excluded_fields) - KEPT_FIELDS)
+
+        with self.__db.aql.execute(
+            f"FOR d IN @@collection FILTER {KEY_RANGE_FILTER} SORT d._key RETURN @fields == null ? UNSET(d, @unset) : KEEP(d, @fields)",
+            bind_vars=bind_vars,
+            batch_size=batch_size,
+            stream=True,
+        ) as cursor:
+            yield from cursor
+
+    def iter_revisions(self, collection_name: str, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[tuple[str, str]]:
+        """Streams `(key, _rev)` of the documents ordered by `_key`, the document bodies are not sent."""
+        return METRICS.timed(self.__revisions(collection_name, batch_size), "revisions", collection_name)
+
+    def __revisions(self, collection_name: str, batch_size: int) -> Iterator[tuple[str, str]]:
+        with self.__db.aql.execute(
+            "FOR d IN @@collection SORT d._key RETURN [d._key, d._rev]",
+            bind_vars={"@collection": collection_name},
+            batch_size=batch_size,
+            stream=True,
+        ) as cursor:
+            yield from map(tuple, cursor)
+
+    def iter_fingerprints(
+        self,
+        collection_name: str,
+        excluded_fields: Iterable[str] = DEFAULT_EXCLUDED_FIELDS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        parallel: int = 1,
+    ) -> Iterator[tuple[str, str]]:
+        """
+        Streams `(key, content hash)` of the documents ordered by `_key`.
+        With a `fingerprint_index` only the documents whose `_rev` changed since the last run are downloaded.
+        """
+        if self.fingerprint_index is None:
+            documents = self.iter_documents(collection_name, batch_size, parallel=parallel, excluded_fields=excluded_fields)
+            return ((d["_key"], document_hash(d, excluded_fields)) for d in documents)
+
+        return self.fingerprint_index.fingerprints(
+            self.__url,
+            self.__database,
+            collection_name,
+            excluded_fields,
+            self.iter_revisions(collection_name, batch_size),
+            partial(self.fetch_documents, collection_name),
+            partial(self.iter_documents, collection_name, batch_size, parallel=parallel, excluded_fields=excluded_fields),
+            batch_size,
+        )
+
+    def iter_sample(
+        self,
+        collection_name: str,
+        threshold: str | None,
+        seed: int = 0,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        excluded_fields: Iterable[str] | None = None,
+    ) -> Iterator[dict]:
         """
-        headers = {
-            "accept": "application/json",
+        Streams the documents of the sample ordered by `_key`, those whose SHA1 of the seed and the key starts below the threshold.
+        The keys are filtered on the server, only the sampled documents are sent. All documents if the threshold is None.
+        """
+        bind_vars = {
+            "@collection": collection_name,
+            "threshold": threshold,
+            "seed": str(seed),
+            "digits": len(threshold or ""),
+            "unset": sorted(set(excluded_fields or ()) - KEPT_FIELDS),
         }
+        return METRICS.timed(self.__sample(bind_vars, batch_size), "fetch", collection_name)
+
+    def __sample(self, bind_vars: dict, batch_size: int) -> Iterator[dict]:
+        with self.__db.aql.execute(
+            """
+            FOR d IN @@collection
+                FILTER @threshold == null OR LEFT(SHA1(CONCAT(@seed, ":", d._key)), @digits) < @threshold
+                SORT d._key
+                RETURN UNSET(d, @unset)
+            """,
+            bind_vars=bind_vars,
+            batch_size=batch_size,
+            stream=True,
+        ) as cursor:
+            yield from cursor
+
+    def fetch_documents(self, collection_name: str, keys: list[str]) -> dict[str, dict]:
+        """Returns the documents of the keys by key, in one query. Keys not in the collection are left out."""
+        if not keys:
+            return {}
+
+        with METRICS.phase("fetch", collection_name):
+            cursor = self.__db.aql.execute(
+                "FOR d IN @@collection FILTER d._key IN @keys RETURN d",
+                bind_vars={"@collection": collection_name, "keys": keys},
+                batch_size=max(len(keys), 1),
+            )
+            documents = {d["_key"]: d for d in cursor}
+        METRICS.add_documents(len(documents), "fetch", collection_name)
+        return documents
 
-        if not self.__need_auth:
-            return headers
+    def get_key_ranges(self, collection_name: str, parts: int, key_range: KeyRange = FULL_RANGE) -> list[KeyRange]:
+        """Splits the range into up to `parts` ranges of the same size, in the key order."""
+        edges = [key_range[0], *self.get_key_boundaries(collection_name, parts, key_range), key_range[1]]
+        return list(zip(edges, edges[1:]))
 
-        headers["authorization"] = self.__authorise()
-        return headers
+    def get_key_boundaries(self, collection_name: str, parts: int, key_range: KeyRange = FULL_RANGE) -> list[str]:
+        """
+        Returns up to `parts - 1` keys splitting the documents of the range into parts of about the same size.
+        Only keys are read on the server, from the primary index. The boundaries are taken from a random sample of
+        `BOUNDARY_SAMPLES_PER_PART` keys per part, only the sample is held in memory and sent. A small range is sampled whole.
+        """
+        if parts < 2:
+            return []
+
+        with METRICS.phase("key_boundaries", collection_name):
+            cursor = self.__db.aql.execute(
+                f"""
+                LET total = FIRST(FOR d IN @@collection FILTER {KEY_RANGE_FILTER} COLLECT WITH COUNT INTO n RETURN n)
+                FOR d IN @@collection
+                    FILTER {KEY_RANGE_FILTER} AND RAND() * total < @samples
+                    SORT d._key
+                    RETURN d._key
+                """,
+                bind_vars={
+                    "@collection": collection_name,
+                    "samples": parts * BOUNDARY_SAMPLES_PER_PART,
+                    "lower": key_range[0],
+                    "upper": key_range[1],
+                },
+                stream=True,
+            )
+            return sample_boundaries(list(cursor), parts)
 
-    def __authorise(self) -> str:
+    def get_range_hashes(self, collection_name: str, key_ranges: list[KeyRange], excluded_fields: list[str]) -> list[dict]:
+        """
+        Returns `{"count": int, "hash": str}` of every range, calculated on the server.
+        The hash covers keys and contents of the documents without the excluded attributes, see `get_range_sums`.
         """
-        Authorizes the user.
+        return [range_hash(sums) for sums in self.get_range_sums(collection_name, key_ranges, excluded_fields)]
 
-        Returns:
-            str: The authorization token.
+    def get_range_sums(self, collection_name: str, key_ranges: list[KeyRange], excluded_fields: list[str]) -> list[list[int]]:
+        """
+        Returns `[count, *sums]` of every range, calculated on the server with a streaming aggregate, no range is held in memory.
+        Every document is hashed with SHA1 over its key and its top level attributes in the name order, as the same JSON on every
+        server version. `RANGE_HASH_PARTS` numbers of 24 bits are taken from the hash and summed, so the sums do not depend on
+        the document order and the sums of adjacent ranges add up to the sums of the joined range.
         """
-        if self.__token is None:
-            result = requests.post(
-                f"{self.__url}/_open/auth/",
-                headers={"accept": "application/json"},
-                json={"username": self.__username, "password": self.__password},
+        with METRICS.phase("range_hashes", collection_name):
+            cursor = self.__db.aql.execute(
+                f"""
+                FOR r IN @ranges
+                    LET sums = FIRST(
+                        FOR d IN @@collection
+                            FILTER (r[0] == null OR d._key >= r[0]) AND (r[1] == null OR d._key < r[1])
+                            LET names = ATTRIBUTES(UNSET(d, @excluded), false, true)
+                            LET h = SHA1(CONCAT(d._key, ":", JSON_STRINGIFY([names, names[* RETURN d[CURRENT]]])))
+                            COLLECT AGGREGATE count = COUNT(1), {RANGE_SUMS}
+                            RETURN [count, {", ".join(f"p{i}" for i in range(RANGE_HASH_PARTS))}]
+                    )
+                    RETURN sums
+                """,
+                bind_vars={
+                    "@collection": collection_name,
+                    "ranges": [list(r) for r in key_ranges],
+                    "excluded": list(excluded_fields),
+                    "hex": HEX_BYTES,
+                },
             )
+            return [[int(s or 0) for s in sums or [0] * (RANGE_HASH_PARTS + 1)] for sums in cursor]
+
+    def create_collection(self, collection_name: str, collection_type: str = "document") -> bool:
+        """Creates the collection unless it exists. Returns True if it was created."""
+        if self.__db.has_collection(collection_name):
+            return False
+        self.__db.create_collection(collection_name, edge=collection_type == "edge")
+        return True
+
+    def delete_collection(self, collection_name: str) -> bool:
+        """Deletes the collection if it exists. Returns True if it was deleted."""
+        return self.__db.delete_collection(collection_name, ignore_missing=True)
+
+    def import_documents(self, collection_name: str, documents: list[dict], on_duplicate: str = "error") -> dict:
+        """
+        Inserts the documents with one bulk import request, `_key` is kept and `_rev` is ignored.
+
+        Args:
+            collection_name (str): The name of the collection.
+            documents (list[dict]): The documents.
+            on_duplicate (str): What to do with documents whose `_key` exists: error, update, replace or ignore.
+
+        Raise:
+            Exception: If some documents were not imported.
+        """
+        with METRICS.phase("import", collection_name):
+            result = self.__db.collection(collection_name).import_bulk(documents, halt_on_error=False, on_duplicate=on_duplicate)
+        METRICS.add_documents(len(documents), "import", collection_name)
+        if result["errors"]:
+            raise Exception(f"{result['errors']} documents not imported into {collection_name}: {result.get('details', [])[:5]}")
+        return result
+
+    def update_documents(self, collection_name: str, documents: list[dict]) -> None:
+        """
+        Updates the documents by `_key` in one request. Attributes set to None are removed, objects are replaced, not merged.
+
+        Raise:
+            Exception: If a document was not updated.
+        """
+        with METRICS.phase("update", collection_name):
+            results = self.__db.collection(collection_name).update_many(documents, check_rev=False, merge=False, keep_none=False)
+        METRICS.add_documents(len(documents), "update", collection_name)
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            raise Exception(f"{len(errors)} documents not updated in {collection_name}: {errors[0]}")
+
+    def delete_documents(self, collection_name: str, keys: list[str]) -> None:
+        """
+        Deletes the documents by `_key` in one request, documents which do not exist are skipped.
+
+        Raise:
+            Exception: If a document was not deleted.
+        """
+        with METRICS.phase("delete", collection_name):
+            results = self.__db.collection(collection_name).delete_many([{"_key": key} for key in keys], check_rev=False)
+        METRICS.add_documents(len(keys), "delete", collection_name)
+        errors = [r for r in results if isinstance(r, Exception) and r.error_code != DOCUMENT_NOT_FOUND]
+        if errors:
+            raise Exception(f"{len(errors)} documents not deleted from {collection_name}: {errors[0]}")
+
+    def get_document(self, collection_name: str, key: str) -> dict | None:
+        return self.__db.collection(collection_name).get(key)
 
-        self.__token = json.loads(result.text)["jwt"]
-        return f"bearer {self.__token}"
+    def save_document(self, collection_name: str, document: dict) -> None:
+        """Inserts the document or replaces the one with the same `_key`."""
+        self.__db.collection(collection_name).insert(document, overwrite=True, silent=True)
 
     def get_db(self) -> StandardDatabase:
         return self.__db
 
+    @staticmethod
     def __get_collections_for_remove_and_for_crete(
-        self, left_collections: list[dict[str, str]], right_collections: list[dict[str, str]]
+        left_collections: list[dict[str, str]], right_collections: list[dict[str, str]]
     ) -> dict[str, list[dict[str, str]]]:
         return {
             "create": [x for x in left_collections if not any(i["name"] == x["name"] and i["type"] == x["type"] for i in right_collections)],
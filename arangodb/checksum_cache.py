@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+
+from arangodb.settings import DEFAULT_MAX_ENTRIES
+
+LOCAL_DIR = ".migrango"
+
+
+class ChecksumCache:
+    """
+    On-disk cache of collection checksums, an SQLite database in the `.migrango` directory next to `_connection.json`.
+    Checksums are keyed by the server URL, the database, the collection, the collection `revision()` and count,
+    so a cached checksum is returned only while the collection has not been written to.
+
+    Args:
+        path (str): The path to the cache database.
+        ttl (int, optional): Seconds after which a cached checksum is not used any more. No expiration if None.
+        max_entries (int): Number of checksums kept, the least recently used ones are evicted.
+    """
+
+    default_path = os.path.join(LOCAL_DIR, "checksum_cache.sqlite")
+
+    def __init__(self, path: str = default_path, ttl: int | None = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.__lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.__db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checksums (
+                url TEXT NOT NULL,
+                database TEXT NOT NULL,
+                collection TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                revision TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                checksum TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL,
+                PRIMARY KEY (url, database, collection, kind)
+            )
+            """
+        )
+
+    def get(self, url: str, database: str, collection: str, revision: str, count: int, kind: str = "data") -> str | None:
+        """Returns the cached checksum, None if there is none for the revision and count or it expired."""
+        with self.__lock:
+            row = self.__db.execute(
+                """
+                SELECT checksum, created_at FROM checksums
+                WHERE url = ? AND database = ? AND collection = ? AND kind = ? AND revision = ? AND count = ?
+                """,
+                (url, database, collection, kind, revision, count),
+            ).fetchone()
+            if row is None or (self.ttl is not None and row[1] < time.time() - self.ttl):
+                return None
+
+            self.__db.execute(
+                "UPDATE checksums SET used_at = ? WHERE url = ? AND database = ? AND collection = ? AND kind = ?",
+                (time.time(), url, database, collection, kind),
+            )
+            return row[0]
+
+    def put(self, url: str, database: str, collection: str, revision: str, count: int, checksum: str, kind: str = "data") -> None:
+        now = time.time()
+        with self.__lock:
+            self.__db.execute(
+                "INSERT OR REPLACE INTO checksums VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, database, collection, kind, revision, count, checksum, now, now),
+            )
+
+    def invalidate(self, url: str | None = None, database: str | None = None, collection: str | None = None) -> int:
+        """Removes the cached checksums matching all given arguments, everything if none is given. Returns the number removed."""
+        conditions = {"url": url, "database": database, "collection": collection}
+        where = " AND ".join(f"{column} = ?" for column, value in conditions.items() if value is not None) or "1 = 1"
+        with self.__lock:
+            return self.__db.execute(f"DELETE FROM checksums WHERE {where}", [v for v in conditions.values() if v is not None]).rowcount
+
+    def evict(self) -> int:
+        """Removes the expired checksums and the least recently used ones above `max_entries`. Returns the number removed."""
+        with self.__lock:
+            removed = 0
+            if self.ttl is not None:
+                removed += self.__db.execute("DELETE FROM checksums WHERE created_at < ?", (time.time() - self.ttl,)).rowcount
+            removed += self.__db.execute(
+                "DELETE FROM checksums WHERE rowid NOT IN (SELECT rowid FROM checksums ORDER BY used_at DESC LIMIT ?)",
+                (self.max_entries,),
+            ).rowcount
+            return removed
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__db.close()
@@ -2,8 +2,14 @@ from __future__ import annotations
 
 import json
 import os
+from typing import TYPE_CHECKING
 
-from arangodb.arango_client import ArangoClient
+from arangodb.settings import DEFAULT_BACKOFF_FACTOR, DEFAULT_POOL_SIZE, DEFAULT_REQUEST_TIMEOUT, DEFAULT_RETRY_ATTEMPTS
+from dump_manifest import DumpManifest
+
+if TYPE_CHECKING:
+    from arangodb.arango_client import ArangoClient
+    from arangodb.dump_client import DumpConnection
 
 
 class Connection:
@@ -17,12 +23,22 @@ class Connection:
         database: str,
         username: str | None = None,
         password: str | None = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        retry_attempts: int = DEFAULT_RETRY_ATTEMPTS,
+        backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+        auth_method: str = "jwt",
     ):
         self.name = name
         self.url = url
         self.database = database
         self.username = username
         self.password = password
+        self.pool_size = pool_size
+        self.request_timeout = request_timeout
+        self.retry_attempts = retry_attempts
+        self.backoff_factor = backoff_factor
+        self.auth_method = auth_method
 
     def save(self) -> Connection:
         """Save the connection."""
@@ -65,6 +81,16 @@ class Connection:
 
         return Connection(**connection)
 
+    @staticmethod
+    def resolve(name: str) -> Connection | DumpConnection:
+        """Get the connection by name, or a dump directory standing in for a connection."""
+        if os.path.isdir(name) and DumpManifest.exists(name):
+            from arangodb.dump_client import DumpConnection
+
+            return DumpConnection(name)
+
+        return Connection.get(name)
+
     @staticmethod
     def __check_file() -> None:
         if not os.path.exists(Connection.file_name):
@@ -84,6 +110,9 @@ class Connection:
         client.get_database.version()
 
     def get_client(self) -> ArangoClient:
+        # The python-arango stack is loaded only by commands which talk to the server.
+        from arangodb.arango_client import ArangoClient
+
         if self.client is None:
             self.client = ArangoClient(
                 url=self.url,
@@ -91,6 +120,11 @@ class Connection:
                 username=self.username,
                 password=self.password,
                 need_auth=self.username is not None and self.password is not None,
+                pool_size=self.pool_size,
+                request_timeout=self.request_timeout,
+                retry_attempts=self.retry_attempts,
+                backoff_factor=self.backoff_factor,
+                auth_method=self.auth_method,
             )
 
         return self.client
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import mmap
+import os
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from itertools import groupby
+
+from arangodb.arango_client import DEFAULT_BATCH_SIZE, FULL_RANGE, KEPT_FIELDS, ArangoClient, KeyRange, SharedChecks
+from diff.document_diff import DEFAULT_EXCLUDED_FIELDS, document_hash, fingerprints_checksum, key_order
+from diff.excluded_fields import ExcludedFields
+from diff.sample_diff import in_sample
+from dump_io import index_path, iter_dump_documents, open_dump_reader, read_dump_document
+from dump_manifest import DumpManifest
+
+
+def in_range(key: str, key_range: KeyRange) -> bool:
+    """The key is in the range in the server order of keys, see `key_order`."""
+    order = key_order(key)
+    return (key_range[0] is None or order >= key_order(key_range[0])) and (key_range[1] is None or order < key_order(key_range[1]))
+
+
+class IndexFile:
+    """
+    Index of a dump file, one `[key, content hash, offset, length]` line per document in the `_key` order of the server.
+    Keys are looked up by a binary search over the memory-mapped file, so the index is never loaded into memory.
+
+    Args:
+        path (str): The path to the index file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.__file = open(path, "rb")
+        size = os.fstat(self.__file.fileno()).st_size
+        self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b""
+
+    def __iter__(self) -> Iterator[list]:
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def find(self, key: str) -> list | None:
+        """Returns the index entry of the key, None if the key is not in the file."""
+        low, high = 0, len(self.__map)
+        order = key_order(key)
+        while low < high:
+            middle = (low + high) // 2
+            start = self.__map.rfind(b"\n", 0, middle) + 1
+            end = self.__map.find(b"\n", start)
+            end = len(self.__map) if end == -1 else end
+            entry = json.loads(self.__map[start:end])
+            if entry[0] == key:
+                return entry
+            if key_order(entry[0]) < order:
+                low = end + 1
+            else:
+                high = start
+        return None
+
+    def close(self) -> None:
+        if isinstance(self.__map, mmap.mmap):
+            self.__map.close()
+        self.__file.close()
+
+
+class DumpClient:
+    """
+    Read-only client over a dump directory written by `ExportManager`, usable in place of `ArangoClient` to compare offline.
+    The collections are described by the dump manifest, delta files of incremental dumps are layered on the base files.
+    Keys are looked up in the index files written with the dump, full documents are read only for the keys that are needed.
+
+    Args:
+        path (str): The dump directory.
+    """
+
+    def __init__(self, path: str):
+        if not DumpManifest.exists(path):
+            raise Exception(f"{path} is not a dump directory, {DumpManifest.file_name} not found")
+
+        self.path = path
+        self.manifest = DumpManifest.load(path)
+        self.logger = logging.getLogger("rich")
+        self.checksum_cache = None
+        self.__indexes: dict[str, IndexFile] = {}
+        self.__lock = threading.Lock()
+
+    def get_all_collections(self, sort_by_id: bool = True) -> list:
+        """Returns the collections of the dump in the order they were dumped in."""
+        collections = [{"name": name, "type": entry["type"]} for name, entry in self.manifest.collections.items()]
+        if sort_by_id:
+            collections.sort(key=lambda c: self.manifest.collections[c["name"]]["files"][0]["name"])
+        return collections
+
+    def count(self, collection_name: str) -> int:
+        entry = self.manifest.collections.get(collection_name)
+        return 0 if entry is None else entry["count"]
+
+    def metadata(self, collection_name: str) -> dict:
+        """Returns the count of the collection, a dump has no collection properties. See `ArangoClient.metadata`."""
+        return {"count": self.count(collection_name)}
+
+    def key_checksum(self, collection_name: str) -> str:
+        """Returns the checksum of the keys, see `ArangoClient.key_checksum`."""
+        return fingerprints_checksum((key, "") for key, _ in self.iter_fingerprints(collection_name))
+
+    def content_checksum(self, collection_name: str, excluded_fields: Iterable[str] = DEFAULT_EXCLUDED_FIELDS) -> str:
+        """
+        Returns the checksum of the documents content without the excluded attributes, see `ArangoClient.content_checksum`.
+        The index is used only if it was hashed with the same excluded attributes.
+        """
+        if set(excluded_fields) == set(DEFAULT_EXCLUDED_FIELDS):
+            return fingerprints_checksum(self.iter_fingerprints(collection_name))
+        return fingerprints_checksum((d["_key"], document_hash(d, excluded_fields)) for d in self.iter_documents(collection_name))
+
+    def get_all_documents(
+        self,
+        collection_name: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        fields: list[str] | None = None,
+        key_range: KeyRange = FULL_RANGE,
+        parallel: int = 1,
+    ) -> list:
+        return list(self.iter_documents(collection_name, batch_size, fields, key_range, parallel))
+
+    def iter_documents(
+        self,
+        collection_name: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        fields: list[str] | None = None,
+        key_range: KeyRange = FULL_RANGE,
+        parallel: int = 1,
+        ordered: bool = True,
+        excluded_fields: Iterable[str] | None = None,
+    ) -> Iterator[dict]:
+        """Streams the documents of the collection ordered by `_key`, the arguments are the same as of `ArangoClient.iter_documents`."""
+        unset = set(excluded_fields or ()) - KEPT_FIELDS
+        documents = self.__layered(collection_name, lambda f: iter_dump_documents(os.path.join(self.path, f["name"])), lambda d: d["_key"])
+        for document in documents:
+            if not in_range(document["_key"], key_range):
+                continue
+            if fields is not None:
+                document = {k: v for k, v in document.items() if k in fields or k in ("_key", "_id")}
+            elif unset:
+                document = {k: v for k, v in document.items() if k not in unset}
+            yield document
+
+    def iter_sample(
+        self,
+        collection_name: str,
+        threshold: str | None,
+        seed: int = 0,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        excluded_fields: Iterable[str] | None = None,
+    ) -> Iterator[dict]:
+        """Streams the documents of the sample ordered by `_key`, the arguments are the same as of `ArangoClient.iter_sample`."""
+        documents = self.iter_documents(collection_name, batch_size, excluded_fields=excluded_fields)
+        return (d for d in documents if in_sample(d["_key"], seed, threshold))
+
+    def iter_fingerprints(self, collection_name: str) -> Iterator[tuple[str, str]]:
+        """Streams `(key, content hash)` of the documents ordered by `_key`, from the index files if there are any."""
+        if not self.has_index(collection_name):
+            for document in self.iter_documents(collection_name):
+                yield document["_key"], document_hash(document)
+            return
+
+        entries = self.__layered(collection_name, lambda f: iter(self.__index(f)), lambda e: e[0])
+        for entry in entries:
+            yield entry[0], entry[1]
+
+    def has_index(self, collection_name: str) -> bool:
+        entry = self.manifest.collections.get(collection_name)
+        return entry is not None and all(os.path.exists(os.path.join(self.path, index_path(f["name"]))) for f in entry["files"])
+
+    def fetch_documents(self, collection_name: str, keys: list[str]) -> dict[str, dict]:
+        """Returns the documents of the keys by key, reading only those documents. Keys not in the dump are left out."""
+        if not self.has_index(collection_name):
+            wanted = set(keys)
+            return {d["_key"]: d for d in self.iter_documents(collection_name) if d["_key"] in wanted}
+
+        files = self.manifest.collections[collection_name]["files"]
+        locations = []
+        for key in keys:
+            for file in reversed(files):
+                if "delta_ranges" in file and not any(in_range(key, r) for r in file["delta_ranges"]):
+                    continue
+                entry = self.__index(file).find(key)
+                if entry is not None:
+                    locations.append((file["name"], entry[2], entry[3], key))
+                break
+
+        documents = {}
+        for file_name, group in groupby(sorted(locations), key=lambda location: location[0]):
+            with open_dump_reader(os.path.join(self.path, file_name)) as f:
+                for _, offset, length, key in group:
+                    documents[key] = read_dump_document(f, offset, length)
+        return documents
+
+    def compare_collections(
+        self,
+        other: ArangoClient | DumpClient,
+        on_collection_compared: Callable[[], None],
+        jobs: int = 1,
+        tier: str = "data",
+        shared: SharedChecks | None = None,
+        excluded: ExcludedFields | None = None,
+    ) -> list:
+        """Compare the collections of the dump with a database or another dump, see `ArangoClient.compare_collections`."""
+        return ArangoClient.compare_clients(self, other, on_collection_compared, jobs, tier, shared, excluded)
+
+    def __layered(self, collection_name: str, read: Callable[[dict], Iterator], key: Callable) -> Iterator:
+        """Merges the items of the collection files by key, items of a file replaced by a later delta file are left out."""
+        entry = self.manifest.collections.get(collection_name)
+        if entry is None:
+            return iter(())
+
+        def live(items: Iterator, replaced: list[KeyRange]) -> Iterator:
+            return (item for item in items if not any(in_range(key(item), r) for r in replaced))
+
+        files = entry["files"]
+        streams = [live(read(file), [r for later in files[i + 1 :] for r in later.get("delta_ranges", [])]) for i, file in enumerate(files)]
+        return heapq.merge(*streams, key=lambda item: key_order(key(item)))
+
+    def __index(self, file: dict) -> IndexFile:
+        with self.__lock:
+            if file["name"] not in self.__indexes:
+                self.__indexes[file["name"]] = IndexFile(os.path.join(self.path, index_path(file["name"])))
+            return self.__indexes[file["name"]]
+
+    def __str__(self):
+        return self.path
+
+
+class DumpConnection:
+    """A dump directory standing in for a `Connection`."""
+
+    def __init__(self, path: str):
+        self.name = path
+        self.client = DumpClient(path)
+
+    def get_client(self) -> DumpClient:
+        return self.client
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice
+
+from arangodb.checksum_cache import LOCAL_DIR
+from arangodb.settings import DEFAULT_BATCH_SIZE, DEFAULT_MAX_INDEXED_COLLECTIONS
+from diff.document_diff import document_hash, key_order
+
+# Share of changed documents above which the whole collection is read instead of fetching the changed keys.
+FULL_SCAN_RATIO = 0.5
+# Version of the tables, an index of another version is rebuilt.
+SCHEMA_VERSION = 2
+
+
+class FingerprintIndex:
+    """
+    On-disk index of document fingerprints, an SQLite database in the `.migrango` directory next to `_connection.json`.
+    It keeps `_key -> (_rev, content hash)` by server URL, database, collection and excluded attributes.
+    The keys are ordered by their `key_order`, kept next to them, so the fingerprints are read in the server order of keys.
+    A later run scans only `[_key, _rev]` of the collection and downloads the documents whose `_rev` changed,
+    so a collection with few writes costs a key scan instead of a full download.
+
+    Args:
+        path (str): The path to the index database.
+        ttl (int, optional): Seconds after which the fingerprints of a collection not used are evicted. No expiration if None.
+        max_collections (int): Number of indexed collections kept, the least recently used ones are evicted.
+    """
+
+    default_path = os.path.join(LOCAL_DIR, "fingerprints.sqlite")
+
+    def __init__(self, path: str = default_path, ttl: int | None = None, max_collections: int = DEFAULT_MAX_INDEXED_COLLECTIONS):
+        self.path = path
+        self.ttl = ttl
+        self.max_collections = max_collections
+        self.__lock = threading.Lock()
+        self.__source_locks: dict[int, threading.Lock] = {}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.__db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if self.__db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.__db.executescript(
+                f"""
+                DROP TABLE IF EXISTS sources;
+                DROP TABLE IF EXISTS fingerprints;
+                DROP TABLE IF EXISTS scans;
+                PRAGMA user_version = {SCHEMA_VERSION};
+                """
+            )
+        self.__db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sources (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                database TEXT NOT NULL,
+                collection TEXT NOT NULL,
+                excluded_fields TEXT NOT NULL,
+                used_at REAL NOT NULL,
+                UNIQUE (url, database, collection, excluded_fields)
+            );
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                source INTEGER NOT NULL,
+                ord TEXT NOT NULL,
+                key TEXT NOT NULL,
+                rev TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (source, ord)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS scans (
+                source INTEGER NOT NULL,
+                ord TEXT NOT NULL,
+                key TEXT NOT NULL,
+                rev TEXT NOT NULL,
+                PRIMARY KEY (source, ord)
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def fingerprints(
+        self,
+        url: str,
+        database: str,
+        collection: str,
+        excluded_fields: Iterable[str],
+        revisions: Iterable[tuple[str, str]],
+        fetch_documents: Callable[[list[str]], dict[str, dict]],
+        iter_documents: Callable[[], Iterable[dict]],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Iterator[tuple[str, str]]:
+        """
+        Streams `(key, content hash)` of the collection ordered by `_key`, after bringing the index up to date.
+
+        Args:
+            url (str): The server URL.
+            database (str): The database name.
+            collection (str): The collection name.
+            excluded_fields (Iterable[str]): Attributes left out of the content hash.
+            revisions (Iterable[tuple[str, str]]): `(key, _rev)` of all documents of the collection.
+            fetch_documents (Callable): Returns the documents of the keys by key, keys not in the collection are left out.
+            iter_documents (Callable): Reads the whole collection, used when most documents changed.
+            batch_size (int): Number of keys fetched in one round trip.
+        """
+        excluded_fields = sorted(set(excluded_fields))
+        source = self.__source(url, database, collection, ",".join(excluded_fields))
+        with self.__source_lock(source):
+            self.__refresh(source, excluded_fields, revisions, fetch_documents, iter_documents, batch_size)
+            yield from self.__read(source, batch_size)
+
+    def invalidate(self, url: str | None = None, database: str | None = None, collection: str | None = None) -> int:
+        """Removes the indexed collections matching all given arguments, everything if none is given. Returns the number removed."""
+        conditions = {"url": url, "database": database, "collection": collection}
+        where = " AND ".join(f"{column} = ?" for column, value in conditions.items() if value is not None) or "1 = 1"
+        with self.__lock:
+            removed = self.__db.execute(f"DELETE FROM sources WHERE {where}", [v for v in conditions.values() if v is not None]).rowcount
+            self.__remove_orphans()
+            return removed
+
+    def evict(self, connections: Iterable[tuple[str, str]] | None = None) -> int:
+        """
+        Removes the collections not used within `ttl`, the least recently used ones above `max_collections`
+        and, if `connections` are given, those of servers and databases which are not among them. Returns the number removed.
+        """
+        with self.__lock:
+            removed = 0
+            if self.ttl is not None:
+                removed += self.__db.execute("DELETE FROM sources WHERE used_at < ?", (time.time() - self.ttl,)).rowcount
+            if connections is not None:
+                known = set(connections)
+                stale = [(i,) for i, url, database in self.__db.execute("SELECT id, url, database FROM sources") if (url, database) not in known]
+                removed += self.__db.executemany("DELETE FROM sources WHERE id = ?", stale).rowcount
+            removed += self.__db.execute(
+                "DELETE FROM sources WHERE id NOT IN (SELECT id FROM sources ORDER BY used_at DESC LIMIT ?)",
+                (self.max_collections,),
+            ).rowcount
+            self.__remove_orphans()
+            return removed
+
+    def compact(self) -> None:
+        """Gives the space of removed fingerprints back to the file system."""
+        with self.__lock:
+            self.__db.execute("DELETE FROM scans")
+            self.__db.execute("VACUUM")
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__db.close()
+
+    def __source(self, url: str, database: str, collection: str, excluded_fields: str) -> int:
+        with self.__lock:
+            self.__db.execute(
+                """
+                INSERT INTO sources (url, database, collection, excluded_fields, used_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (url, database, collection, excluded_fields) DO UPDATE SET used_at = excluded.used_at
+                """,
+                (url, database, collection, excluded_fields, time.time()),
+            )
+            return self.__db.execute(
+                "SELECT id FROM sources WHERE url = ? AND database = ? AND collection = ? AND excluded_fields = ?",
+                (url, database, collection, excluded_fields),
+            ).fetchone()[0]
+
+    def __source_lock(self, source: int) -> threading.Lock:
+        with self.__lock:
+            return self.__source_locks.setdefault(source, threading.Lock())
+
+    def __refresh(
+        self,
+        source: int,
+        excluded_fields: list[str],
+        revisions: Iterable[tuple[str, str]],
+        fetch_documents: Callable[[list[str]], dict[str, dict]],
+        iter_documents: Callable[[], Iterable[dict]],
+        batch_size: int,
+    ) -> None:
+        """Stores the scanned revisions, removes the keys which are gone and hashes the documents whose revision changed."""
+        self.__write("DELETE FROM scans WHERE source = ?", [(source,)])
+        revisions = iter(revisions)
+        while batch := list(islice(revisions, batch_size)):
+            self.__write("INSERT OR REPLACE INTO scans VALUES (?, ?, ?, ?)", [(source, key_order(key), key, rev) for key, rev in batch])
+
+        with self.__lock:
+            self.__db.execute("DELETE FROM fingerprints WHERE source = ? AND ord NOT IN (SELECT ord FROM scans WHERE source = ?)", (source, source))
+            total = self.__db.execute("SELECT COUNT(*) FROM scans WHERE source = ?", (source,)).fetchone()[0]
+            changed = self.__db.execute(
+                """
+                SELECT COUNT(*) FROM scans s LEFT JOIN fingerprints f ON f.source = s.source AND f.ord = s.ord
+                WHERE s.source = ? AND (f.rev IS NULL OR f.rev <> s.rev)
+                """,
+                (source,),
+            ).fetchone()[0]
+
+        if changed > total * FULL_SCAN_RATIO:
+            documents = iter(iter_documents())
+            while batch := list(islice(documents, batch_size)):
+                self.__store(source, batch, excluded_fields)
+        else:
+            last = ""
+            while keys := self.__changed_keys(source, last, batch_size):
+                documents = fetch_documents(keys)
+                self.__store(source, documents.values(), excluded_fields)
+                self.__write("DELETE FROM fingerprints WHERE source = ? AND ord = ?", [(source, key_order(k)) for k in keys if k not in documents])
+                last = key_order(keys[-1])
+
+        self.__write("DELETE FROM scans WHERE source = ?", [(source,)])
+
+    def __changed_keys(self, source: int, after: str, limit: int) -> list[str]:
+        """Returns the next keys whose revision changed, after the key whose `key_order` is `after`."""
+        with self.__lock:
+            rows = self.__db.execute(
+                """
+                SELECT s.key FROM scans s LEFT JOIN fingerprints f ON f.source = s.source AND f.ord = s.ord
+                WHERE s.source = ? AND s.ord > ? AND (f.rev IS NULL OR f.rev <> s.rev)
+                ORDER BY s.ord LIMIT ?
+                """,
+                (source, after, limit),
+            ).fetchall()
+        return [key for (key,) in rows]
+
+    def __store(self, source: int, documents: Iterable[dict], excluded_fields: list[str]) -> None:
+        self.__write(
+            "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?)",
+            [(source, key_order(d["_key"]), d["_key"], d["_rev"], document_hash(d, excluded_fields)) for d in documents],
+        )
+
+    def __read(self, source: int, batch_size: int) -> Iterator[tuple[str, str]]:
+        """Reads the fingerprints page by page, the connection is not held between pages."""
+        last = ""
+        while True:
+            with self.__lock:
+                rows = self.__db.execute(
+                    "SELECT key, hash, ord FROM fingerprints WHERE source = ? AND ord > ? ORDER BY ord LIMIT ?",
+                    (source, last, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for key, content_hash, _ in rows:
+                yield key, content_hash
+            last = rows[-1][2]
+
+    def __write(self, statement: str, rows: list[tuple]) -> None:
+        """Runs the statement for all rows in one transaction."""
+        if not rows:
+            return
+        with self.__lock:
+            self.__db.execute("BEGIN")
+            try:
+                self.__db.executemany(statement, rows)
+                self.__db.execute("COMMIT")
+            except BaseException:
+                self.__db.execute("ROLLBACK")
+                raise
+
+    def __remove_orphans(self) -> None:
+        self.__db.execute("DELETE FROM fingerprints WHERE source NOT IN (SELECT id FROM sources)")
+        self.__db.execute("DELETE FROM scans WHERE source NOT IN (SELECT id FROM sources)")
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+
+import jwt
+from arango import ArangoClient as ArangoDbClient
+from arango.database import StandardDatabase
+from arango.http import DefaultHTTPClient
+from arango.response import Response
+from requests import Session
+
+from arangodb.settings import DEFAULT_BACKOFF_FACTOR, DEFAULT_POOL_SIZE, DEFAULT_REQUEST_TIMEOUT, DEFAULT_RETRY_ATTEMPTS
+from metrics import METRICS
+
+# Seconds before the expiry a token is refreshed.
+TOKEN_REFRESH_MARGIN = 60
+
+
+class TokenCache:
+    """JWT tokens by host and user, shared by all sessions of the process and refreshed shortly before they expire."""
+
+    def __init__(self):
+        self.__tokens: dict[tuple[str, str, str], tuple[str, float]] = {}
+        self.__lock = threading.Lock()
+
+    def get(self, session: Session, host: str, username: str, password: str, timeout: float | None, refresh: bool = False) -> str:
+        key = (host, username, password)
+        with self.__lock:
+            token = self.__tokens.get(key)
+            if refresh or token is None or token[1] - TOKEN_REFRESH_MARGIN < time.time():
+                token = self.__login(session, host, username, password, timeout)
+                self.__tokens[key] = token
+            return token[0]
+
+    @staticmethod
+    def __login(session: Session, host: str, username: str, password: str, timeout: float | None) -> tuple[str, float]:
+        response = session.post(f"{host}/_open/auth", json={"username": username, "password": password}, timeout=timeout)
+        if not response.ok:
+            raise Exception(f"Authentication of {username} at {host} failed: {response.status_code} {response.reason}")
+
+        token = response.json()["jwt"]
+        payload = jwt.decode(token, options={"verify_signature": False})
+        return token, payload.get("exp", sys.maxsize)
+
+
+class PooledHTTPClient(DefaultHTTPClient):
+    """
+    HTTP client of python-arango with a connection pool of `pool_size` keep-alive connections per host,
+    request timeouts and retries with backoff. With the `jwt` auth method the credentials are exchanged for a JWT
+    taken from the process-wide `TokenCache`, a request rejected with 401 is sent once more with a fresh token.
+    Requests and the sizes of their bodies are recorded in `METRICS`.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        retry_attempts: int = DEFAULT_RETRY_ATTEMPTS,
+        backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+        auth_method: str = "jwt",
+    ):
+        super().__init__(request_timeout, retry_attempts, backoff_factor, pool_connections=pool_size, pool_maxsize=pool_size)
+        self.auth_method = auth_method
+        self.__hosts: dict[int, str] = {}
+
+    def create_session(self, host: str) -> Session:
+        session = super().create_session(host)
+        self.__hosts[id(session)] = host
+        return session
+
+    def send_request(
+        self,
+        session: Session,
+        method: str,
+        url: str,
+        headers: dict | None = None,
+        params: dict | None = None,
+        data=None,
+        auth: tuple[str, str] | None = None,
+    ) -> Response:
+        response = self.__send(session, method, url, headers, params, data, auth)
+        if METRICS.enabled:
+            received = response.headers.get("Content-Length")
+            METRICS.add_request(len(data) if isinstance(data, str | bytes) else 0, int(received) if received else len(response.raw_body))
+        return response
+
+    def __send(
+        self,
+        session: Session,
+        method: str,
+        url: str,
+        headers: dict | None,
+        params: dict | None,
+        data,
+        auth: tuple[str, str] | None,
+    ) -> Response:
+        if auth is None or self.auth_method != "jwt":
+            return super().send_request(session, method, url, headers, params, data, auth)
+
+        host = self.__hosts[id(session)]
+        headers = {**(headers or {}), "Authorization": f"bearer {TOKENS.get(session, host, *auth, self.request_timeout)}"}
+        response = super().send_request(session, method, url, headers, params, data)
+        if response.status_code == 401:
+            headers["Authorization"] = f"bearer {TOKENS.get(session, host, *auth, self.request_timeout, refresh=True)}"
+            response = super().send_request(session, method, url, headers, params, data)
+        return response
+
+
+TOKENS = TokenCache()
+_lock = threading.Lock()
+_clients: dict[tuple, ArangoDbClient] = {}
+_databases: dict[tuple, StandardDatabase] = {}
+
+
+def shared_database(
+    url: str,
+    database: str,
+    username: str | None = None,
+    password: str | None = None,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+    retry_attempts: int = DEFAULT_RETRY_ATTEMPTS,
+    backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+    auth_method: str = "jwt",
+) -> StandardDatabase:
+    """
+    Returns the database of the process-wide client of the URL and HTTP settings.
+    Connections to the same server share its sessions and connection pool, the same database and user share the database object.
+    """
+    client_key = (url, pool_size, request_timeout, retry_attempts, backoff_factor, auth_method)
+    database_key = (*client_key, database, username, password)
+    with _lock:
+        if database_key not in _databases:
+            if client_key not in _clients:
+                http_client = PooledHTTPClient(pool_size, request_timeout, retry_attempts, backoff_factor, auth_method)
+                _clients[client_key] = ArangoDbClient(url, http_client=http_client, request_timeout=request_timeout)
+            _databases[database_key] = _clients[client_key].db(database, username=username, password=password)
+        return _databases[database_key]
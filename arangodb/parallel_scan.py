@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import queue
+import threading
+from collections.abc import Callable, Iterator
+from typing import Any
+
+DEFAULT_PREFETCH = 4
+
+_END = object()
+
+
+class ParallelScan:
+    """
+    Reads several key ranges at the same time, one thread and one cursor per range.
+    Every range is read into its own bounded queue of chunks, so at most `prefetch` chunks per range are held in memory.
+    In the ordered mode the ranges are yielded one after another, the ranges must be given in the key order
+    to get the items in the key order. Otherwise the items are yielded as soon as any range produces them.
+
+    Args:
+        scan (Callable): Returns an iterator over the items of a range.
+        ranges (list): The ranges to read.
+        ordered (bool): Keep the order of the ranges.
+        chunk_size (int): Number of items passed from a reading thread at once.
+        prefetch (int): Number of chunks a reading thread may read ahead.
+    """
+
+    def __init__(
+        self,
+        scan: Callable[[Any], Iterator[Any]],
+        ranges: list,
+        ordered: bool = True,
+        chunk_size: int = 1000,
+        prefetch: int = DEFAULT_PREFETCH,
+    ):
+        self.scan = scan
+        self.ranges = ranges
+        self.ordered = ordered
+        self.chunk_size = chunk_size
+        self.prefetch = prefetch
+        self.__stopped = threading.Event()
+
+    def __iter__(self) -> Iterator[Any]:
+        if self.ordered:
+            queues = [queue.Queue(maxsize=self.prefetch) for _ in self.ranges]
+        else:
+            shared = queue.Queue(maxsize=self.prefetch * len(self.ranges))
+            queues = [shared for _ in self.ranges]
+
+        threads = [threading.Thread(target=self.__read, args=(r, q), daemon=True) for r, q in zip(self.ranges, queues, strict=True)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            if self.ordered:
+                for q in queues:
+                    yield from self.__drain(q, 1)
+            else:
+                yield from self.__drain(queues[0], len(self.ranges))
+        finally:
+            self.__stopped.set()
+            for thread in threads:
+                thread.join()
+
+    def __drain(self, q: queue.Queue, producers: int) -> Iterator[Any]:
+        finished = 0
+        while finished < producers:
+            chunk = q.get()
+            if chunk is _END:
+                finished += 1
+            elif isinstance(chunk, BaseException):
+                raise chunk
+            else:
+                yield from chunk
+
+    def __read(self, key_range: Any, q: queue.Queue) -> None:
+        items = self.scan(key_range)
+        try:
+            chunk = []
+            for item in items:
+                chunk.append(item)
+                if len(chunk) >= self.chunk_size:
+                    if not self.__put(q, chunk):
+                        return
+                    chunk = []
+            if chunk:
+                self.__put(q, chunk)
+        except Exception as ex:
+            self.__put(q, ex)
+        finally:
+            if hasattr(items, "close"):
+                items.close()
+            self.__put(q, _END)
+
+    def __put(self, q: queue.Queue, item: Any) -> bool:
+        """Puts the item unless the consumer stopped reading, returns False if it did."""
+        while not self.__stopped.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,23 @@
+"""Defaults shared by the clients and the command line. Kept free of heavy imports, the CLI reads them at startup."""
+
+DEFAULT_BATCH_SIZE = 1000
+# Number of checksums kept by the checksum cache.
+DEFAULT_MAX_ENTRIES = 100000
+# Number of collections kept by the fingerprint index.
+DEFAULT_MAX_INDEXED_COLLECTIONS = 1000
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_REQUEST_TIMEOUT = 60
+DEFAULT_RETRY_ATTEMPTS = 3
+DEFAULT_BACKOFF_FACTOR = 1.0
+AUTH_METHODS = ("jwt", "basic")
+
+FORMATS = ("json", "jsonl")
+COMPRESSIONS = ("none", "gzip", "zstd", "lz4")
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+# What bulk imports do with documents whose `_key` exists.
+ON_DUPLICATE = ("error", "update", "replace", "ignore")
+
+# Tiers of the collection comparison, from the cheapest to the most expensive one.
+COMPARE_TIERS = ("metadata", "keys", "data")
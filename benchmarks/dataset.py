@@ -0,0 +1,95 @@
+"""
+Deterministic synthetic datasets for the benchmarks.
+The same arguments always produce the same documents, so runs on different machines and revisions are comparable.
+"""
+
+from __future__ import annotations
+
+import random
+from collections.abc import Iterator
+
+SHAPES = ("flat", "nested")
+# How the drifted documents of the compared database are split between updates, deletes and inserts.
+DRIFT_MIX = (0.5, 0.25, 0.25)
+
+
+class Dataset:
+    """
+    A reference database and a compared database which differs from it by `drift` of the documents.
+
+    Args:
+        collections (int): Number of collections, the documents are split evenly between them.
+        documents (int): Number of documents of the reference database.
+        document_size (int): Approximate size of a document as JSON, in bytes.
+        shape (str): `flat` documents or `nested` objects and arrays.
+        drift (float): Share of the documents which are updated, deleted or inserted in the compared database.
+        seed (int): Seed of the generator.
+    """
+
+    def __init__(
+        self,
+        collections: int = 4,
+        documents: int = 10000,
+        document_size: int = 256,
+        shape: str = "flat",
+        drift: float = 0.01,
+        seed: int = 42,
+    ):
+        if shape not in SHAPES:
+            raise Exception(f"Unknown shape {shape}, expected one of {', '.join(SHAPES)}")
+
+        self.collections = collections
+        self.documents = documents
+        self.document_size = document_size
+        self.shape = shape
+        self.drift = drift
+        self.seed = seed
+
+    def collection_names(self) -> list[str]:
+        # Migrango skips collections with an underscore in the name as system collections.
+        return [f"bench{i:03}" for i in range(self.collections)]
+
+    def collection_size(self, index: int) -> int:
+        return self.documents // self.collections + (1 if index < self.documents % self.collections else 0)
+
+    def reference_documents(self, collection_name: str) -> Iterator[dict]:
+        index = self.collection_names().index(collection_name)
+        rng = random.Random(f"{self.seed}:{collection_name}")
+        for i in range(self.collection_size(index)):
+            yield self.__document(rng, f"{i:010}")
+
+    def compared_documents(self, collection_name: str) -> Iterator[dict]:
+        """The reference documents with `drift` of them updated, deleted or inserted, in the `_key` order."""
+        index = self.collection_names().index(collection_name)
+        size = self.collection_size(index)
+        drift_rng = random.Random(f"{self.seed}:{collection_name}:drift")
+        update, delete, _ = DRIFT_MIX
+
+        inserts = 0
+        for document in self.reference_documents(collection_name):
+            if drift_rng.random() >= self.drift:
+                yield document
+                continue
+
+            choice = drift_rng.random()
+            if choice < update:
+                yield {**document, "value": drift_rng.randrange(1 << 30), "drifted": True}
+            elif choice >= update + delete:
+                yield document
+                inserts += 1
+
+        for i in range(inserts):
+            yield self.__document(drift_rng, f"{size + i:010}")
+
+    def __document(self, rng: random.Random, key: str) -> dict:
+        document = {"_key": key, "value": rng.randrange(1 << 30), "active": rng.random() < 0.5, "name": f"item-{rng.randrange(1 << 20)}"}
+        if self.shape == "nested":
+            document["profile"] = {
+                "address": {"city": f"city-{rng.randrange(1000)}", "zip": f"{rng.randrange(100000):05}"},
+                "scores": [rng.randrange(100) for _ in range(5)],
+            }
+            document["items"] = [{"sku": f"sku-{rng.randrange(1 << 16)}", "quantity": rng.randrange(10)} for _ in range(3)]
+
+        padding = max(0, self.document_size - len(str(document)) - 14)
+        document["payload"] = rng.randbytes((padding + 1) // 2).hex()[:padding]
+        return document
@@ -0,0 +1,385 @@
+"""
+In-process stand-in for the ArangoDB HTTP endpoints Migrango uses: authentication, collections, checksums,
+counts, revisions, AQL cursors and bulk import. AQL is not interpreted, the fake recognises the queries
+`ArangoClient` sends and answers them in Python. Request and response bodies are counted as transferred bytes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import random
+import re
+import string
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import jwt
+
+COLLECTION_TYPES = {"document": 2, "edge": 3}
+# Strings are compared like the ICU root collation of the server: symbols, digits, letters, the case only between equal keys.
+COLLATION = " _-,;:!?.'\"()[]{}@*/\\&#%`^+<=>|~$0123456789" + string.ascii_lowercase
+
+
+def collation_key(key: str) -> tuple[list[int], list[bool]]:
+    return [COLLATION.find(c.lower()) if c.lower() in COLLATION else len(COLLATION) + ord(c) for c in key], [c.isupper() for c in key]
+
+
+def canonical(document: dict) -> bytes:
+    return json.dumps(document, sort_keys=True, separators=(",", ":")).encode()
+
+
+class FakeCollection:
+    def __init__(self, collection_id: int, name: str, collection_type: str = "document"):
+        self.id = collection_id
+        self.name = name
+        self.type = collection_type
+        self.documents: dict[str, dict] = {}
+        self.revision = 0
+        self.__keys: list[str] | None = None
+        self.__checksums: dict[bool, tuple[int, str]] = {}
+        self.lock = threading.Lock()
+
+    def keys(self) -> list[str]:
+        with self.lock:
+            if self.__keys is None:
+                self.__keys = sorted(self.documents, key=collation_key)
+            return self.__keys
+
+    def put(self, documents: Iterable[dict]) -> int:
+        with self.lock:
+            written = 0
+            for document in documents:
+                self.revision += 1
+                self.documents[document["_key"]] = {**document, "_id": f"{self.name}/{document['_key']}", "_rev": str(self.revision)}
+                written += 1
+            self.__keys = None
+            return written
+
+    def checksum(self, with_data: bool = True) -> str:
+        with self.lock:
+            if self.__checksums.get(with_data, (None,))[0] != self.revision:
+                sha1 = hashlib.sha1()
+                for key in sorted(self.documents):
+                    sha1.update(canonical({k: v for k, v in self.documents[key].items() if k != "_rev"}) if with_data else key.encode())
+                self.__checksums[with_data] = (self.revision, sha1.hexdigest())
+            return self.__checksums[with_data][1]
+
+    def scan(self, lower: str | None, upper: str | None) -> Iterator[dict]:
+        keys = self.keys()
+        for key in keys[self.__bisect(keys, lower) if lower is not None else 0 :]:
+            if upper is not None and collation_key(key) >= collation_key(upper):
+                break
+            yield self.documents[key]
+
+    @staticmethod
+    def __bisect(keys: list[str], key: str) -> int:
+        low, high = 0, len(keys)
+        while low < high:
+            middle = (low + high) // 2
+            if collation_key(keys[middle]) < collation_key(key):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+class Lookahead:
+    """Iterator which tells whether it has more items without losing one."""
+
+    def __init__(self, items: Iterator):
+        self.__items = items
+        self.__next: list = []
+
+    def __iter__(self) -> Lookahead:
+        return self
+
+    def __next__(self):
+        if self.__next:
+            return self.__next.pop()
+        return next(self.__items)
+
+    def exhausted(self) -> bool:
+        if not self.__next:
+            self.__next = list(itertools.islice(self.__items, 1))
+        return not self.__next
+
+
+class FakeArango:
+    """
+    Fake ArangoDB server on a free local port, databases are created on first use.
+
+    Args:
+        username (str): User accepted by `/_open/auth`.
+        password (str): Password of the user.
+    """
+
+    def __init__(self, username: str = "root", password: str = ""):
+        self.username = username
+        self.password = password
+        self.databases: dict[str, dict[str, FakeCollection]] = {}
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.requests = 0
+        self.cursors: dict[str, tuple[Iterator, int]] = {}
+        self.__ids = itertools.count(1000)
+        self.__lock = threading.Lock()
+        self.__server: ThreadingHTTPServer | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.__server.server_port}"
+
+    def start(self) -> FakeArango:
+        fake = self
+
+        class Handler(FakeRequestHandler):
+            server_fake = fake
+
+        self.__server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.__server.daemon_threads = True
+        threading.Thread(target=self.__server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return {"requests": self.requests, "bytes_received": self.bytes_received, "bytes_sent": self.bytes_sent}
+
+    def count_request(self, received: int, sent: int) -> None:
+        """Counts a request and its transferred bytes, called by the handler threads."""
+        with self.__lock:
+            self.requests += 1
+            self.bytes_received += received
+            self.bytes_sent += sent
+
+    def database(self, name: str) -> dict[str, FakeCollection]:
+        with self.__lock:
+            return self.databases.setdefault(name, {})
+
+    def create_collection(self, database: str, name: str, collection_type: str = "document") -> FakeCollection:
+        collections = self.database(database)
+        with self.__lock:
+            if name not in collections:
+                collections[name] = FakeCollection(next(self.__ids), name, collection_type)
+            return collections[name]
+
+    def drop_database(self, name: str) -> None:
+        with self.__lock:
+            self.databases.pop(name, None)
+
+    def load(self, database: str, name: str, documents: Iterable[dict], collection_type: str = "document") -> int:
+        return self.create_collection(database, name, collection_type).put(documents)
+
+    def open_cursor(self, documents: Iterator, batch_size: int) -> dict:
+        batch, rest = self.__batch(documents, batch_size)
+        body = {"error": False, "code": 201, "result": batch, "hasMore": False, "cached": False, "extra": {}}
+        if rest is not None:
+            cursor_id = str(next(self.__ids))
+            with self.__lock:
+                self.cursors[cursor_id] = (rest, batch_size)
+            body.update(hasMore=True, id=cursor_id)
+        return body
+
+    def next_batch(self, cursor_id: str) -> dict | None:
+        with self.__lock:
+            cursor = self.cursors.get(cursor_id)
+        if cursor is None:
+            return None
+
+        documents, batch_size = cursor
+        batch, rest = self.__batch(documents, batch_size)
+        with self.__lock:
+            if rest is None:
+                self.cursors.pop(cursor_id, None)
+            else:
+                self.cursors[cursor_id] = (rest, batch_size)
+        return {"error": False, "code": 200, "result": batch, "hasMore": rest is not None, "id": cursor_id, "cached": False, "extra": {}}
+
+    @staticmethod
+    def __batch(documents: Iterator, batch_size: int) -> tuple[list, Iterator | None]:
+        """Returns the next batch and the documents after it, None if there are none, like a server cursor never sends an empty batch."""
+        if not isinstance(documents, Lookahead):
+            documents = Lookahead(documents)
+        batch = list(itertools.islice(documents, batch_size))
+        return batch, None if documents.exhausted() else documents
+
+    def close_cursor(self, cursor_id: str) -> bool:
+        with self.__lock:
+            return self.cursors.pop(cursor_id, None) is not None
+
+    def query(self, collections: dict[str, FakeCollection], query: str, bind_vars: dict) -> Iterator:
+        """Answers the AQL queries of `ArangoClient`."""
+        collection = collections[bind_vars["@collection"]]
+        lower, upper = bind_vars.get("lower"), bind_vars.get("upper")
+
+        if "FOR r IN @ranges" in query:
+            excluded, parts = set(bind_vars.get("excluded", [])), query.count("SUM(")
+            return iter([self.__range_sums(collection, r[0], r[1], excluded, parts) for r in bind_vars["ranges"]])
+        if "RAND() * total < @samples" in query:
+            keys = [d["_key"] for d in collection.scan(lower, upper)]
+            return iter([k for k in keys if random.random() * len(keys) < bind_vars["samples"]])
+        if "SHA1(CONCAT(@seed" in query:
+            threshold, seed, unset = bind_vars["threshold"], bind_vars["seed"], set(bind_vars["unset"])
+            sample = (
+                d
+                for d in collection.scan(None, None)
+                if threshold is None or hashlib.sha1(f"{seed}:{d['_key']}".encode()).hexdigest()[: len(threshold)] < threshold
+            )
+            return ({k: v for k, v in d.items() if k not in unset} for d in sample)
+        if "RETURN [d._key, d._rev]" in query:
+            return ([d["_key"], d["_rev"]] for d in collection.scan(None, None))
+        if "FILTER d._key IN @keys" in query:
+            return iter([collection.documents[k] for k in bind_vars["keys"] if k in collection.documents])
+        if re.search(r"FOR d IN @@collection", query):
+            fields = bind_vars.get("fields")
+            if fields is None:
+                unset = set(bind_vars.get("unset") or ())
+                if not unset:
+                    return collection.scan(lower, upper)
+                return ({k: v for k, v in d.items() if k not in unset} for d in collection.scan(lower, upper))
+            return ({k: v for k, v in d.items() if k in fields} for d in collection.scan(lower, upper))
+        raise NotImplementedError(f"Query not supported by the fake: {query}")
+
+    @staticmethod
+    def __range_sums(collection: FakeCollection, lower: str | None, upper: str | None, excluded: set[str], parts: int) -> list[int]:
+        sums = [0] * (parts + 1)
+        for document in collection.scan(lower, upper):
+            names = sorted(k for k in document if k not in excluded)
+            content = json.dumps([names, [document[k] for k in names]], separators=(",", ":"), ensure_ascii=False)
+            digest = hashlib.sha1(f"{document['_key']}:{content}".encode()).hexdigest()
+            sums[0] += 1
+            for i in range(parts):
+                sums[i + 1] += int(digest[6 * i : 6 * i + 6], 16)
+        return sums
+
+    def token(self) -> str:
+        now = int(time.time())
+        return jwt.encode({"iss": "arangodb", "iat": now, "exp": now + 3600, "preferred_username": self.username}, "fake", algorithm="HS256")
+
+
+class FakeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_fake: FakeArango
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.__handle("GET")
+
+    def do_POST(self) -> None:
+        self.__handle("POST")
+
+    def do_PUT(self) -> None:
+        self.__handle("PUT")
+
+    def do_DELETE(self) -> None:
+        self.__handle("DELETE")
+
+    def __handle(self, method: str) -> None:
+        fake = self.server_fake
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+        url = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        match = re.match(r"^(?:/_db/([^/]+))?(/.*)$", url.path)
+        database, path = match.group(1) or "_system", match.group(2)
+        body = json.loads(raw) if raw else None
+
+        try:
+            status, response = self.__route(fake, method, database, path, params, body)
+        except KeyError as ex:
+            status, response = 404, {"error": True, "code": 404, "errorNum": 1203, "errorMessage": f"not found: {ex}"}
+        except NotImplementedError as ex:
+            status, response = 501, {"error": True, "code": 501, "errorNum": 9, "errorMessage": str(ex)}
+
+        payload = json.dumps(response).encode()
+        fake.count_request(len(raw), len(payload))
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    @staticmethod
+    def __route(fake: FakeArango, method: str, database: str, path: str, params: dict, body) -> tuple[int, object]:
+        collections = fake.database(database)
+
+        if path == "/_open/auth":
+            if body.get("username") != fake.username or body.get("password") != fake.password:
+                return 401, {"error": True, "code": 401, "errorNum": 401, "errorMessage": "Wrong credentials"}
+            return 200, {"jwt": fake.token()}
+        if path == "/_api/version":
+            return 200, {"server": "arango", "version": "3.11.0", "license": "community"}
+
+        if path == "/_api/collection" and method == "GET":
+            result = [
+                {"id": str(c.id), "name": c.name, "isSystem": False, "type": COLLECTION_TYPES[c.type], "status": 3, "globallyUniqueId": c.name}
+                for c in collections.values()
+            ]
+            return 200, {"error": False, "code": 200, "result": result}
+        if path == "/_api/collection" and method == "POST":
+            collection_type = "edge" if body.get("type") == COLLECTION_TYPES["edge"] else "document"
+            collection = fake.create_collection(database, body["name"], collection_type)
+            return 200, {"id": str(collection.id), "name": collection.name, "type": COLLECTION_TYPES[collection_type], "status": 3}
+
+        match = re.match(r"^/_api/collection/([^/]+)(?:/(\w+))?$", path)
+        if match:
+            name, action = match.groups()
+            if method == "DELETE":
+                collections.pop(name)
+                return 200, {"error": False, "code": 200, "id": name}
+            collection = collections[name]
+            if action == "checksum":
+                with_data = params.get("withData", "false").lower() in ("true", "1")
+                return 200, {"checksum": collection.checksum(with_data), "revision": str(collection.revision)}
+            if action == "revision":
+                return 200, {"revision": str(collection.revision)}
+            if action == "count":
+                return 200, {"count": len(collection.documents)}
+            return 200, {
+                "id": str(collection.id),
+                "name": name,
+                "type": COLLECTION_TYPES[collection.type],
+                "status": 3,
+                "keyOptions": {"type": "traditional", "allowUserKeys": True},
+                "schema": None,
+            }
+
+        if path == "/_api/cursor" and method == "POST":
+            documents = fake.query(collections, body["query"], body.get("bindVars", {}))
+            return 201, fake.open_cursor(documents, body.get("batchSize") or 1000)
+        match = re.match(r"^/_api/cursor/([^/]+)$", path)
+        if match and method in ("POST", "PUT"):
+            batch = fake.next_batch(match.group(1))
+            if batch is None:
+                return 404, {"error": True, "code": 404, "errorNum": 1600, "errorMessage": "cursor not found"}
+            return 200, batch
+        if match and method == "DELETE":
+            return (202, {"error": False, "code": 202}) if fake.close_cursor(match.group(1)) else (404, {"error": True, "code": 404})
+
+        if path == "/_api/import" and method == "POST":
+            collection = collections[params["collection"]]
+            on_duplicate = params.get("onDuplicate", "error")
+            created = errors = ignored = 0
+            documents = []
+            for document in body:
+                if document.get("_key") in collection.documents and on_duplicate in ("error", "ignore"):
+                    errors += on_duplicate == "error"
+                    ignored += on_duplicate == "ignore"
+                    continue
+                documents.append(document)
+            created = collection.put(documents)
+            return 201, {"error": False, "created": created, "errors": errors, "empty": 0, "updated": 0, "ignored": ignored, "details": []}
+
+        raise NotImplementedError(f"{method} {path} not supported by the fake")
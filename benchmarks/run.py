@@ -0,0 +1,241 @@
+"""
+Benchmarks of the commands on synthetic data of growing size.
+Every tier loads a reference and a compared database generated by `Dataset`, runs each command in a fresh
+interpreter and records the throughput, the peak resident memory of the command and the bytes sent over HTTP.
+The results are written as JSON to the output directory, one file per run, so runs can be compared over time.
+
+By default the databases are served by `FakeArango`, an in-process fake which also counts requests and bytes.
+The fake keeps the documents in memory, tiers of millions of documents need a real server:
+
+    python benchmarks/run.py [--tiers 10k,100k] [--commands compare,dump] [--output benchmarks/results]
+    python benchmarks/run.py --tiers 1M,10M --url http://localhost:8529 --username root --password secret
+
+On a real server the databases migrango_bench_ref, migrango_bench_cmp and migrango_bench_restore are dropped
+and created again, the transferred bytes are not recorded.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from datetime import datetime, timezone
+from itertools import batched
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path[:0] = [ROOT, BENCHMARKS]
+
+from dataset import SHAPES, Dataset  # noqa: E402
+from fake_arango import FakeArango  # noqa: E402
+
+COMMANDS = ("compare", "dump", "make-migrations", "restore")
+DATABASES = {"ref": "migrango_bench_ref", "cmp": "migrango_bench_cmp", "restore": "migrango_bench_restore"}
+TEMPLATE = "{% for type, group in actions.items() %}{{ type }} {{ group|length }}\n{% endfor %}"
+UNITS = {"k": 1_000, "m": 1_000_000}
+LOAD_BATCH_SIZE = 10000
+
+# Runs main.py in the child interpreter and writes its peak resident memory in bytes to $MIGRANGO_BENCH_RSS.
+RUNNER = """
+import os, resource, runpy, sys
+sys.argv = ["main.py", *sys.argv[1:]]
+code = 0
+try:
+    runpy.run_path(os.path.join(os.environ["MIGRANGO_ROOT"], "main.py"), run_name="__main__")
+except SystemExit as ex:
+    code = ex.code or 0
+finally:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with open(os.environ["MIGRANGO_BENCH_RSS"], "w") as f:
+        f.write(str(rss if sys.platform == "darwin" else rss * 1024))
+sys.exit(code)
+"""
+
+
+def parse_tier(tier: str) -> int:
+    tier = tier.strip().lower()
+    return int(float(tier[:-1]) * UNITS[tier[-1]]) if tier[-1] in UNITS else int(tier)
+
+
+class Server:
+    """The databases of a run, on the fake or on a real server."""
+
+    def __init__(self, url: str | None, username: str, password: str):
+        self.fake = FakeArango(username, password).start() if url is None else None
+        self.url = self.fake.url if self.fake is not None else url
+        self.username = username
+        self.password = password
+
+    def reset(self) -> None:
+        for database in DATABASES.values():
+            if self.fake is not None:
+                self.fake.drop_database(database)
+            else:
+                system = self.__system()
+                if system.has_database(database):
+                    system.delete_database(database)
+                system.create_database(database)
+
+    def load(self, database: str, collection_name: str, documents: Iterator[dict]) -> None:
+        if self.fake is not None:
+            self.fake.load(database, collection_name, documents)
+            return
+
+        from arango import ArangoClient as ArangoDbClient
+
+        db = ArangoDbClient(self.url).db(database, username=self.username, password=self.password)
+        collection = db.create_collection(collection_name) if not db.has_collection(collection_name) else db.collection(collection_name)
+        for batch in batched(documents, LOAD_BATCH_SIZE):
+            collection.import_bulk(list(batch), halt_on_error=True)
+
+    def stats(self) -> dict:
+        return self.fake.stats() if self.fake is not None else {"requests": None, "bytes_received": None, "bytes_sent": None}
+
+    def stop(self) -> None:
+        if self.fake is not None:
+            self.fake.stop()
+
+    def __system(self):
+        from arango import ArangoClient as ArangoDbClient
+
+        return ArangoDbClient(self.url).db("_system", username=self.username, password=self.password)
+
+
+def run_command(workdir: str, args: list[str]) -> int:
+    """Runs a command of the command line in `workdir`, returns its peak resident memory in bytes."""
+    rss_file = os.path.join(workdir, "rss")
+    env = {**os.environ, "PYTHONPATH": ROOT, "MIGRANGO_ROOT": ROOT, "MIGRANGO_BENCH_RSS": rss_file}
+    result = subprocess.run([sys.executable, "-c", RUNNER, *args], cwd=workdir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"{' '.join(args)} failed with exit code {result.returncode}:\n{result.stderr or result.stdout}")
+
+    with open(rss_file, encoding="utf-8") as f:
+        return int(f.read())
+
+
+def command_steps(workdir: str, dataset: Dataset) -> dict[str, tuple[list[str], int]]:
+    """Command line arguments of every command and the number of documents it reads."""
+    both = dataset.documents + sum(1 for n in dataset.collection_names() for _ in dataset.compared_documents(n))
+    dump_dir = os.path.join(workdir, "dump")
+    return {
+        "compare": (["compare", "ref", "cmp", "--no-cache"], both),
+        "dump": (["dump", "ref", "-o", dump_dir, "-f", "jsonl"], dataset.documents),
+        "make-migrations": (["make-migrations", "ref", "cmp", "-t", "template.j2", "-o", os.path.join(workdir, "migrations"), "--no-cache"], both),
+        "restore": (["restore", "restore", dump_dir], dataset.documents),
+    }
+
+
+def run_tier(server: Server, dataset: Dataset, commands: list[str], on_result: Callable[[dict], None]) -> None:
+    server.reset()
+    for name in dataset.collection_names():
+        server.load(DATABASES["ref"], name, dataset.reference_documents(name))
+        server.load(DATABASES["cmp"], name, dataset.compared_documents(name))
+
+    workdir = tempfile.mkdtemp(prefix="migrango-bench-")
+    try:
+        connections = [
+            {"name": name, "url": server.url, "database": database, "username": server.username, "password": server.password}
+            for name, database in DATABASES.items()
+        ]
+        with open(os.path.join(workdir, "_connection.json"), "w", encoding="utf-8") as f:
+            json.dump(connections, f)
+        with open(os.path.join(workdir, "template.j2"), "w", encoding="utf-8") as f:
+            f.write(TEMPLATE)
+
+        steps = command_steps(workdir, dataset)
+        # restore reads the dump, it is written first when only restore is benchmarked.
+        if "restore" in commands and "dump" not in commands:
+            run_command(workdir, steps["dump"][0])
+
+        for command in (c for c in COMMANDS if c in commands):
+            args, documents = steps[command]
+            before = server.stats()
+            started = time.perf_counter()
+            peak_rss = run_command(workdir, args)
+            seconds = time.perf_counter() - started
+            after = server.stats()
+
+            on_result(
+                {
+                    "command": command,
+                    "tier": dataset.documents,
+                    "documents": documents,
+                    "seconds": round(seconds, 3),
+                    "docs_per_sec": round(documents / seconds, 1),
+                    "peak_rss_bytes": peak_rss,
+                    **{k: after[k] - before[k] if after[k] is not None else None for k in after},
+                }
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiers", default="10k,100k", help="Comma separated numbers of reference documents, e.g. 10k,100k,1M,10M.")
+    parser.add_argument("--commands", default=",".join(COMMANDS), help=f"Comma separated commands out of {', '.join(COMMANDS)}.")
+    parser.add_argument("--collections", type=int, default=4, help="Number of collections the documents are split between.")
+    parser.add_argument("--doc-size", type=int, default=256, help="Approximate size of a document in bytes.")
+    parser.add_argument("--shape", choices=SHAPES, default="flat", help="Shape of the documents.")
+    parser.add_argument("--drift", type=float, default=0.01, help="Share of the documents which differ in the compared database.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the data generator.")
+    parser.add_argument("--url", default=None, help="URL of a real ArangoDB server, the in-process fake is used by default.")
+    parser.add_argument("--username", default="root", help="User of the server.")
+    parser.add_argument("--password", default="", help="Password of the user.")
+    parser.add_argument("--output", default=os.path.join(BENCHMARKS, "results"), help="Directory the JSON results are written to.")
+    args = parser.parse_args()
+
+    commands = [c.strip() for c in args.commands.split(",")]
+    unknown = [c for c in commands if c not in COMMANDS]
+    if unknown:
+        parser.error(f"unknown commands: {', '.join(unknown)}")
+
+    results = []
+
+    def on_result(result: dict) -> None:
+        results.append(result)
+        print(
+            f"{result['command']:<16} {result['tier']:>10} docs {result['seconds']:>9.2f} s {result['docs_per_sec']:>12.0f} docs/s "
+            f"{result['peak_rss_bytes'] / 2**20:>8.1f} MiB rss {result['bytes_sent'] or 0:>14} bytes sent"
+        )
+
+    server = Server(args.url, args.username, args.password)
+    try:
+        for tier in args.tiers.split(","):
+            dataset = Dataset(args.collections, parse_tier(tier), args.doc_size, args.shape, args.drift, args.seed)
+            run_tier(server, dataset, commands, on_result)
+    finally:
+        server.stop()
+
+    os.makedirs(args.output, exist_ok=True)
+    started_at = datetime.now(timezone.utc)
+    output = os.path.join(args.output, f"{started_at:%Y%m%dT%H%M%SZ}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "started_at": started_at.isoformat(),
+                "server": "fake" if args.url is None else args.url,
+                "dataset": {
+                    "collections": args.collections,
+                    "document_size": args.doc_size,
+                    "shape": args.shape,
+                    "drift": args.drift,
+                    "seed": args.seed,
+                },
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Startup-time budget of the command line.
+Imports `cli` under `python -X importtime` and fails if the import takes longer than the budget
+or loads one of the heavy modules, which must be imported only by the commands that use them.
+`tests/test_startup.py` checks the imported modules on every test run, the timing is left to this script.
+
+    python benchmarks/startup.py [--budget-ms 150] [--runs 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("arango", "jinja2", "requests", "rich.progress", "rich.logging", "sqlite3", "diff")
+DEFAULT_BUDGET_MS = 150
+
+
+def import_cli() -> tuple[float, set[str]]:
+    """Imports `cli` in a fresh interpreter, returns the cumulative import time in ms and the imported modules."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import cli"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line.removeprefix("import time:").split("|"))
+        if cumulative.isdigit():
+            modules[name] = int(cumulative)
+    return modules.get("cli", 0) / 1000, set(modules)
+
+
+def heavy_modules(modules: set[str]) -> list[str]:
+    """Returns the imported modules which are among `HEAVY_MODULES` or inside them."""
+    return sorted(m for m in modules if m.split(".")[0] in HEAVY_MODULES or m in HEAVY_MODULES)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Maximum median import time of cli.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters measured.")
+    args = parser.parse_args()
+
+    times, modules = [], set()
+    for _ in range(args.runs):
+        elapsed, modules = import_cli()
+        times.append(elapsed)
+
+    median = statistics.median(times)
+    heavy = heavy_modules(modules)
+    print(f"import cli: median {median:.1f} ms, min {min(times):.1f} ms, budget {args.budget_ms:.0f} ms")
+
+    failed = False
+    if median > args.budget_ms:
+        print(f"FAIL: import cli takes {median:.1f} ms, over the budget of {args.budget_ms:.0f} ms")
+        failed = True
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,159 @@
 import click
-from rich.prompt import Prompt
 
-from commands.compare import CompareCommand
-from commands.connectiion_remove import ConnectionRemoveCommand
-from commands.connection_list import ConnectionListCommand
-from commands.connection_test import ConnectionTestCommand
-from commands.create_connection import CreateConnectionCommand
-from commands.dump import DumpCommand
-from commands.make_migrations import MakeMigrationsCommand
+from arangodb.settings import (
+    AUTH_METHODS,
+    COMPARE_TIERS,
+    COMPRESSIONS,
+    DEFAULT_BACKOFF_FACTOR,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_BUFFER_SIZE,
+    DEFAULT_MAX_ENTRIES,
+    DEFAULT_MAX_INDEXED_COLLECTIONS,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_REQUEST_TIMEOUT,
+    DEFAULT_RETRY_ATTEMPTS,
+    FORMATS,
+    ON_DUPLICATE,
+)
+
+# Command modules are imported inside the command functions, so a command loads only its own dependencies.
+
+batch_size_option = click.option(
+    "-b",
+    "--batch-size",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=DEFAULT_BATCH_SIZE,
+    help="Number of documents fetched from the server in one round trip.",
+)
+
+jobs_option = click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=1,
+    help="Number of collections processed at the same time.",
+)
+
+scan_jobs_option = click.option(
+    "-s",
+    "--scan-jobs",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=1,
+    help="Number of cursors reading one big collection at the same time, each on its own key range.",
+)
+
+diff_memory_option = click.option(
+    "--diff-memory",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Bytes of sorted fingerprints held in memory by the diff of a collection. "
+    "Documents are read unordered, sorted on disk and read back only where they differ, for collections larger than the memory.",
+)
+
+target_jobs_option = click.option(
+    "--target-jobs",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=4,
+    help="Number of compared connections processed at the same time.",
+)
+
+exclude_option = click.option(
+    "-e",
+    "--exclude",
+    multiple=True,
+    help="Document attribute to ignore when comparing documents, can be repeated. Prefix it with 'collection:' to ignore it "
+    "in that collection only. It is removed on the server, before checksums and downloads. _rev and _key are always ignored.",
+)
+
+
+def validate_sample(ctx: click.Context, param: click.Parameter, value: str | None) -> str | None:
+    if value is None:
+        return None
+
+    from diff.sample_diff import SampleSize
+
+    try:
+        SampleSize.parse(value)
+    except ValueError as ex:
+        raise click.BadParameter(str(ex)) from ex
+    return value
+
+
+cache_option = click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    show_default=True,
+    default=True,
+    help="Reuse checksums cached in .migrango while the collection revision and count are unchanged.",
+)
+
+cache_ttl_option = click.option(
+    "--cache-ttl",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Seconds after which cached checksums are calculated again. No expiration by default.",
+)
+
+range_diff_option = click.option(
+    "-r",
+    "--range-diff",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Compare hashes of key ranges on the servers and download only the ranges that differ.",
+)
 
 
 @click.group()
-def cli():
-    """Compare ArangoDB collections. Make migration files."""
-    pass
+@click.option(
+    "--metrics-json",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Write the wall time, requests, bytes, documents and peak memory of the run by phase and collection to the JSON file.",
+)
+@click.option(
+    "--metrics-prometheus",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Write the same metrics in the Prometheus text format, e.g. for the textfile collector of the node exporter.",
+)
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Profile the run with cProfile and write the stats to the file, readable with pstats or snakeviz.",
+)
+@click.pass_context
+def cli(ctx: click.Context, metrics_json: str | None, metrics_prometheus: str | None, profile: str | None):
+    """Compare ArangoDB collections with one or more connections. A dump directory can be given instead of a connection name."""
+    if metrics_json is not None or metrics_prometheus is not None:
+        from metrics import METRICS
+
+        METRICS.enable(ctx.invoked_subcommand)
+
+        def write_metrics() -> None:
+            if metrics_json is not None:
+                METRICS.write_json(metrics_json)
+            if metrics_prometheus is not None:
+                METRICS.write_prometheus(metrics_prometheus)
+
+        ctx.call_on_close(write_metrics)
+
+    if profile is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        def write_profile() -> None:
+            profiler.disable()
+            profiler.dump_stats(profile)
+
+        ctx.call_on_close(write_profile)
 
 
 @cli.group()
@@ -25,6 +165,8 @@ def connection():
 @connection.command(name="list")
 def connections_list():
     """Show all connections."""
+    from commands.connection_list import ConnectionListCommand
+
     ConnectionListCommand.execute()
 
 
@@ -32,6 +174,8 @@ def connections_list():
 @click.argument("name", required=True)
 def remove_connection(name: str):
     """Remove connection."""
+    from commands.connectiion_remove import ConnectionRemoveCommand
+
     ConnectionRemoveCommand.execute(name)
 
 
@@ -44,14 +188,69 @@ def remove_connection(name: str):
     default=False,
     help="Enable interactive mode.",
 )
+@click.option(
+    "--pool-size",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=DEFAULT_POOL_SIZE,
+    help="Number of keep-alive connections to the server, shared by all commands of the process.",
+)
+@click.option(
+    "--timeout",
+    "request_timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    show_default=True,
+    default=DEFAULT_REQUEST_TIMEOUT,
+    help="Seconds to wait for a response of the server.",
+)
+@click.option(
+    "--retries",
+    "retry_attempts",
+    type=click.IntRange(min=0),
+    show_default=True,
+    default=DEFAULT_RETRY_ATTEMPTS,
+    help="Number of retries of failed idempotent requests.",
+)
+@click.option(
+    "--backoff",
+    "backoff_factor",
+    type=click.FloatRange(min=0),
+    show_default=True,
+    default=DEFAULT_BACKOFF_FACTOR,
+    help="Backoff factor of the retries, the n-th retry waits backoff * 2^(n-1) seconds.",
+)
+@click.option(
+    "--auth",
+    "auth_method",
+    type=click.Choice(AUTH_METHODS),
+    show_default=True,
+    default="jwt",
+    help="jwt logs in once and reuses the token until shortly before it expires, basic sends the password with every request.",
+)
 @click.argument("name", required=False)
 @click.argument("url", required=False)
 @click.argument("database", required=False)
 @click.argument("username", required=False)
 @click.argument("password", required=False)
-def create_connection(interactive: bool, name: str, url: str, database: str, username: str, password: str):
+def create_connection(
+    interactive: bool,
+    name: str,
+    url: str,
+    database: str,
+    username: str,
+    password: str,
+    pool_size: int,
+    request_timeout: float,
+    retry_attempts: int,
+    backoff_factor: float,
+    auth_method: str,
+):
     """Create connection."""
+    from commands.create_connection import CreateConnectionCommand
+
     if interactive:
+        from rich.prompt import Prompt
+
         name = Prompt.ask(
             "[magenta]Connection name[/magenta]",
             default="local",
@@ -60,16 +259,70 @@ def create_connection(interactive: bool, name: str, url: str, database: str, use
         database = Prompt.ask("[magenta]Database name[/magenta]", default="_system")
         username = Prompt.ask("[magenta]Username name[/magenta]", default=None)
         password = Prompt.ask("[magenta]Password name[/magenta]", default=None)
-    CreateConnectionCommand.execute(name, url, database, username, password)
+    CreateConnectionCommand.execute(
+        name,
+        url,
+        database,
+        username,
+        password,
+        pool_size,
+        request_timeout,
+        retry_attempts,
+        backoff_factor,
+        auth_method,
+    )
 
 
 @connection.command(name="test")
 @click.argument("name", required=True)
 def test_connection(name: str):
     """Test the connection."""
+    from commands.connection_test import ConnectionTestCommand
+
     ConnectionTestCommand.execute(name)
 
 
+@cli.group()
+def cache():
+    """Manage the local checksum cache and fingerprint index."""
+    pass
+
+
+@cache.command(name="clear")
+@click.option("-c", "--collection", default=None, help="Remove only the checksums and fingerprints of the collection.")
+@click.argument("name", required=False)
+def clear_cache(name: str | None, collection: str | None):
+    """Remove cached checksums and indexed fingerprints of the connection, of all connections if no name is given."""
+    from commands.cache_clear import CacheClearCommand
+
+    CacheClearCommand.execute(name, collection)
+
+
+@cache.command(name="prune")
+@click.option(
+    "--ttl",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Remove checksums older than, and fingerprints unused for, the given number of seconds.",
+)
+@click.option("--max-entries", type=click.IntRange(min=0), show_default=True, default=DEFAULT_MAX_ENTRIES, help="Number of checksums kept.")
+@click.option(
+    "--max-collections",
+    type=click.IntRange(min=0),
+    show_default=True,
+    default=DEFAULT_MAX_INDEXED_COLLECTIONS,
+    help="Number of collections kept in the fingerprint index.",
+)
+def prune_cache(ttl: int | None, max_entries: int, max_collections: int):
+    """
+    Remove expired and least recently used checksums and indexed fingerprints.
+    Fingerprints of databases no longer in the connections are removed, the index file is compacted.
+    """
+    from commands.cache_prune import CachePruneCommand
+
+    CachePruneCommand.execute(ttl, max_entries, max_collections)
+
+
 @cli.command()
 @click.option(
     "-c",
@@ -85,18 +338,82 @@ def test_connection(name: str):
     is_flag=True,
     show_default=True,
     default=False,
-    help="Show details.",
+    help="Show the documents and the changed values.",
+)
+@click.option(
+    "-l",
+    "--limit",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Stop after this many differing documents. All of them by default.",
 )
+@click.option(
+    "-t",
+    "--tier",
+    type=click.Choice(COMPARE_TIERS),
+    show_default=True,
+    default="data",
+    help="Last comparison tier: metadata compares counts, types and properties, keys the key checksums, data the full checksums.",
+)
+@exclude_option
+@click.option(
+    "--sample",
+    default=None,
+    callback=validate_sample,
+    help="Estimate the drift from a sample of the documents instead of comparing checksums: a rate like 0.01 or 1%, or a number of documents.",
+)
+@click.option("--seed", type=int, show_default=True, default=0, help="Seed of the sample, another seed picks other documents.")
+@batch_size_option
+@jobs_option
+@scan_jobs_option
+@range_diff_option
+@diff_memory_option
+@cache_option
+@cache_ttl_option
+@target_jobs_option
 @click.argument("reference_connection", required=True)
-@click.argument("compared_connection", required=True)
+@click.argument("compared_connections", nargs=-1, required=True)
 def compare(
     reference_connection: str,
-    compared_connection: str,
+    compared_connections: tuple[str, ...],
     checksum_only: bool,
     details: bool,
+    limit: int | None,
+    tier: str,
+    exclude: tuple[str, ...],
+    sample: str | None,
+    seed: int,
+    batch_size: int,
+    jobs: int,
+    scan_jobs: int,
+    range_diff: bool,
+    diff_memory: int | None,
+    use_cache: bool,
+    cache_ttl: int | None,
+    target_jobs: int,
 ):
-    """Compare ArangoDB collections. Make migration files."""
-    CompareCommand.execute(reference_connection, compared_connection, checksum_only, details)
+    """Compare ArangoDB collections with one or more connections. A dump directory can be given instead of a connection name."""
+    from commands.compare import CompareCommand
+
+    CompareCommand.execute(
+        reference_connection,
+        compared_connections,
+        checksum_only,
+        details,
+        batch_size,
+        jobs,
+        range_diff,
+        scan_jobs=scan_jobs,
+        use_cache=use_cache,
+        cache_ttl=cache_ttl,
+        target_jobs=target_jobs,
+        diff_memory=diff_memory,
+        limit=limit,
+        tier=tier,
+        exclude=exclude,
+        sample=sample,
+        seed=seed,
+    )
 
 
 @cli.command(help="Dump all collection from the connection.")
@@ -108,13 +425,115 @@ def compare(
     default="./dump",
     help="Output directory.",
 )
+@click.option(
+    "-f",
+    "--format",
+    "file_format",
+    type=click.Choice(FORMATS),
+    show_default=True,
+    default="json",
+    help="json writes a JSON array per collection, jsonl writes one document per line.",
+)
+@click.option(
+    "-z",
+    "--compress",
+    type=click.Choice(COMPRESSIONS),
+    show_default=True,
+    default="none",
+    help="Compression of the dump files. zstd and lz4 require the zstandard and lz4 packages.",
+)
+@click.option(
+    "--buffer-size",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=DEFAULT_BUFFER_SIZE,
+    help="Size of the file write buffer in bytes.",
+)
+@click.option(
+    "--max-in-flight",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum bytes buffered by all parallel exports. Unlimited by default.",
+)
+@click.option(
+    "--max-memory",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Resident memory in bytes above which parallel exports wait. Unlimited by default.",
+)
+@click.option(
+    "-i",
+    "--incremental",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Skip collections unchanged since the dump in the output directory, write the changed key ranges as delta files.",
+)
+@batch_size_option
+@jobs_option
+@scan_jobs_option
 @click.argument("connection", required=True)
-def dump(output_dir: str, connection: str):
+def dump(
+    output_dir: str,
+    connection: str,
+    file_format: str,
+    compress: str,
+    buffer_size: int,
+    max_in_flight: int | None,
+    max_memory: int | None,
+    batch_size: int,
+    jobs: int,
+    scan_jobs: int,
+    incremental: bool,
+):
     """Dump all collection from the connection."""
-    DumpCommand.execute(connection, output_dir)
+    from commands.dump import DumpCommand
+
+    DumpCommand.execute(
+        connection,
+        output_dir,
+        batch_size,
+        file_format,
+        compress,
+        buffer_size,
+        jobs,
+        max_in_flight,
+        max_memory,
+        scan_jobs=scan_jobs,
+        incremental=incremental,
+    )
 
 
-@cli.command(help="Make migrations files for collections defined in the connection.")
+@cli.command(help="Restore a dump directory into the connection.")
+@click.option(
+    "--on-duplicate",
+    type=click.Choice(ON_DUPLICATE),
+    show_default=True,
+    default="replace",
+    help="What to do with documents whose _key already exists.",
+)
+@batch_size_option
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=1,
+    help="Number of collections read and of bulk import requests sent at the same time.",
+)
+@click.argument("connection", required=True)
+@click.argument("input_dir", required=True, type=click.Path(exists=True, file_okay=False))
+def restore(connection: str, input_dir: str, on_duplicate: str, batch_size: int, jobs: int):
+    """Restore a dump directory into the connection."""
+    from commands.restore import RestoreCommand
+
+    RestoreCommand.execute(connection, input_dir, batch_size, jobs, on_duplicate)
+
+
+@cli.command(
+    help="Make migrations files for collections defined in the connection, or in a dump directory. "
+    "With several compared connections the connection name is appended to the output and actions file names."
+)
 @click.option(
     "-o",
     "--output-dir",
@@ -129,7 +548,119 @@ def dump(output_dir: str, connection: str):
     required=True,
     help="Path to the Template to use for the migration files.",
 )
+@exclude_option
+@click.option(
+    "--chunk-actions",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Split the migration into numbered files of at most this many actions.",
+)
+@click.option(
+    "--chunk-bytes",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Split the migration into numbered files holding at most this many bytes of action data.",
+)
+@click.option(
+    "-a",
+    "--actions-file",
+    default=None,
+    help="Also write the actions as JSON lines to the file, the input of the apply command.",
+)
+@click.option(
+    "--fingerprint-index/--no-fingerprint-index",
+    "use_fingerprint_index",
+    show_default=True,
+    default=False,
+    help="Keep document hashes in .migrango between runs and download only the documents whose _rev changed.",
+)
+@click.option(
+    "--actions-memory",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Bytes of migration actions kept in memory, the rest is spilled to temporary files. Unlimited by default.",
+)
+@batch_size_option
+@jobs_option
+@scan_jobs_option
+@range_diff_option
+@diff_memory_option
+@cache_option
+@cache_ttl_option
+@target_jobs_option
 @click.argument("reference_connection", required=True)
-@click.argument("compared_connection", required=True)
-def make_migrations(output_dir: str, reference_connection: str, compared_connection: str, template: str):
-    MakeMigrationsCommand.execute(output_dir, reference_connection, compared_connection, template)
+@click.argument("compared_connections", nargs=-1, required=True)
+def make_migrations(
+    output_dir: str,
+    reference_connection: str,
+    compared_connections: tuple[str, ...],
+    template: str,
+    exclude: tuple[str, ...],
+    chunk_actions: int | None,
+    chunk_bytes: int | None,
+    actions_memory: int | None,
+    actions_file: str | None,
+    use_fingerprint_index: bool,
+    batch_size: int,
+    jobs: int,
+    scan_jobs: int,
+    range_diff: bool,
+    diff_memory: int | None,
+    use_cache: bool,
+    cache_ttl: int | None,
+    target_jobs: int,
+):
+    from commands.make_migrations import MakeMigrationsCommand
+
+    MakeMigrationsCommand.execute(
+        output_dir,
+        reference_connection,
+        compared_connections,
+        template,
+        batch_size,
+        jobs,
+        exclude,
+        range_diff,
+        scan_jobs=scan_jobs,
+        use_cache=use_cache,
+        cache_ttl=cache_ttl,
+        target_jobs=target_jobs,
+        diff_memory=diff_memory,
+        chunk_actions=chunk_actions,
+        chunk_bytes=chunk_bytes,
+        actions_memory=actions_memory,
+        actions_file=actions_file,
+        use_fingerprint_index=use_fingerprint_index,
+    )
+
+
+@cli.command(help="Apply a migration actions file to the connection.")
+@click.option(
+    "-n",
+    "--name",
+    default=None,
+    help="Name the progress of the migration is saved under in the migrations collection. The file name by default.",
+)
+@click.option(
+    "--on-duplicate",
+    type=click.Choice(ON_DUPLICATE),
+    show_default=True,
+    default="replace",
+    help="What to do with created documents whose _key already exists.",
+)
+@batch_size_option
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=1,
+    help="Number of bulk requests to one collection at the same time.",
+)
+@click.argument("connection", required=True)
+@click.argument("actions_file", required=True, type=click.Path(exists=True, dir_okay=False))
+def apply(connection: str, actions_file: str, name: str | None, on_duplicate: str, batch_size: int, jobs: int):
+    """Apply a migration actions file to the connection."""
+    from commands.apply import ApplyCommand
+
+    ApplyCommand.execute(connection, actions_file, name, batch_size, jobs, on_duplicate)
@@ -0,0 +1,52 @@
+import os
+
+from rich.console import Console
+from rich.progress import Progress
+
+from arangodb.arango_client import DEFAULT_BATCH_SIZE
+from arangodb.connection import Connection
+from dump_io import file_sha256
+from migration.actions_file import count_actions_file, iter_actions_file
+from migration.migration_applier import MigrationApplier
+
+
+class ApplyCommand:
+    @staticmethod
+    def execute(
+        connection_name: str,
+        actions_file: str,
+        name: str | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        jobs: int = 1,
+        on_duplicate: str = "replace",
+    ):
+        console = Console()
+        connection = Connection.get(connection_name)
+
+        applier = MigrationApplier(
+            connection.get_client(),
+            name or os.path.basename(actions_file),
+            file_sha256(actions_file),
+            batch_size,
+            jobs,
+            on_duplicate,
+        )
+        total = count_actions_file(actions_file)
+        checkpoint = applier.checkpoint()
+        applied = 0 if checkpoint is None else checkpoint["applied"]
+
+        if checkpoint is not None and checkpoint["finished"]:
+            return console.print(f"[green]Migration [bold]{applier.name}[/bold] is already applied[/green]")
+        if applied:
+            console.print(f"[yellow]Resuming migration [bold]{applier.name}[/bold] after {applied} of {total} actions[/yellow]")
+
+        with Progress() as progress:
+            task = progress.add_task("[green]Applying...", total=total, completed=applied)
+            applier.apply(
+                iter_actions_file(actions_file, applied),
+                total,
+                applied,
+                lambda count: progress.update(task, advance=count),
+            )
+
+        console.print(f"[green]Migration [bold]{applier.name}[/bold] applied[/green]")
@@ -0,0 +1,21 @@
+from rich.console import Console
+
+from arangodb.checksum_cache import ChecksumCache
+from arangodb.connection import Connection
+from arangodb.fingerprint_index import FingerprintIndex
+
+
+class CacheClearCommand:
+    @staticmethod
+    def execute(name: str | None = None, collection: str | None = None):
+        console = Console()
+        if name is None:
+            removed = ChecksumCache().invalidate(collection=collection)
+            removed_collections = FingerprintIndex().invalidate(collection=collection)
+        else:
+            connection = Connection.get(name)
+            removed = ChecksumCache().invalidate(connection.url, connection.database, collection)
+            removed_collections = FingerprintIndex().invalidate(connection.url, connection.database, collection)
+
+        console.print(f"[green]Removed [bold]{removed}[/bold] cached checksums[/green]")
+        console.print(f"[green]Removed fingerprints of [bold]{removed_collections}[/bold] collections[/green]")
@@ -0,0 +1,18 @@
+from rich.console import Console
+
+from arangodb.checksum_cache import DEFAULT_MAX_ENTRIES, ChecksumCache
+from arangodb.connection import Connection
+from arangodb.fingerprint_index import DEFAULT_MAX_INDEXED_COLLECTIONS, FingerprintIndex
+
+
+class CachePruneCommand:
+    @staticmethod
+    def execute(ttl: int | None = None, max_entries: int = DEFAULT_MAX_ENTRIES, max_collections: int = DEFAULT_MAX_INDEXED_COLLECTIONS):
+        console = Console()
+        removed = ChecksumCache(ttl=ttl, max_entries=max_entries).evict()
+        console.print(f"[green]Removed [bold]{removed}[/bold] cached checksums[/green]")
+
+        fingerprint_index = FingerprintIndex(ttl=ttl, max_collections=max_collections)
+        removed_collections = fingerprint_index.evict((c["url"], c["database"]) for c in Connection.get_list())
+        fingerprint_index.compact()
+        console.print(f"[green]Removed fingerprints of [bold]{removed_collections}[/bold] collections[/green]")
@@ -1,63 +1,229 @@
-import re
+import json
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
+from itertools import islice
 from rich.progress import Progress
 
-from deepdiff import DeepDiff
 from rich.console import Console
+from rich.markup import escape
 
+from arangodb.arango_client import DEFAULT_BATCH_SIZE, ArangoClient, SharedChecks
+from arangodb.checksum_cache import ChecksumCache
 from arangodb.connection import Connection
+from arangodb.dump_client import DumpConnection
+from diff.document_diff import DocumentChange, DocumentDiff
+from diff.excluded_fields import ExcludedFields
+from diff.external_diff import ExternalDiff
+from diff.fingerprint_diff import FingerprintDiff
+from diff.range_diff import RangeDiff
+from diff.sample_diff import SampleEstimate, SampleSize
+from diff.shared_reference import SharedReference
+from metrics import METRICS
 
 
 class CompareCommand:
     @staticmethod
     def execute(
         reference_connection_name: str,
-        compared_connection_name: str,
+        compared_connection_names: str | Sequence[str],
         checksum_only: bool,
         details: bool,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        jobs: int = 1,
+        range_diff: bool = False,
+        scan_jobs: int = 1,
+        use_cache: bool = True,
+        cache_ttl: int | None = None,
+        limit: int | None = None,
+        tier: str = "data",
+        target_jobs: int = 1,
+        exclude: tuple[str, ...] = (),
+        sample: str | None = None,
+        seed: int = 0,
+        diff_memory: int | None = None,
     ):
+        """
+        Compares the reference with every compared connection and prints a report per target.
+        The checks and the documents of the reference are taken once and shared by the comparisons,
+        up to `target_jobs` targets are compared at the same time.
+        Excluded attributes are left out of the checksums and removed on the server before the documents are sent.
+        With a `sample`, like `0.01`, `1%` or `10000`, the drift is estimated from a sample of the documents instead, see `SampleDiff`.
+        With `diff_memory` the documents are read unordered and sorted on disk, see `ExternalDiff`.
+        """
+        if isinstance(compared_connection_names, str):
+            compared_connection_names = [compared_connection_names]
+
         console = Console()
+        excluded = ExcludedFields.parse(exclude)
+        if sample is not None:
+            return CompareCommand.__sample(
+                reference_connection_name,
+                compared_connection_names,
+                SampleSize.parse(sample),
+                seed,
+                excluded,
+                console,
+                batch_size,
+                jobs,
+                target_jobs,
+            )
+
         with Progress() as progress:
-            reference_connection = Connection.get(reference_connection_name)
-            compared_connection = Connection.get(compared_connection_name)
+            reference_connection = Connection.resolve(reference_connection_name)
+            compared_connections = [Connection.resolve(name) for name in compared_connection_names]
+
+            checksum_cache = ChecksumCache(ttl=cache_ttl) if use_cache else None
+            for connection in [reference_connection, *compared_connections]:
+                connection.get_client().checksum_cache = checksum_cache
 
             task = progress.add_task(
                 "[green]Comparing...",
-                total=len(compared_connection.get_client().get_all_collections()),
+                total=sum(len(c.get_client().get_all_collections()) for c in compared_connections),
             )
 
-            while not progress.finished:
-                [mismatches, create, delete] = reference_connection.get_client().compare_collections(
-                    compared_connection.get_client(),
-                    lambda: progress.update(task, advance=1),
+            shared = SharedChecks()
+
+            def compare_target(compared_connection: Connection | DumpConnection) -> list:
+                with METRICS.phase("compare"):
+                    return reference_connection.get_client().compare_collections(
+                        compared_connection.get_client(),
+                        lambda: progress.update(task, advance=1),
+                        jobs,
+                        tier,
+                        shared,
+                        excluded,
+                    )
+
+            with ThreadPoolExecutor(max_workers=max(1, min(target_jobs, len(compared_connections)))) as pool:
+                results = list(pool.map(compare_target, compared_connections))
+
+            if checksum_cache is not None:
+                checksum_cache.evict()
+
+            progress.stop()
+
+        shared_reference = None
+        if len(compared_connections) > 1 and not checksum_only and not range_diff:
+            shared_reference = SharedReference(reference_connection.get_client(), excluded, batch_size, scan_jobs)
+
+        try:
+            for compared_connection_name, compared_connection, [mismatches, create, delete] in zip(
+                compared_connection_names, compared_connections, results
+            ):
+                if len(compared_connections) > 1:
+                    console.print(f"[bold]{escape(compared_connection_name)}[/bold]")
+
+                if len(mismatches) == 0:
+                    if tier != "data":
+                        console.print(f"[green]Collections are equal on the {tier} tier[/green]")
+                    else:
+                        console.print("[green]Collections are equal[/green]")
+                    continue
+
+                CompareCommand.__print_dif(
+                    reference_connection,
+                    compared_connection,
+                    details,
+                    mismatches,
+                    create,
+                    delete,
+                    checksum_only,
+                    console,
+                    batch_size,
+                    range_diff,
+                    scan_jobs,
+                    limit,
+                    excluded,
+                    shared_reference,
+                    diff_memory,
                 )
+        finally:
+            if shared_reference is not None:
+                shared_reference.close()
+
+    @staticmethod
+    def __sample(
+        reference_connection_name: str,
+        compared_connection_names: Sequence[str],
+        sample: SampleSize,
+        seed: int,
+        excluded: ExcludedFields,
+        console: Console,
+        batch_size: int,
+        jobs: int,
+        target_jobs: int,
+    ):
+        with Progress() as progress:
+            reference_connection = Connection.resolve(reference_connection_name)
+            compared_connections = [Connection.resolve(name) for name in compared_connection_names]
+
+            task = progress.add_task(
+                "[green]Sampling...",
+                total=sum(len(c.get_client().get_all_collections()) for c in compared_connections),
+            )
+
+            def sample_target(compared_connection: Connection | DumpConnection) -> list:
+                with METRICS.phase("compare"):
+                    return ArangoClient.sample_clients(
+                        reference_connection.get_client(),
+                        compared_connection.get_client(),
+                        sample,
+                        lambda: progress.update(task, advance=1),
+                        jobs,
+                        seed,
+                        excluded,
+                        batch_size,
+                    )
+
+            with ThreadPoolExecutor(max_workers=max(1, min(target_jobs, len(compared_connections)))) as pool:
+                results = list(pool.map(sample_target, compared_connections))
 
             progress.stop()
 
-            if len(mismatches) == 0:
-                return console.print("[green]Collections are equal[/green]")
-
-            CompareCommand.__print_dif(
-                reference_connection,
-                compared_connection,
-                details,
-                mismatches,
-                create,
-                delete,
-                checksum_only,
-                console,
+        console.print(f"Sample of {sample} per collection, seed {seed}, drift bounds at 95% confidence")
+        for compared_connection_name, [estimates, create, delete] in zip(compared_connection_names, results):
+            if len(compared_connections) > 1:
+                console.print(f"[bold]{escape(compared_connection_name)}[/bold]")
+
+            CompareCommand.__print_collections_info(create, delete, console)
+            for estimate in estimates:
+                CompareCommand.__print_estimate(estimate, console)
+
+    @staticmethod
+    def __print_estimate(estimate: SampleEstimate, console: Console) -> None:
+        low, high = estimate.bounds
+        color = "green" if estimate.differing == 0 else "red"
+        console.print(
+            f"[{color}]Collection [bold]{escape(estimate.collection_name)}[/bold][/{color}]: "
+            f"{estimate.differing} of {estimate.sampled} sampled documents differ, "
+            f"drift {estimate.drift_rate:.2%} ({low:.2%} - {high:.2%})",
+            highlight=False,
+        )
+        if estimate.differing > 0:
+            fewest, most = estimate.estimated_documents
+            console.print(
+                f"    about {fewest} - {most} of {estimate.count} documents differ, e.g. {escape(', '.join(estimate.examples))}",
+                highlight=False,
             )
 
     @staticmethod
     def __print_dif(
-        reference_connection: Connection,
-        compared_connection: Connection,
+        reference_connection: Connection | DumpConnection,
+        compared_connection: Connection | DumpConnection,
         details: bool,
         mismatches: list,
         create: list,
         delete: list,
         checksum_only: bool,
         console: Console,
+        batch_size: int,
+        range_diff: bool,
+        scan_jobs: int,
+        limit: int | None,
+        excluded: ExcludedFields,
+        shared_reference: SharedReference | None = None,
+        diff_memory: int | None = None,
     ):
         mismatches_names = reduce(lambda x, y: x + "\n" + y["name"], mismatches, "")
 
@@ -66,33 +232,47 @@ class CompareCommand:
         if checksum_only:
             return console.print(f"[magenta]Collections are not equal:[/magenta] [red]{mismatches_names}[/red]")
 
+        reference = reference_connection.get_client()
+        compared = compared_connection.get_client()
+        diffs = []
         for mismatch in mismatches:
-            CompareCommand.__print_mismatches(
-                mismatch["name"],
-                reference_connection.get_client().get_all_documents(mismatch["name"]),
-                compared_connection.get_client().get_all_documents(mismatch["name"]),
-                details,
-                console,
-                "_id",
-            )
-
+            name = mismatch["name"]
+            excluded_fields = excluded.of(name)
+            if range_diff:
+                diffs.append(RangeDiff(reference, compared, name, excluded_fields, batch_size=batch_size))
+            elif shared_reference is not None:
+                diffs.append(shared_reference.diff(compared, name))
+            elif diff_memory is not None:
+                diffs.append(
+                    ExternalDiff(
+                        name,
+                        reference.iter_documents(name, batch_size, parallel=scan_jobs, ordered=False, excluded_fields=excluded_fields),
+                        compared.iter_documents(name, batch_size, parallel=scan_jobs, ordered=False, excluded_fields=excluded_fields),
+                        excluded_fields,
+                        diff_memory,
+                    )
+                )
+            else:
+                diffs.append(
+                    DocumentDiff(
+                        name,
+                        reference.iter_documents(name, batch_size, parallel=scan_jobs, excluded_fields=excluded_fields),
+                        compared.iter_documents(name, batch_size, parallel=scan_jobs, excluded_fields=excluded_fields),
+                        excluded_fields,
+                    )
+                )
         for c in create:
-            CompareCommand.__print_mismatches(
-                c["name"],
-                [],
-                compared_connection.get_client().get_all_documents(c["name"]),
-                details,
-                console,
-            )
-
+            documents = compared.iter_documents(c["name"], batch_size, parallel=scan_jobs, excluded_fields=excluded.of(c["name"]))
+            diffs.append(DocumentDiff(c["name"], [], documents, excluded.of(c["name"])))
         for c in delete:
-            CompareCommand.__print_mismatches(
-                c["name"],
-                reference_connection.get_client().get_all_documents(c["name"]),
-                [],
-                details,
-                console,
-            )
+            documents = reference.iter_documents(c["name"], batch_size, parallel=scan_jobs, excluded_fields=excluded.of(c["name"]))
+            diffs.append(DocumentDiff(c["name"], documents, [], excluded.of(c["name"])))
+
+        printed = 0
+        for diff in diffs:
+            printed += CompareCommand.__print_mismatches(diff, details, console, None if limit is None else limit - printed)
+            if limit is not None and printed >= limit:
+                return console.print(f"[yellow]Stopped after {limit} differing documents[/yellow]")
 
     @staticmethod
     def __print_collections_info(create: list, delete: list, console: Console):
@@ -106,20 +286,45 @@ class CompareCommand:
                 console.print(f'[red]{c["name"]} - {c['type']}[/red]')
 
     @staticmethod
-    def __print_mismatches(collection_name: str, left: list, right: list, details: bool, console: Console, group_by: str | None = None):
-        console.print(f"[red]Collection [bold]{collection_name}[/bold]: [/red]")
-
-        exclude_rev = re.compile(r"root\[[A-z0-9\/'-\.]+\]\['_rev'\]")
-        exclude_key = re.compile(r"root\[[A-z0-9\/']+\-\.]\['_key'\]")
-
-        dif = DeepDiff(
-            left,
-            right,
-            exclude_regex_paths=[exclude_rev, exclude_key],
-            verbose_level=2 if details else 1,
-            group_by=group_by,
-        )
-        if dif:
-            console.print(dif.pretty()) if not details else console.print(dif)
-        else:
+    def __print_mismatches(
+        diff: DocumentDiff | ExternalDiff | FingerprintDiff | RangeDiff, details: bool, console: Console, limit: int | None
+    ) -> int:
+        """
+        Prints the differing documents of the collection as the merge-join of both sides finds them.
+        Only the documents of the current batch are held in memory, reading stops after `limit` documents.
+        Returns the number of printed documents.
+        """
+        console.print(f"[red]Collection [bold]{diff.collection_name}[/bold]: [/red]")
+
+        changes = METRICS.timed(diff.changes(), "details", diff.collection_name)
+        printed = 0
+        try:
+            for change in islice(changes, limit):
+                CompareCommand.__print_change(change, details, console)
+                printed += 1
+        finally:
+            if hasattr(changes, "close"):
+                changes.close()
+
+        if printed == 0:
             console.print("[green]Collections are equal[/green]")
+        return printed
+
+    @staticmethod
+    def __print_change(change: DocumentChange, details: bool, console: Console) -> None:
+        key = escape(change.key)
+        if change.reference is None:
+            console.print(f"[green]+ {key}[/green]")
+            if details:
+                console.print(escape(json.dumps(change.compared, default=str)), highlight=False)
+        elif change.compared is None:
+            console.print(f"[red]- {key}[/red]")
+            if details:
+                console.print(escape(json.dumps(change.reference, default=str)), highlight=False)
+        else:
+            console.print(f"[yellow]~ {key}[/yellow]: {escape(', '.join(change.fields))}")
+            if details:
+                for field in change.fields:
+                    left = json.dumps(change.reference.get(field), default=str)
+                    right = json.dumps(change.compared.get(field), default=str)
+                    console.print(f"    {escape(field)}: [red]{escape(left)}[/red] -> [green]{escape(right)}[/green]", highlight=False)
@@ -1,6 +1,7 @@
 from rich.console import Console
 
 from arangodb.connection import Connection
+from arangodb.settings import DEFAULT_BACKOFF_FACTOR, DEFAULT_POOL_SIZE, DEFAULT_REQUEST_TIMEOUT, DEFAULT_RETRY_ATTEMPTS
 
 
 class CreateConnectionCommand:
@@ -11,8 +12,24 @@ class CreateConnectionCommand:
         database: str,
         username: str | None = None,
         password: str | None = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        retry_attempts: int = DEFAULT_RETRY_ATTEMPTS,
+        backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+        auth_method: str = "jwt",
     ):
-        connection = Connection(name=name, url=url, database=database, username=username, password=password)
+        connection = Connection(
+            name=name,
+            url=url,
+            database=database,
+            username=username,
+            password=password,
+            pool_size=pool_size,
+            request_timeout=request_timeout,
+            retry_attempts=retry_attempts,
+            backoff_factor=backoff_factor,
+            auth_method=auth_method,
+        )
         connection.save()
         console = Console()
         console.print(f"[green]Connection [bold]{name}[/bold] created[/green]")
@@ -1,19 +1,52 @@
+import threading
+
+from arangodb.arango_client import DEFAULT_BATCH_SIZE
 from arangodb.connection import Connection
-from export_manager import ExportManager
+from dump_io import DEFAULT_BUFFER_SIZE
+from export_manager import ExportManager, MemoryBudget
 from rich.progress import Progress
 
 
 class DumpCommand:
     @staticmethod
-    def execute(connection_name: str, output_dir: str):
+    def execute(
+        connection_name: str,
+        output_dir: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        file_format: str = "json",
+        compress: str = "none",
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        jobs: int = 1,
+        max_in_flight: int | None = None,
+        max_memory: int | None = None,
+        scan_jobs: int = 1,
+        incremental: bool = False,
+    ):
         connection = Connection.get(connection_name)
-        connection.get_client()
+        client = connection.get_client()
 
-        manager = ExportManager(connection.get_client(), output_dir)
+        manager = ExportManager(
+            client,
+            output_dir,
+            batch_size,
+            file_format,
+            compress,
+            buffer_size,
+            jobs,
+            MemoryBudget(max_in_flight, max_memory),
+            scan_jobs,
+        )
         with Progress() as progress:
-            task = progress.add_task(
-                "[green]Exporting...",
-                total=len(connection.get_client().get_all_collections()),
-            )
-            while not progress.finished:
-                manager.make_migration_files(lambda: progress.update(task, advance=1))
+            collections = client.get_all_collections()
+            task = progress.add_task("[green]Exporting...", total=len(collections))
+            collection_tasks = {c["name"]: progress.add_task(f"[cyan]{c['name']}", total=client.count(c["name"]), visible=False) for c in collections}
+            lock = threading.Lock()
+
+            def on_documents_exported(collection_name: str, count: int) -> None:
+                with lock:
+                    collection_task = collection_tasks[collection_name]
+                    progress.update(collection_task, advance=count, visible=True)
+                    if progress.tasks[collection_task].finished:
+                        progress.update(collection_task, visible=False)
+
+            manager.make_migration_files(lambda: progress.update(task, advance=1), on_documents_exported, incremental)
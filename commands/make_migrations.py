@@ -1,82 +1,262 @@
 import os
 import re
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from rich.progress import Progress
 
-from deepdiff import DeepDiff, Delta
 from rich.console import Console
+from rich.markup import escape
 
+from arangodb.arango_client import DEFAULT_BATCH_SIZE, SharedChecks
+from arangodb.checksum_cache import ChecksumCache
 from arangodb.connection import Connection
+from arangodb.dump_client import DumpClient, DumpConnection
+from arangodb.fingerprint_index import FingerprintIndex
+from diff.document_diff import DocumentDiff
+from diff.excluded_fields import ExcludedFields
+from diff.external_diff import ExternalDiff
+from diff.fingerprint_diff import FingerprintDiff
+from diff.range_diff import RangeDiff
+from diff.shared_reference import SharedReference, iter_fingerprints
+from migration.actions_file import write_actions_file
+from metrics import METRICS
 from migration.arango_migration_creator import MigrationCreator
 
 
+def target_paths(path: str, target_names: Sequence[str]) -> list[str]:
+    """
+    Paths of the outputs of the targets, the file name of every target gets its sanitized name appended.
+    A single target writes to the path itself.
+    """
+    if len(target_names) == 1:
+        return [path]
+
+    root, ext = os.path.splitext(path)
+    paths = []
+    for target_name in target_names:
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", os.path.basename(os.path.normpath(target_name))) or "target"
+        candidate, number = f"{root}_{name}{ext}", 1
+        while candidate in paths:
+            number += 1
+            candidate = f"{root}_{name}_{number}{ext}"
+        paths.append(candidate)
+    return paths
+
+
 class MakeMigrationsCommand:
     @staticmethod
-    def execute(output_dir: str, reference_connection_name: str, compared_connection_name: str, template: str):
+    def execute(
+        output_dir: str,
+        reference_connection_name: str,
+        compared_connection_names: str | Sequence[str],
+        template: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        jobs: int = 1,
+        exclude: tuple[str, ...] = (),
+        range_diff: bool = False,
+        scan_jobs: int = 1,
+        use_cache: bool = True,
+        cache_ttl: int | None = None,
+        chunk_actions: int | None = None,
+        chunk_bytes: int | None = None,
+        actions_memory: int | None = None,
+        actions_file: str | None = None,
+        target_jobs: int = 1,
+        use_fingerprint_index: bool = False,
+        diff_memory: int | None = None,
+    ):
+        """
+        Makes the migration of every compared connection to the reference.
+        With several targets the checks and the document hashes of the reference are taken once and shared,
+        up to `target_jobs` targets are processed at the same time and every target gets its own files, see `target_paths`.
+        With `use_fingerprint_index` the document hashes are kept between runs and only documents whose `_rev` changed are downloaded.
+        With `diff_memory` the documents are read unordered and sorted on disk, for collections larger than the memory.
+        """
+        if isinstance(compared_connection_names, str):
+            compared_connection_names = [compared_connection_names]
+
         console = Console()
+        excluded = ExcludedFields.parse(exclude)
+        output_paths = target_paths(output_dir, compared_connection_names)
+        actions_paths = target_paths(actions_file, compared_connection_names) if actions_file is not None else [None] * len(output_paths)
+
         with Progress() as progress:
-            reference_connection = Connection.get(reference_connection_name)
-            compared_connection = Connection.get(compared_connection_name)
+            reference_connection = Connection.resolve(reference_connection_name)
+            compared_connections = [Connection.resolve(name) for name in compared_connection_names]
+
+            checksum_cache = ChecksumCache(ttl=cache_ttl) if use_cache else None
+            fingerprint_index = FingerprintIndex() if use_fingerprint_index else None
+            for connection in [reference_connection, *compared_connections]:
+                connection.get_client().checksum_cache = checksum_cache
+                connection.get_client().fingerprint_index = fingerprint_index
+
+            shared = SharedChecks()
+            shared_reference = None
+            if len(compared_connections) > 1 and not range_diff:
+                shared_reference = SharedReference(reference_connection.get_client(), excluded, batch_size, scan_jobs)
+
+            make_target = partial(
+                MakeMigrationsCommand.__make_target,
+                progress=progress,
+                reference_connection=reference_connection,
+                shared=shared,
+                shared_reference=shared_reference,
+                use_fingerprint_index=use_fingerprint_index,
+                template=template,
+                batch_size=batch_size,
+                jobs=jobs,
+                excluded=excluded,
+                range_diff=range_diff,
+                scan_jobs=scan_jobs,
+                chunk_actions=chunk_actions,
+                chunk_bytes=chunk_bytes,
+                actions_memory=actions_memory,
+                diff_memory=diff_memory,
+            )
+            try:
+                with ThreadPoolExecutor(max_workers=max(1, min(target_jobs, len(compared_connections)))) as pool:
+                    futures = [
+                        pool.submit(make_target, name, connection, output_path, actions_path)
+                        for name, connection, output_path, actions_path in zip(
+                            compared_connection_names, compared_connections, output_paths, actions_paths
+                        )
+                    ]
+                    equal = [future.result() for future in futures]
+            finally:
+                if shared_reference is not None:
+                    shared_reference.close()
+
+            if checksum_cache is not None:
+                checksum_cache.evict()
+            if fingerprint_index is not None:
+                fingerprint_index.evict()
+                fingerprint_index.close()
+
+            progress.stop()
+
+        for name, output_path, target_equal in zip(compared_connection_names, output_paths, equal):
+            prefix = f"[bold]{escape(name)}[/bold]: " if len(compared_connections) > 1 else ""
+            if target_equal:
+                console.print(f"{prefix}[green]Collections are equal[/green]")
+            elif prefix:
+                console.print(f"{prefix}migration written to {escape(output_path)}")
 
-            collections_len = len(compared_connection.get_client().get_all_collections())
+    @staticmethod
+    def __make_target(
+        compared_connection_name: str,
+        compared_connection: Connection | DumpConnection,
+        output_path: str,
+        actions_path: str | None,
+        progress: Progress,
+        reference_connection: Connection | DumpConnection,
+        shared: SharedChecks,
+        shared_reference: SharedReference | None,
+        use_fingerprint_index: bool,
+        template: str,
+        batch_size: int,
+        jobs: int,
+        excluded: ExcludedFields,
+        range_diff: bool,
+        scan_jobs: int,
+        chunk_actions: int | None,
+        chunk_bytes: int | None,
+        actions_memory: int | None,
+        diff_memory: int | None,
+    ) -> bool:
+        """Makes the migration of one target, returns whether its collections are equal to the reference."""
+        collections_len = len(compared_connection.get_client().get_all_collections())
 
-            task = progress.add_task("[green]Comparing...", total=collections_len + 1)
-            progress.update(task, advance=1)
+        task = progress.add_task(f"[green]Comparing {escape(compared_connection_name)}...", total=collections_len + 1)
+        progress.update(task, advance=1)
 
-            while not progress.finished:
-                [mismatches, create, delete] = reference_connection.get_client().compare_collections(compared_connection.get_client(), lambda: None)
+        with METRICS.phase("compare"):
+            [mismatches, create, delete] = reference_connection.get_client().compare_collections(
+                compared_connection.get_client(),
+                lambda: None,
+                jobs,
+                shared=shared,
+                excluded=excluded,
+            )
 
-                if len(mismatches) == 0:
-                    progress.stop()
-                    return console.print("[green]Collections are equal[/green]")
+        if len(mismatches) == 0:
+            progress.update(task, completed=collections_len + 1)
+            return True
 
-                progress.update(task, advance=collections_len - len(mismatches))
+        progress.update(task, advance=collections_len - len(mismatches))
 
-                migration_creator = MigrationCreator(create, delete, template)
+        migration_creator = MigrationCreator(create, delete, template, actions_memory)
 
-                for mismatch in mismatches:
-                    migration_creator.add_diff(
+        try:
+            for mismatch in mismatches:
+                excluded_fields = excluded.of(mismatch["name"])
+                # The documents are read with the excluded attributes, they are not compared but created documents must be complete.
+                if range_diff:
+                    diff = RangeDiff(
+                        reference_connection.get_client(),
+                        compared_connection.get_client(),
                         mismatch["name"],
-                        Delta(
-                            MakeMigrationsCommand.__get_diff(
-                                reference_connection.get_client().get_all_documents(mismatch["name"]),
-                                compared_connection.get_client().get_all_documents(mismatch["name"]),
-                            )
-                        ).to_flat_dicts(),
+                        excluded_fields,
+                        batch_size=batch_size,
                     )
-                    progress.update(task, advance=1)
-
-                for create_collection in create:
-                    migration_creator.add_diff(
-                        create_collection["name"],
-                        Delta(
-                            MakeMigrationsCommand.__get_diff(
-                                [],
-                                compared_connection.get_client().get_all_documents(create_collection["name"]),
-                            )
-                        ).to_flat_dicts(),
+                elif shared_reference is not None:
+                    diff = shared_reference.diff(compared_connection.get_client(), mismatch["name"])
+                elif use_fingerprint_index or MakeMigrationsCommand.__has_fingerprints(
+                    reference_connection, compared_connection, mismatch["name"], excluded
+                ):
+                    diff = FingerprintDiff(
+                        mismatch["name"],
+                        iter_fingerprints(reference_connection.get_client(), mismatch["name"], excluded_fields, batch_size, scan_jobs),
+                        iter_fingerprints(compared_connection.get_client(), mismatch["name"], excluded_fields, batch_size, scan_jobs),
+                        lambda keys, name=mismatch["name"]: reference_connection.get_client().fetch_documents(name, keys),
+                        lambda keys, name=mismatch["name"]: compared_connection.get_client().fetch_documents(name, keys),
+                        excluded_fields,
                     )
+                elif diff_memory is not None:
+                    diff = ExternalDiff(
+                        mismatch["name"],
+                        reference_connection.get_client().iter_documents(mismatch["name"], batch_size, parallel=scan_jobs, ordered=False),
+                        compared_connection.get_client().iter_documents(mismatch["name"], batch_size, parallel=scan_jobs, ordered=False),
+                        excluded_fields,
+                        diff_memory,
+                    )
+                else:
+                    diff = DocumentDiff(
+                        mismatch["name"],
+                        reference_connection.get_client().iter_documents(mismatch["name"], batch_size, parallel=scan_jobs),
+                        compared_connection.get_client().iter_documents(mismatch["name"], batch_size, parallel=scan_jobs),
+                        excluded_fields,
+                    )
+                migration_creator.add_actions(diff.actions(), mismatch["name"])
+                progress.update(task, advance=1)
 
-                progress.stop()
-
-                MakeMigrationsCommand.create_and_write_file(output_dir, migration_creator.create_migration())
+            # Created collections are copied with every attribute.
+            for create_collection in create:
+                migration_creator.add_actions(
+                    DocumentDiff(
+                        create_collection["name"],
+                        [],
+                        compared_connection.get_client().iter_documents(create_collection["name"], batch_size, parallel=scan_jobs),
+                        excluded.of(create_collection["name"]),
+                    ).actions(),
+                    create_collection["name"],
+                )
 
-    @staticmethod
-    def __get_diff(
-        left: list,
-        right: list,
-    ) -> DeepDiff:
-        exclude_rev = re.compile(r"root\[[A-z0-9\/'-\.]+\]\['_rev'\]")
-        exclude_key = re.compile(r"root\[[A-z0-9\/']+\-\.]\['_key'\]")
-
-        return DeepDiff(
-            {item["_id"]: item for item in left},
-            {item["_id"]: item for item in right},
-            exclude_regex_paths=[exclude_rev, exclude_key],
-            verbose_level=2,
-        )
+            migration_creator.write_migration(output_path, chunk_actions, chunk_bytes)
+            if actions_path is not None:
+                with METRICS.phase("actions_file"):
+                    write_actions_file(actions_path, migration_creator.actions)
+        finally:
+            migration_creator.close()
+        return False
 
     @staticmethod
-    def create_and_write_file(file_path: str, data: str) -> None:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w") as file:
-            file.write(data)
+    def __has_fingerprints(
+        reference_connection: Connection | DumpConnection,
+        compared_connection: Connection | DumpConnection,
+        collection_name: str,
+        excluded: ExcludedFields,
+    ) -> bool:
+        """Both sides are indexed dumps, their content hashes were taken with the default excluded attributes only."""
+        clients = [reference_connection.get_client(), compared_connection.get_client()]
+        return excluded.is_default(collection_name) and all(isinstance(c, DumpClient) and c.has_index(collection_name) for c in clients)
@@ -0,0 +1,37 @@
+import threading
+
+from rich.progress import Progress
+
+from arangodb.arango_client import DEFAULT_BATCH_SIZE
+from arangodb.connection import Connection
+from import_manager import ImportManager
+
+
+class RestoreCommand:
+    @staticmethod
+    def execute(
+        connection_name: str,
+        input_dir: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        jobs: int = 1,
+        on_duplicate: str = "replace",
+    ):
+        connection = Connection.get(connection_name)
+        manager = ImportManager(connection.get_client(), input_dir, batch_size, jobs, on_duplicate)
+
+        with Progress() as progress:
+            collections = manager.dump.get_all_collections()
+            task = progress.add_task("[green]Restoring...", total=len(collections))
+            collection_tasks = {
+                c["name"]: progress.add_task(f"[cyan]{c['name']}", total=manager.dump.count(c["name"]), visible=False) for c in collections
+            }
+            lock = threading.Lock()
+
+            def on_documents_restored(collection_name: str, count: int) -> None:
+                with lock:
+                    collection_task = collection_tasks[collection_name]
+                    progress.update(collection_task, advance=count, visible=True)
+                    if progress.tasks[collection_task].finished:
+                        progress.update(collection_task, visible=False)
+
+            manager.restore(lambda: progress.update(task, advance=1), on_documents_restored)
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from string import ascii_lowercase, ascii_uppercase
+from collections.abc import Callable, Iterable, Iterator
+from typing import TypeVar
+
+from migration.action import Action, ActionType
+
+DEFAULT_EXCLUDED_FIELDS = ("_rev", "_key")
+# Characters other than letters in the order of the ICU root collation the server compares strings with, `SORT d._key` included.
+# Letters follow them, a letter and its upper case differ only when the keys are otherwise equal, the lower case first.
+COLLATION_SYMBOLS = " _-,;:!?.'\"()[]{}@*/\\&#%`^+<=>|~$0123456789"
+_PRIMARY_WEIGHTS = {ord(c): chr(0x20 + i) for i, c in enumerate(COLLATION_SYMBOLS)} | {
+    ord(c): chr(0x20 + len(COLLATION_SYMBOLS) + i) for letters in (ascii_lowercase, ascii_uppercase) for i, c in enumerate(letters)
+}
+_CASE_WEIGHTS = {c: "\x02" if chr(c) in ascii_uppercase else "\x01" for c in _PRIMARY_WEIGHTS}
+
+T = TypeVar("T")
+
+
+def key_order(key: str) -> str:
+    """
+    Returns a string whose code point order is the order of the keys on the server, where `"apple"` sorts before `"Banana"`
+    and `"a-b"` before `"ab"`. Every `_key` compared on the client is compared by it, so merge-joins of server cursors,
+    dump files and local indexes agree with the server. Characters which are not allowed in `_key` sort last by code point.
+    """
+    return key.translate(_PRIMARY_WEIGHTS) + "\x00" + key.translate(_CASE_WEIGHTS)
+
+
+def document_hash(document: dict, excluded_fields: Iterable[str] = DEFAULT_EXCLUDED_FIELDS) -> str:
+    """
+    Returns the content hash of the document.
+    Excluded fields are not taken into account, the attributes order does not matter.
+    """
+    content = {k: v for k, v in document.items() if k not in excluded_fields}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
+
+
+def changed_fields(left: dict, right: dict, excluded_fields: frozenset[str]) -> list[str]:
+    """Returns the top level attributes which differ between the documents, added and removed ones included."""
+    fields = (left.keys() | right.keys()) - excluded_fields
+    return sorted(f for f in fields if f not in left or f not in right or left[f] != right[f])
+
+
+def ensure_sorted(items: Iterable[T], key: Callable[[T], str], name: str) -> Iterator[tuple[str, T]]:
+    """
+    Yields every item with the `key_order` of its key, fails if the items are not sorted by `_key` in the server order,
+    a merge-join would be wrong otherwise.
+    """
+    previous = None
+    for item in items:
+        current = key_order(key(item))
+        if previous is not None and current <= previous[0]:
+            raise Exception(f"Documents of {name} are not sorted by _key: {previous[1]!r} before {key(item)!r}")
+        previous = current, key(item)
+        yield current, item
+
+
+def fingerprints_checksum(fingerprints: Iterable[tuple[str, str]]) -> str:
+    """Returns the checksum of a collection from its `(key, content hash)` pairs in the `_key` order."""
+    checksum = hashlib.sha1()
+    for key, content_hash in fingerprints:
+        checksum.update(f"{key}:{content_hash}\n".encode())
+    return checksum.hexdigest()
+
+
+class DocumentChange:
+    """
+    A document that differs between the reference and the compared collection.
+
+    Args:
+        key (str): The document key.
+        reference (dict, optional): The document in the reference collection. None if the document was added.
+        compared (dict, optional): The document in the compared collection. None if the document was removed.
+        fields (list[str]): Changed attributes, empty for added and removed documents.
+    """
+
+    __slots__ = ("compared", "fields", "key", "reference")
+
+    def __init__(self, key: str, reference: dict | None, compared: dict | None, fields: list[str]):
+        self.key = key
+        self.reference = reference
+        self.compared = compared
+        self.fields = fields
+
+    def to_action(self, collection_name: str) -> Action:
+        if self.reference is None:
+            return Action(ActionType.DOCUMENT_CREATE, {"value": self.compared}, collection_name)
+        if self.compared is None:
+            return Action(ActionType.DOCUMENT_DELETE, {"value": self.reference}, collection_name)
+
+        return Action(
+            ActionType.DOCUMENT_UPDATE,
+            {"id": self.compared["_id"], "value": {field: self.compared.get(field) for field in self.fields}},
+            collection_name,
+        )
+
+    def __repr__(self):
+        return f"{self.key} - {self.fields}"
+
+
+class DocumentDiff:
+    """
+    Diff of two collections merge-joined by `_key`.
+    Both streams must be sorted by `_key` in the server order, see `key_order`. Documents are compared by content hash,
+    the attributes are compared only for documents whose hashes differ.
+    Removed attributes are reported with None value, so the update unsets them.
+
+    Args:
+        collection_name (str): The name of the collection.
+        reference (Iterable[dict]): Documents of the reference collection.
+        compared (Iterable[dict]): Documents of the compared collection.
+        excluded_fields (Iterable[str]): Attributes which are not compared.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        reference: Iterable[dict],
+        compared: Iterable[dict],
+        excluded_fields: Iterable[str] = DEFAULT_EXCLUDED_FIELDS,
+    ):
+        self.collection_name = collection_name
+        self.reference = reference
+        self.compared = compared
+        self.excluded_fields = frozenset(excluded_fields)
+
+    def actions(self) -> Iterator[Action]:
+        """Yields migration actions which turn the reference collection into the compared one."""
+        for change in self.changes():
+            yield change.to_action(self.collection_name)
+
+    def changes(self) -> Iterator[DocumentChange]:
+        """Yields the differing documents in the `_key` order."""
+        reference = self.__sorted(self.reference, "reference")
+        compared = self.__sorted(self.compared, "compared")
+        left_order, left = next(reference, (None, None))
+        right_order, right = next(compared, (None, None))
+
+        while left is not None or right is not None:
+            if right is None or (left is not None and left_order < right_order):
+                yield DocumentChange(left["_key"], left, None, [])
+                left_order, left = next(reference, (None, None))
+            elif left is None or right_order < left_order:
+                yield DocumentChange(right["_key"], None, right, [])
+                right_order, right = next(compared, (None, None))
+            else:
+                if document_hash(left, self.excluded_fields) != document_hash(right, self.excluded_fields):
+                    fields = changed_fields(left, right, self.excluded_fields)
+                    if fields:
+                        yield DocumentChange(left["_key"], left, right, fields)
+                left_order, left = next(reference, (None, None))
+                right_order, right = next(compared, (None, None))
+
+    def __sorted(self, documents: Iterable[dict], side: str) -> Iterator[tuple[str, dict]]:
+        return ensure_sorted(documents, lambda d: d["_key"], f"{self.collection_name} ({side})")
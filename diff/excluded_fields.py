@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+from diff.document_diff import DEFAULT_EXCLUDED_FIELDS
+
+
+class ExcludedFields:
+    """
+    Attributes which are not compared, the default ones, those of every collection and those of single collections.
+
+    Args:
+        common (Iterable[str]): Attributes excluded in every collection.
+        by_collection (dict[str, Iterable[str]], optional): Attributes excluded in one collection, by collection name.
+    """
+
+    def __init__(self, common: Iterable[str] = (), by_collection: dict[str, Iterable[str]] | None = None):
+        self.common = tuple(common)
+        self.by_collection = {name: tuple(fields) for name, fields in (by_collection or {}).items()}
+
+    @staticmethod
+    def parse(values: Iterable[str]) -> ExcludedFields:
+        """Reads the values of the `--exclude` option, `attribute` for every collection or `collection:attribute` for one."""
+        common = []
+        by_collection: dict[str, list[str]] = {}
+        for value in values:
+            collection_name, separator, field = value.partition(":")
+            if separator:
+                by_collection.setdefault(collection_name, []).append(field)
+            else:
+                common.append(value)
+        return ExcludedFields(common, by_collection)
+
+    def of(self, collection_name: str) -> tuple[str, ...]:
+        """Returns the attributes excluded in the collection, the default ones included."""
+        return tuple(dict.fromkeys((*DEFAULT_EXCLUDED_FIELDS, *self.common, *self.by_collection.get(collection_name, ()))))
+
+    def is_default(self, collection_name: str) -> bool:
+        """Only the default attributes are excluded in the collection, built-in checksums and dump indexes can be used."""
+        return set(self.of(collection_name)) == set(DEFAULT_EXCLUDED_FIELDS)
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import heapq
+import json
+import mmap
+import os
+import shutil
+import tempfile
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+from diff.document_diff import DEFAULT_EXCLUDED_FIELDS, DocumentChange, changed_fields, document_hash, key_order
+from migration.action import Action
+
+# Memory of one run entry besides its key and hash, the tuple and the objects it holds.
+ENTRY_OVERHEAD = 200
+# Number of runs merged at once, more runs are merged in several passes.
+MAX_MERGE_RUNS = 64
+
+# `(key, content hash, offset, length)` of a document in the data file of its side.
+Entry = tuple[str, str, int, int]
+
+
+class SpilledSide:
+    """
+    One side of an `ExternalDiff`, the documents read in any order and held on disk.
+    Every document is appended to a data file, its entry is kept in memory until the entries take `max_memory` bytes,
+    then they are sorted by `key_order` and written as a run. The runs are merged into one stream ordered by `_key`.
+
+    Args:
+        documents (Iterable[dict]): The documents, in any order.
+        directory (str): Directory of the data file and the runs.
+        excluded_fields (Iterable[str]): Attributes left out of the content hash.
+        max_memory (int): Bytes of entries held in memory.
+    """
+
+    def __init__(self, documents: Iterable[dict], directory: str, excluded_fields: Iterable[str], max_memory: int):
+        self.documents = documents
+        self.directory = directory
+        self.excluded_fields = frozenset(excluded_fields)
+        self.max_memory = max_memory
+        self.data_path = os.path.join(directory, "documents.jsonl")
+        self.runs: list[str] = []
+        self.__written_runs = 0
+        self.__data: mmap.mmap | None = None
+
+    def spool(self) -> None:
+        """Writes the documents and the sorted runs of their entries."""
+        os.makedirs(self.directory, exist_ok=True)
+        entries: list[Entry] = []
+        memory = 0
+        offset = 0
+        with open(self.data_path, "wb") as data:
+            for document in self.documents:
+                encoded = json.dumps(document, separators=(",", ":"), default=str).encode()
+                data.write(encoded + b"\n")
+                entry = (document["_key"], document_hash(document, self.excluded_fields), offset, len(encoded))
+                entries.append(entry)
+                offset += len(encoded) + 1
+                memory += len(entry[0]) + len(entry[1]) + ENTRY_OVERHEAD
+                if memory >= self.max_memory:
+                    self.runs.append(self.__write_run(entries))
+                    entries = []
+                    memory = 0
+        if entries or not self.runs:
+            self.runs.append(self.__write_run(entries))
+
+        while len(self.runs) > MAX_MERGE_RUNS:
+            merged = []
+            for i in range(0, len(self.runs), MAX_MERGE_RUNS):
+                runs = self.runs[i : i + MAX_MERGE_RUNS]
+                merged.append(self.__write_run_from(self.__merge(runs)))
+                for path in runs:
+                    os.remove(path)
+            self.runs = merged
+
+    def entries(self) -> Iterator[Entry]:
+        """Streams the entries of all runs ordered by `_key`."""
+        return self.__merge(self.runs)
+
+    def read(self, entry: Entry) -> dict:
+        """Reads the document of the entry back from the memory-mapped data file."""
+        if self.__data is None:
+            with open(self.data_path, "rb") as f:
+                self.__data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return json.loads(self.__data[entry[2] : entry[2] + entry[3]])
+
+    def close(self) -> None:
+        if self.__data is not None:
+            self.__data.close()
+            self.__data = None
+
+    def __write_run(self, entries: list[Entry]) -> str:
+        entries.sort(key=lambda e: key_order(e[0]))
+        return self.__write_run_from(iter(entries))
+
+    def __write_run_from(self, entries: Iterator[Entry]) -> str:
+        path = os.path.join(self.directory, f"run-{self.__written_runs:06}.tsv")
+        self.__written_runs += 1
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(f"{key}\t{content_hash}\t{offset}\t{length}\n" for key, content_hash, offset, length in entries)
+        return path
+
+    def __merge(self, runs: list[str]) -> Iterator[Entry]:
+        files = [open(path, encoding="utf-8") for path in runs]
+        try:
+            yield from heapq.merge(*(self.__read_run(f) for f in files), key=lambda e: key_order(e[0]))
+        finally:
+            for f in files:
+                f.close()
+
+    @staticmethod
+    def __read_run(f) -> Iterator[Entry]:
+        for line in f:
+            key, content_hash, offset, length = line.rstrip("\n").split("\t")
+            yield key, content_hash, int(offset), int(length)
+
+
+class ExternalDiff:
+    """
+    Diff of two collections within a fixed memory budget, for collections larger than the memory.
+    The documents of both sides are read in any order, so parallel cursors need not be merged in the `_key` order.
+    They are spilled to disk with their `(key, content hash)` entries sorted externally, see `SpilledSide`.
+    The entries are merge-joined by `_key` and only the documents whose hashes differ are read back from the spill files.
+
+    Args:
+        collection_name (str): The name of the collection.
+        reference (Iterable[dict]): Documents of the reference collection, in any order.
+        compared (Iterable[dict]): Documents of the compared collection, in any order.
+        excluded_fields (Iterable[str]): Attributes which are not compared.
+        max_memory (int): Bytes of entries held in memory by each side.
+        spill_dir (str, optional): Directory of the temporary files, the system default if None.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        reference: Iterable[dict],
+        compared: Iterable[dict],
+        excluded_fields: Iterable[str] = DEFAULT_EXCLUDED_FIELDS,
+        max_memory: int = 64 * 1024 * 1024,
+        spill_dir: str | None = None,
+    ):
+        self.collection_name = collection_name
+        self.reference = reference
+        self.compared = compared
+        self.excluded_fields = frozenset(excluded_fields)
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+
+    def actions(self) -> Iterator[Action]:
+        """Yields migration actions which turn the reference collection into the compared one."""
+        for change in self.changes():
+            yield change.to_action(self.collection_name)
+
+    def changes(self) -> Iterator[DocumentChange]:
+        """Yields the differing documents in the `_key` order."""
+        directory = tempfile.mkdtemp(prefix="migrango-diff-", dir=self.spill_dir)
+        reference = SpilledSide(self.reference, os.path.join(directory, "reference"), self.excluded_fields, self.max_memory)
+        compared = SpilledSide(self.compared, os.path.join(directory, "compared"), self.excluded_fields, self.max_memory)
+        try:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                for spooled in [pool.submit(reference.spool), pool.submit(compared.spool)]:
+                    spooled.result()
+
+            yield from self.__merge_join(reference, compared)
+        finally:
+            reference.close()
+            compared.close()
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def __merge_join(self, reference: SpilledSide, compared: SpilledSide) -> Iterator[DocumentChange]:
+        left_entries = reference.entries()
+        right_entries = compared.entries()
+        try:
+            left = next(left_entries, None)
+            right = next(right_entries, None)
+
+            while left is not None or right is not None:
+                if right is None or (left is not None and key_order(left[0]) < key_order(right[0])):
+                    yield DocumentChange(left[0], reference.read(left), None, [])
+                    left = next(left_entries, None)
+                elif left is None or key_order(right[0]) < key_order(left[0]):
+                    yield DocumentChange(right[0], None, compared.read(right), [])
+                    right = next(right_entries, None)
+                else:
+                    if left[1] != right[1]:
+                        left_document = reference.read(left)
+                        right_document = compared.read(right)
+                        fields = changed_fields(left_document, right_document, self.excluded_fields)
+                        if fields:
+                            yield DocumentChange(left[0], left_document, right_document, fields)
+                    left = next(left_entries, None)
+                    right = next(right_entries, None)
+        finally:
+            left_entries.close()
+            right_entries.close()
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Iterator
+
+from diff.document_diff import DEFAULT_EXCLUDED_FIELDS, DocumentChange, changed_fields, ensure_sorted
+from migration.action import Action
+
+DEFAULT_FETCH_BATCH = 1000
+
+
+class FingerprintDiff:
+    """
+    Diff of two collections from their `(key, content hash)` fingerprints merge-joined by `_key`.
+    Both fingerprint streams must be sorted by `_key` in the server order, see `key_order`, and hashed with the same excluded attributes.
+    The documents are fetched only for the keys whose hashes differ, `fetch_batch` keys at once.
+
+    Args:
+        collection_name (str): The name of the collection.
+        reference (Iterable[tuple[str, str]]): Fingerprints of the reference collection.
+        compared (Iterable[tuple[str, str]]): Fingerprints of the compared collection.
+        fetch_reference (Callable): Returns the reference documents of the given keys by key.
+        fetch_compared (Callable): Returns the compared documents of the given keys by key.
+        excluded_fields (Iterable[str]): Attributes which are not compared.
+        fetch_batch (int): Number of keys fetched at once.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        reference: Iterable[tuple[str, str]],
+        compared: Iterable[tuple[str, str]],
+        fetch_reference: Callable[[list[str]], dict[str, dict]],
+        fetch_compared: Callable[[list[str]], dict[str, dict]],
+        excluded_fields: Iterable[str] = DEFAULT_EXCLUDED_FIELDS,
+        fetch_batch: int = DEFAULT_FETCH_BATCH,
+    ):
+        self.collection_name = collection_name
+        self.reference = reference
+        self.compared = compared
+        self.fetch_reference = fetch_reference
+        self.fetch_compared = fetch_compared
+        self.excluded_fields = frozenset(excluded_fields)
+        self.fetch_batch = fetch_batch
+
+    def actions(self) -> Iterator[Action]:
+        """Yields migration actions which turn the reference collection into the compared one."""
+        for change in self.changes():
+            yield change.to_action(self.collection_name)
+
+    def changes(self) -> Iterator[DocumentChange]:
+        """Yields the differing documents in the `_key` order."""
+        batch = []
+        for difference in self.__differing_keys():
+            batch.append(difference)
+            if len(batch) >= self.fetch_batch:
+                yield from self.__resolve(batch)
+                batch = []
+        if batch:
+            yield from self.__resolve(batch)
+
+    def __differing_keys(self) -> Iterator[tuple[str, bool, bool]]:
+        """Yields `(key, in reference, in compared)` of the keys whose fingerprints differ."""
+        reference = ensure_sorted(self.reference, lambda f: f[0], f"{self.collection_name} (reference)")
+        compared = ensure_sorted(self.compared, lambda f: f[0], f"{self.collection_name} (compared)")
+        left_order, left = next(reference, (None, None))
+        right_order, right = next(compared, (None, None))
+
+        while left is not None or right is not None:
+            if right is None or (left is not None and left_order < right_order):
+                yield left[0], True, False
+                left_order, left = next(reference, (None, None))
+            elif left is None or right_order < left_order:
+                yield right[0], False, True
+                right_order, right = next(compared, (None, None))
+            else:
+                if left[1] != right[1]:
+                    yield left[0], True, True
+                left_order, left = next(reference, (None, None))
+                right_order, right = next(compared, (None, None))
+
+    def __resolve(self, batch: list[tuple[str, bool, bool]]) -> Iterator[DocumentChange]:
+        reference = self.fetch_reference([key for key, in_reference, _ in batch if in_reference])
+        compared = self.fetch_compared([key for key, _, in_compared in batch if in_compared])
+
+        for key, _, _ in batch:
+            left = reference.get(key)
+            right = compared.get(key)
+            if left is not None and right is not None:
+                fields = changed_fields(left, right, self.excluded_fields)
+                if fields:
+                    yield DocumentChange(key, left, right, fields)
+            elif left is not None or right is not None:
+                yield DocumentChange(key, left, right, [])
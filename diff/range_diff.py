@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+from arangodb.arango_client import DEFAULT_BATCH_SIZE, FULL_RANGE, MAX_RANGE_BUCKETS, RANGE_BUCKET_SIZE, ArangoClient, KeyRange
+from diff.document_diff import DEFAULT_EXCLUDED_FIELDS, DocumentChange, DocumentDiff, key_order
+from migration.action import Action
+
+DEFAULT_FANOUT = 16
+DEFAULT_LEAF_SIZE = 1000
+
+
+class RangeDiff:
+    """
+    Diff of a collection which transfers only the `_key` ranges that differ.
+    The collection is split into buckets of about `bucket_size` documents, a hash of every range is calculated on both servers,
+    the ranges with different hashes are split again until they hold at most `leaf_size` documents.
+    Only the documents of the differing leaf ranges are downloaded and diffed with `DocumentDiff`.
+
+    Args:
+        reference (ArangoClient): The reference database.
+        compared (ArangoClient): The compared database.
+        collection_name (str): The name of the collection.
+        excluded_fields (Iterable[str]): Attributes which are not compared.
+        fanout (int): Number of sub-ranges a differing range is split into.
+        leaf_size (int): Ranges with at most this many documents on both sides are not split any more.
+        bucket_size (int): Documents per range of the first level.
+        batch_size (int): Number of documents fetched by the cursor in one round trip.
+    """
+
+    def __init__(
+        self,
+        reference: ArangoClient,
+        compared: ArangoClient,
+        collection_name: str,
+        excluded_fields: Iterable[str] = DEFAULT_EXCLUDED_FIELDS,
+        fanout: int = DEFAULT_FANOUT,
+        leaf_size: int = DEFAULT_LEAF_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        bucket_size: int = RANGE_BUCKET_SIZE,
+    ):
+        if not isinstance(reference, ArangoClient) or not isinstance(compared, ArangoClient):
+            raise Exception("Range diff compares two databases, it can not be used with a dump")
+
+        self.reference = reference
+        self.compared = compared
+        self.collection_name = collection_name
+        self.excluded_fields = sorted({"_rev", *excluded_fields})
+        self.fanout = fanout
+        self.leaf_size = leaf_size
+        self.batch_size = batch_size
+        self.bucket_size = bucket_size
+
+    def mismatched_ranges(self) -> list[KeyRange]:
+        """Returns the leaf ranges whose documents differ, in the `_key` order."""
+        leaves = []
+        pending = self.__buckets()
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            while pending:
+                reference_hashes = pool.submit(self.reference.get_range_hashes, self.collection_name, pending, self.excluded_fields)
+                compared_hashes = pool.submit(self.compared.get_range_hashes, self.collection_name, pending, self.excluded_fields)
+
+                split = []
+                for key_range, left, right in zip(pending, reference_hashes.result(), compared_hashes.result(), strict=True):
+                    if left == right:
+                        continue
+                    if max(left["count"], right["count"]) <= self.leaf_size:
+                        leaves.append(key_range)
+                        continue
+
+                    client = self.reference if left["count"] >= right["count"] else self.compared
+                    boundaries = client.get_key_boundaries(self.collection_name, self.fanout, key_range)
+                    if not boundaries:
+                        leaves.append(key_range)
+                        continue
+
+                    edges = [key_range[0], *boundaries, key_range[1]]
+                    split.extend(zip(edges, edges[1:]))
+                pending = split
+
+        return sorted(leaves, key=lambda r: (r[0] is not None, key_order(r[0] or "")))
+
+    def __buckets(self) -> list[KeyRange]:
+        """Splits the collection into the ranges of the first level by the keys of the larger side."""
+        reference_count = self.reference.count(self.collection_name)
+        compared_count = self.compared.count(self.collection_name)
+        parts = min(MAX_RANGE_BUCKETS, math.ceil(max(reference_count, compared_count) / self.bucket_size))
+        if parts < 2:
+            return [FULL_RANGE]
+
+        client = self.reference if reference_count >= compared_count else self.compared
+        return client.get_key_ranges(self.collection_name, parts)
+
+    def changes(self) -> Iterator[DocumentChange]:
+        """Yields the differing documents in the `_key` order, the excluded attributes are removed on the servers."""
+        return self.__changes(self.excluded_fields)
+
+    def actions(self) -> Iterator[Action]:
+        """
+        Yields migration actions which turn the reference collection into the compared one.
+        The documents are transferred with the excluded attributes, created documents must be complete.
+        """
+        for change in self.__changes(None):
+            yield change.to_action(self.collection_name)
+
+    def __changes(self, removed_fields: list[str] | None) -> Iterator[DocumentChange]:
+        for key_range in self.mismatched_ranges():
+            yield from DocumentDiff(
+                self.collection_name,
+                self.reference.iter_documents(self.collection_name, self.batch_size, key_range=key_range, excluded_fields=removed_fields),
+                self.compared.iter_documents(self.collection_name, self.batch_size, key_range=key_range, excluded_fields=removed_fields),
+                self.excluded_fields,
+            ).changes()
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import re
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING
+
+from arangodb.settings import DEFAULT_BATCH_SIZE
+from diff.document_diff import DEFAULT_EXCLUDED_FIELDS, DocumentDiff
+
+if TYPE_CHECKING:
+    from arangodb.arango_client import ArangoClient
+    from arangodb.dump_client import DumpClient
+
+# Hex digits of the key hash compared with the sample threshold, the smallest share of documents is 16^-8.
+SAMPLE_HASH_DIGITS = 8
+# Confidence of the drift rate bounds, 95% by default.
+DEFAULT_Z_SCORE = 1.96
+DEFAULT_EXAMPLES = 5
+
+
+def sample_threshold(rate: float) -> str | None:
+    """Returns the hash prefix below which a key is in the sample, None if every key is."""
+    if rate >= 1:
+        return None
+    return format(max(1, int(rate * 16**SAMPLE_HASH_DIGITS)), f"0{SAMPLE_HASH_DIGITS}x")
+
+
+def in_sample(key: str, seed: int, threshold: str | None) -> bool:
+    """The key is in the sample, the same test as the filter of `ArangoClient.iter_sample` on the server."""
+    return threshold is None or hashlib.sha1(f"{seed}:{key}".encode()).hexdigest()[: len(threshold)] < threshold
+
+
+def wilson_interval(hits: int, total: int, z: float = DEFAULT_Z_SCORE) -> tuple[float, float]:
+    """Returns the Wilson score interval of the share `hits / total`, it stays within [0, 1] for small samples and rare hits."""
+    if total == 0:
+        return 0.0, 1.0
+
+    share = hits / total
+    denominator = 1 + z * z / total
+    centre = (share + z * z / (2 * total)) / denominator
+    spread = z * math.sqrt(share * (1 - share) / total + z * z / (4 * total * total)) / denominator
+    return max(0.0, centre - spread), min(1.0, centre + spread)
+
+
+class SampleSize:
+    """
+    How many documents a sample holds, a share of the collection or a number of documents.
+
+    Args:
+        rate (float, optional): Share of the documents, from 0 to 1.
+        count (int, optional): Number of documents, the share is taken from the size of the collection.
+    """
+
+    def __init__(self, rate: float | None = None, count: int | None = None):
+        if (rate is None) == (count is None):
+            raise ValueError("A sample is either a rate or a number of documents")
+        self.rate = rate
+        self.count = count
+
+    @staticmethod
+    def parse(value: str) -> SampleSize:
+        """Reads `0.01` or `1%` as a rate and `10000` as a number of documents."""
+        value = value.strip()
+        if re.fullmatch(r"\d+", value):
+            if int(value) < 1:
+                raise ValueError(f"Sample of {value} documents, expected at least 1")
+            return SampleSize(count=int(value))
+
+        match = re.fullmatch(r"(\d*\.?\d+)(%?)", value)
+        if match is None:
+            raise ValueError(f"Sample {value} is neither a rate like 0.01 or 1% nor a number of documents")
+        rate = float(match.group(1)) / (100 if match.group(2) else 1)
+        if not 0 < rate <= 1:
+            raise ValueError(f"Sample rate {value} is not above 0 and at most 1")
+        return SampleSize(rate=rate)
+
+    def rate_of(self, total: int) -> float:
+        """Returns the share of a collection of `total` documents which the sample holds."""
+        if self.rate is not None:
+            return self.rate
+        return 1.0 if total <= self.count else self.count / total
+
+    def __str__(self):
+        return f"{self.rate:.4%}" if self.rate is not None else f"{self.count} documents"
+
+
+class SampleEstimate:
+    """
+    Drift of a collection estimated from a sample of its documents.
+
+    Args:
+        collection_name (str): The name of the collection.
+        count (int): Number of documents of the larger side.
+        sampled (int): Number of keys in the sample of either side.
+        differing (int): Number of sampled keys which are missing on a side or whose documents differ.
+        examples (list[str]): Some of the differing keys.
+    """
+
+    def __init__(self, collection_name: str, count: int, sampled: int, differing: int, examples: list[str]):
+        self.collection_name = collection_name
+        self.count = count
+        self.sampled = sampled
+        self.differing = differing
+        self.examples = examples
+
+    @property
+    def drift_rate(self) -> float:
+        return self.differing / self.sampled if self.sampled else 0.0
+
+    @property
+    def bounds(self) -> tuple[float, float]:
+        """Bounds of the drift rate at the confidence of `DEFAULT_Z_SCORE`."""
+        return wilson_interval(self.differing, self.sampled)
+
+    @property
+    def estimated_documents(self) -> tuple[int, int]:
+        """Bounds of the number of differing documents in the whole collection."""
+        low, high = self.bounds
+        return math.floor(low * self.count), math.ceil(high * self.count)
+
+    def __repr__(self):
+        return f"SampleEstimate({self.collection_name!r}, {self.differing}/{self.sampled})"
+
+
+class SampleDiff:
+    """
+    Approximate diff of a collection from a deterministic sample of its keys.
+    A key is in the sample if the SHA1 of the seed and the key starts below a threshold, so both sides pick the same keys
+    without exchanging them, the filter runs on the server and only the sampled documents are sent.
+
+    Args:
+        reference (ArangoClient | DumpClient): The reference database or dump.
+        compared (ArangoClient | DumpClient): The compared database or dump.
+        collection_name (str): The name of the collection.
+        sample (SampleSize): How many documents are sampled.
+        seed (int): Picks another sample of the same size.
+        excluded_fields (Iterable[str]): Attributes which are not compared.
+        batch_size (int): Number of documents fetched by the cursor in one round trip.
+        examples (int): Number of differing keys kept as examples.
+    """
+
+    def __init__(
+        self,
+        reference: ArangoClient | DumpClient,
+        compared: ArangoClient | DumpClient,
+        collection_name: str,
+        sample: SampleSize,
+        seed: int = 0,
+        excluded_fields: Iterable[str] = DEFAULT_EXCLUDED_FIELDS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        examples: int = DEFAULT_EXAMPLES,
+    ):
+        self.reference = reference
+        self.compared = compared
+        self.collection_name = collection_name
+        self.sample = sample
+        self.seed = seed
+        self.excluded_fields = tuple(excluded_fields)
+        self.batch_size = batch_size
+        self.examples = examples
+
+    def estimate(self) -> SampleEstimate:
+        count = max(self.reference.count(self.collection_name), self.compared.count(self.collection_name))
+        threshold = sample_threshold(self.sample.rate_of(count))
+
+        sampled = [0]
+        diff = DocumentDiff(
+            self.collection_name,
+            self.__counted(self.reference.iter_sample(self.collection_name, threshold, self.seed, self.batch_size, self.excluded_fields), sampled),
+            self.compared.iter_sample(self.collection_name, threshold, self.seed, self.batch_size, self.excluded_fields),
+            self.excluded_fields,
+        )
+
+        differing = 0
+        examples = []
+        for change in diff.changes():
+            differing += 1
+            if change.reference is None:
+                # Keys only in the compared sample are not counted by the reference side.
+                sampled[0] += 1
+            if len(examples) < self.examples:
+                examples.append(change.key)
+        return SampleEstimate(self.collection_name, count, sampled[0], differing, examples)
+
+    @staticmethod
+    def __counted(documents: Iterable[dict], counter: list[int]) -> Iterator[dict]:
+        for document in documents:
+            counter[0] += 1
+            yield document
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import threading
+from collections.abc import Iterable, Iterator
+
+from arangodb.arango_client import DEFAULT_BATCH_SIZE, ArangoClient
+from arangodb.dump_client import DumpClient
+from diff.document_diff import DEFAULT_EXCLUDED_FIELDS, document_hash
+from diff.excluded_fields import ExcludedFields
+from diff.fingerprint_diff import FingerprintDiff
+
+
+def has_fingerprints(client: ArangoClient | DumpClient, collection_name: str, excluded_fields: Iterable[str]) -> bool:
+    """The client is an indexed dump whose content hashes were taken with the excluded attributes."""
+    indexed = isinstance(client, DumpClient) and client.has_index(collection_name)
+    return indexed and set(excluded_fields) == set(DEFAULT_EXCLUDED_FIELDS)
+
+
+def iter_fingerprints(
+    client: ArangoClient | DumpClient,
+    collection_name: str,
+    excluded_fields: Iterable[str] = DEFAULT_EXCLUDED_FIELDS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    parallel: int = 1,
+) -> Iterator[tuple[str, str]]:
+    """
+    Streams `(key, content hash)` of the documents ordered by `_key`.
+    The index of a dump is used when it was hashed with the same excluded attributes,
+    a database hashes its documents, or uses its `fingerprint_index`.
+    """
+    excluded_fields = tuple(excluded_fields)
+    if has_fingerprints(client, collection_name, excluded_fields):
+        return client.iter_fingerprints(collection_name)
+    if isinstance(client, ArangoClient):
+        return client.iter_fingerprints(collection_name, excluded_fields, batch_size, parallel)
+
+    documents = client.iter_documents(collection_name, batch_size, parallel=parallel, excluded_fields=excluded_fields)
+    return ((d["_key"], document_hash(d, excluded_fields)) for d in documents)
+
+
+class SharedReference:
+    """
+    The reference side of the comparisons with several targets.
+    Every reference collection is read once, its fingerprints are spooled to a temporary file on the first use
+    and merge-joined from the file with every target. Reference documents are fetched by key only for the keys which differ.
+
+    Args:
+        client (ArangoClient | DumpClient): The reference database or dump.
+        excluded (ExcludedFields, optional): Attributes which are not compared, only the default ones if None.
+        batch_size (int): Number of documents fetched by the cursor in one round trip.
+        parallel (int): Number of cursors reading one collection at the same time.
+        spill_dir (str, optional): Directory of the temporary files, the system default if None.
+    """
+
+    def __init__(
+        self,
+        client: ArangoClient | DumpClient,
+        excluded: ExcludedFields | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        parallel: int = 1,
+        spill_dir: str | None = None,
+    ):
+        self.client = client
+        self.excluded = excluded or ExcludedFields()
+        self.batch_size = batch_size
+        self.parallel = parallel
+        self.spill_dir = spill_dir
+        self.__dir: str | None = None
+        self.__files: dict[str, str] = {}
+        self.__paths: dict[str, str] = {}
+        self.__locks: dict[str, threading.Lock] = {}
+        self.__lock = threading.Lock()
+
+    def fingerprints(self, collection_name: str) -> Iterator[tuple[str, str]]:
+        """Streams the fingerprints of the reference collection ordered by `_key`, the collection is read only the first time."""
+        if has_fingerprints(self.client, collection_name, self.excluded.of(collection_name)):
+            return self.client.iter_fingerprints(collection_name)
+        return self.__read(self.__spool(collection_name))
+
+    def diff(self, compared: ArangoClient | DumpClient, collection_name: str) -> FingerprintDiff:
+        """Diff of the reference collection with the collection of a target."""
+        return FingerprintDiff(
+            collection_name,
+            self.fingerprints(collection_name),
+            iter_fingerprints(compared, collection_name, self.excluded.of(collection_name), self.batch_size, self.parallel),
+            lambda keys: self.client.fetch_documents(collection_name, keys),
+            lambda keys: compared.fetch_documents(collection_name, keys),
+            self.excluded.of(collection_name),
+        )
+
+    def close(self) -> None:
+        """Removes the spooled fingerprints."""
+        with self.__lock:
+            if self.__dir is not None:
+                shutil.rmtree(self.__dir, ignore_errors=True)
+            self.__dir = None
+            self.__files = {}
+            self.__paths = {}
+
+    def __enter__(self) -> SharedReference:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __spool(self, collection_name: str) -> str:
+        with self.__lock:
+            if self.__dir is None:
+                self.__dir = tempfile.mkdtemp(prefix="migrango-reference-", dir=self.spill_dir)
+            if collection_name not in self.__locks:
+                self.__locks[collection_name] = threading.Lock()
+                self.__paths[collection_name] = os.path.join(self.__dir, f"{len(self.__paths):06}.fingerprints")
+            lock = self.__locks[collection_name]
+            path = self.__paths[collection_name]
+
+        with lock:
+            if collection_name not in self.__files:
+                excluded_fields = self.excluded.of(collection_name)
+                fingerprints = iter_fingerprints(self.client, collection_name, excluded_fields, self.batch_size, self.parallel)
+                with open(path, "w", encoding="utf-8") as f:
+                    f.writelines(f"{key}\t{content_hash}\n" for key, content_hash in fingerprints)
+                self.__files[collection_name] = path
+            return self.__files[collection_name]
+
+    @staticmethod
+    def __read(path: str) -> Iterator[tuple[str, str]]:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                key, content_hash = line.rstrip("\n").split("\t")
+                yield key, content_hash
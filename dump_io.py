@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import codecs
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import os
+from collections.abc import Iterable, Iterator
+from typing import BinaryIO
+
+from arangodb.settings import DEFAULT_BUFFER_SIZE, FORMATS
+from diff.document_diff import document_hash
+
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst", "lz4": ".lz4"}
+
+
+def dump_file_extension(file_format: str, compress: str = "none") -> str:
+    """Returns the extension of a dump file, e.g. `.jsonl.zst`."""
+    return f".{file_format}{COMPRESSION_EXTENSIONS.get(compress, '')}"
+
+
+def file_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DEFAULT_BUFFER_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def open_compressed_writer(raw: BinaryIO, compress: str) -> BinaryIO:
+    """Wraps the file with a compressor, the file is not closed when the compressor is closed."""
+    match compress:
+        case "none":
+            return raw
+        case "gzip":
+            return gzip.GzipFile(fileobj=raw, mode="wb")
+        case "zstd":
+            try:
+                import zstandard
+            except ImportError as ex:
+                raise Exception("zstd compression requires the zstandard package: pip install zstandard") from ex
+            return zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+        case "lz4":
+            try:
+                import lz4.frame
+            except ImportError as ex:
+                raise Exception("lz4 compression requires the lz4 package: pip install lz4") from ex
+            return lz4.frame.LZ4FrameFile(raw, mode="wb")
+        case _:
+            raise Exception(f"Unsupported compression: {compress}")
+
+
+class DumpWriter:
+    """
+    Writes documents of a collection to a dump file as they come.
+    A JSON array or one document per line (JSONL), optionally compressed.
+    Writes are buffered, the file is synced to the disk once, when it is closed.
+    With `index` an index file is written next to the dump file, one `[key, content hash, offset, length]` line per document,
+    offsets are positions in the uncompressed file. Documents must be written in the `_key` order for the index to be usable.
+
+    Args:
+        path (str): The path to the dump file.
+        file_format (str): `json` or `jsonl`.
+        compress (str): `none`, `gzip`, `zstd` or `lz4`.
+        buffer_size (int): Size of the write buffer in bytes.
+        index (bool): Write the index file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        file_format: str = "json",
+        compress: str = "none",
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        index: bool = False,
+    ):
+        if file_format not in FORMATS:
+            raise Exception(f"Unsupported dump format: {file_format}")
+
+        self.path = path
+        self.file_format = file_format
+        self.compress = compress
+        self.buffer_size = buffer_size
+        self.index = index
+        self.documents_count = 0
+        self.position = 0
+        self.__raw = None
+        self.__file = None
+        self.__index = None
+
+    def __enter__(self) -> DumpWriter:
+        self.__raw = open(self.path, "wb", buffering=self.buffer_size)
+        self.__file = open_compressed_writer(self.__raw, self.compress)
+        if self.index:
+            self.__index = open(index_path(self.path), "w", encoding="utf-8", buffering=self.buffer_size)
+        if self.file_format == "json":
+            self.__write(b"[")
+        return self
+
+    def write(self, document: dict) -> int:
+        """Writes the document, returns the number of written (uncompressed) bytes."""
+        content = json.dumps(document).encode()
+        separator = b", " if self.file_format == "json" and self.documents_count > 0 else b""
+        end = b"\n" if self.file_format == "jsonl" else b""
+
+        if self.__index is not None:
+            entry = [document["_key"], document_hash(document), self.position + len(separator), len(content)]
+            self.__index.write(json.dumps(entry) + "\n")
+
+        self.__write(separator + content + end)
+        self.documents_count += 1
+        return len(separator) + len(content) + len(end)
+
+    def flush(self) -> None:
+        """Writes the buffered bytes to the file, the compressor state is kept."""
+        self.__raw.flush()
+
+    def write_all(self, documents: Iterable[dict]) -> None:
+        for document in documents:
+            self.write(document)
+
+    def __write(self, data: bytes) -> None:
+        self.__file.write(data)
+        self.position += len(data)
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.__discard()
+            return
+
+        if self.file_format == "json":
+            self.__write(b"]")
+        if self.__file is not self.__raw:
+            self.__file.close()
+        self.__raw.flush()
+        os.fsync(self.__raw.fileno())
+        self.__raw.close()
+        if self.__index is not None:
+            self.__index.close()
+
+    def __discard(self) -> None:
+        """Closes and removes the files of a failed write, a truncated dump must not look complete. The error is propagated."""
+        for f in (self.__file, self.__raw, self.__index):
+            if f is not None:
+                with contextlib.suppress(Exception):
+                    f.close()
+        for path in (self.path, index_path(self.path)):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+
+def index_path(path: str) -> str:
+    return f"{path}.idx"
+
+
+def dump_file_format(path: str) -> tuple[str, str]:
+    """Returns the format and the compression of a dump file from its name."""
+    compress = next((c for c, extension in COMPRESSION_EXTENSIONS.items() if path.endswith(extension)), "none")
+    name = path.removesuffix(COMPRESSION_EXTENSIONS.get(compress, ""))
+    file_format = "jsonl" if name.endswith(".jsonl") else "json"
+    return file_format, compress
+
+
+def open_dump_reader(path: str, buffer_size: int = DEFAULT_BUFFER_SIZE) -> BinaryIO:
+    """Opens the dump file for reading, decompressed. Forward seeks are supported for all compressions."""
+    match dump_file_format(path)[1]:
+        case "gzip":
+            return gzip.open(path, "rb")
+        case "zstd":
+            try:
+                import zstandard
+            except ImportError as ex:
+                raise Exception("zstd compression requires the zstandard package: pip install zstandard") from ex
+            return io.BufferedReader(_ForwardSeekReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)), buffer_size)
+        case "lz4":
+            try:
+                import lz4.frame
+            except ImportError as ex:
+                raise Exception("lz4 compression requires the lz4 package: pip install lz4") from ex
+            return lz4.frame.open(path, "rb")
+        case _:
+            return open(path, "rb", buffering=buffer_size)
+
+
+class _ForwardSeekReader(io.RawIOBase):
+    """Makes a decompressing stream seekable forwards, skipped bytes are decompressed and dropped."""
+
+    def __init__(self, stream: BinaryIO):
+        self.__stream = stream
+        self.__position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.__stream.read(len(buffer))
+        buffer[: len(data)] = data
+        self.__position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.__position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        target = offset if whence == io.SEEK_SET else self.__position + offset
+        if whence == io.SEEK_END or target < self.__position:
+            raise io.UnsupportedOperation("only forward seeks are supported")
+        while self.__position < target:
+            skipped = len(self.__stream.read(min(target - self.__position, DEFAULT_BUFFER_SIZE)))
+            if skipped == 0:
+                break
+            self.__position += skipped
+        return self.__position
+
+    def close(self) -> None:
+        self.__stream.close()
+        super().close()
+
+
+def iter_dump_documents(path: str, buffer_size: int = DEFAULT_BUFFER_SIZE) -> Iterator[dict]:
+    """Streams the documents of a dump file, JSON array or JSONL, compressed or not. Only a buffer of the file is held in memory."""
+    with open_dump_reader(path, buffer_size) as f:
+        if dump_file_format(path)[0] == "jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_array(f, buffer_size)
+
+
+def read_dump_document(f: BinaryIO, offset: int, length: int) -> dict:
+    """
+    Reads a document at the offset of the uncompressed dump file, offsets come from the index file.
+    Compressed files can only be read forwards, read the documents in the offset order.
+    """
+    f.seek(offset)
+    return json.loads(f.read(length))
+
+
+def _iter_json_array(f: BinaryIO, chunk_size: int) -> Iterator[dict]:
+    """Parses a JSON array incrementally, yields its items."""
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    name = getattr(f, "name", "")
+    buffer, position, eof = "", 0, False
+    expected = "["
+
+    def refill() -> None:
+        nonlocal buffer, position, eof
+        if eof:
+            raise Exception(f"Unexpected end of the dump file {name}")
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer, position = buffer[position:] + text.decode(chunk, final=eof), 0
+
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n":
+            position += 1
+        if position >= len(buffer):
+            refill()
+            continue
+
+        if expected == "[":
+            if buffer[position] != "[":
+                raise Exception(f"The dump file {name} is not a JSON array")
+            position += 1
+            expected = "value or ]"
+        elif expected != "value" and buffer[position] == "]":
+            return
+        elif expected == ", or ]":
+            if buffer[position] != ",":
+                raise Exception(f"Malformed dump file {name} at {buffer[position:position + 20]!r}")
+            position += 1
+            expected = "value"
+        else:
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                refill()
+                continue
+            yield item
+            expected = ", or ]"
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import json
+import os
+
+MANIFEST_VERSION = 1
+
+
+class DumpManifest:
+    """
+    Describes a dump directory, written next to the dump files as `manifest.json`.
+    For every collection it records the type, `revision()`, count, the files holding its documents:
+    a base file followed by delta files, and in incremental dumps the hashes of its key ranges.
+    A delta file holds all documents of the key ranges listed in its entry, they replace the same ranges of the earlier files.
+
+    Args:
+        path (str): The dump directory.
+        collections (dict, optional): Collection entries by collection name.
+        counter (int): The number of the next dump file.
+    """
+
+    file_name = "manifest.json"
+
+    def __init__(self, path: str, collections: dict[str, dict] | None = None, counter: int = 1):
+        self.path = path
+        self.collections = collections or {}
+        self.counter = counter
+
+    @staticmethod
+    def load(path: str) -> DumpManifest:
+        """Loads the manifest of the dump directory, an empty manifest if there is none."""
+        manifest_path = os.path.join(path, DumpManifest.file_name)
+        if not os.path.exists(manifest_path):
+            return DumpManifest(path)
+
+        with open(manifest_path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        if data.get("version") != MANIFEST_VERSION:
+            raise Exception(f"Unsupported manifest version {data.get('version')} in {manifest_path}")
+
+        return DumpManifest(path, data["collections"], data["counter"])
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, DumpManifest.file_name))
+
+    def save(self) -> None:
+        """Writes the manifest atomically, a crashed dump leaves the previous manifest in place."""
+        manifest_path = os.path.join(self.path, DumpManifest.file_name)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "counter": self.counter, "collections": self.collections}, f, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
@@ -1,42 +1,237 @@
-import json
+import math
 import os
+import threading
+from itertools import chain
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Callable
 
-from arangodb.arango_client import ArangoClient
+from arangodb.arango_client import DEFAULT_BATCH_SIZE, ArangoClient
+from dump_io import DEFAULT_BUFFER_SIZE, DumpWriter, dump_file_extension, file_sha256, index_path
+from dump_manifest import DumpManifest
+from metrics import METRICS, current_rss
+
+# Number of documents per key range hashed for the incremental dumps.
+RANGE_SIZE = 10000
+MAX_RANGES = 4096
+
+
+class MemoryBudget:
+    """
+    Limits the memory used by parallel exports.
+    A worker reserves bytes before buffering documents and releases them when the buffer is written.
+    Reservations wait while the reserved bytes would exceed `max_in_flight` or the process memory exceeds `max_memory`.
+    A reservation is always granted when nothing else is reserved, so a single worker never waits forever.
+
+    Args:
+        max_in_flight (int, optional): Maximum bytes buffered by all workers. Unlimited if None.
+        max_memory (int, optional): Resident memory of the process in bytes above which workers wait. Unlimited if None.
+    """
+
+    def __init__(self, max_in_flight: int | None = None, max_memory: int | None = None):
+        self.max_in_flight = max_in_flight
+        self.max_memory = max_memory
+        self.in_flight = 0
+        self.__condition = threading.Condition()
+
+    def acquire(self, size: int) -> None:
+        with self.__condition:
+            while self.in_flight > 0 and not self.__fits(size):
+                self.__condition.wait(timeout=0.1)
+            self.in_flight += size
+
+    def release(self, size: int) -> None:
+        with self.__condition:
+            self.in_flight -= size
+            self.__condition.notify_all()
+
+    def __fits(self, size: int) -> bool:
+        if self.max_in_flight is not None and self.in_flight + size > self.max_in_flight:
+            return False
+        if self.max_memory is not None:
+            rss = current_rss()
+            return rss is None or rss <= self.max_memory
+        return True
 
 
 class ExportManager:
-    def __init__(self, client: ArangoClient, migration_path: str) -> None:
+    def __init__(
+        self,
+        client: ArangoClient,
+        migration_path: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        file_format: str = "json",
+        compress: str = "none",
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        jobs: int = 1,
+        memory_budget: MemoryBudget | None = None,
+        scan_jobs: int = 1,
+    ) -> None:
         """
         Initialize the class instance.
 
         Args:
             client (ArangoClient): The ArangoDB client object.
             migration_path (str): The path to the migrations directory.
+            batch_size (int): Number of documents fetched from the server in one round trip.
+            file_format (str): `json` for a JSON array per collection, `jsonl` for one document per line.
+            compress (str): `none`, `gzip`, `zstd` or `lz4`.
+            buffer_size (int): Size of the file write buffer in bytes.
+            jobs (int): Number of collections exported at the same time.
+            memory_budget (MemoryBudget, optional): Memory limits shared by the parallel exports.
+            scan_jobs (int): Number of cursors reading one big collection at the same time.
         """
         self.client = client
         self.migration_path = migration_path
+        self.batch_size = batch_size
+        self.file_format = file_format
+        self.compress = compress
+        self.buffer_size = buffer_size
+        self.jobs = jobs
+        self.memory_budget = memory_budget or MemoryBudget()
+        self.scan_jobs = scan_jobs
         self.counter = 1
 
-    def make_migration_files(self, on_collection_exported: Callable[[], None]) -> None:
+    def make_migration_files(
+        self,
+        on_collection_exported: Callable[[], None],
+        on_documents_exported: Callable[[str, int], None] | None = None,
+        incremental: bool = False,
+    ) -> None:
         """
         Generates migration files for all collections in the client.
         This function iterates over all collections in the client and generates a migration file for each collection.
         The migration file contains the JSON representation of all documents in the collection.
+        Documents are written as they come off the cursor, so the collection is never held in memory.
+        File numbers are assigned before the export starts, so the names do not depend on the order the parallel exports finish.
+        A manifest describing the files is written next to them, with an index of every file
+        mapping the document keys to their content hashes and offsets, used to compare against the dump offline.
+
+        In the incremental mode the manifest of the previous dump is read. Collections with an unchanged `revision()` are skipped,
+        changed collections export only the key ranges whose hashes changed as a delta file layered on the earlier files.
+        Only the incremental mode hashes the key ranges, a plain dump reads every collection once.
+
+        Args:
+            on_collection_exported (Callable): Called when a collection is exported.
+            on_documents_exported (Callable, optional): Called from the worker threads with the collection name
+                                                        and the number of documents written since the last call.
+            incremental (bool): Export only what changed since the dump described by the manifest in the directory.
         """
 
         if not os.path.exists(self.migration_path):
             os.makedirs(self.migration_path)
 
-        for collection in self.client.get_all_collections():
-            json_content = json.dumps(self.client.get_all_documents(collection["name"]))
-            self.__write_migration_file(self.__generate_file_name(collection["name"]), json_content)
-            on_collection_exported()
+        manifest = DumpManifest.load(self.migration_path) if incremental else DumpManifest(self.migration_path, counter=self.counter)
+        collections = self.client.get_all_collections()
+        numbers = [manifest.counter + i for i in range(len(collections))]
+        manifest.counter += len(collections)
+        self.counter = manifest.counter
+
+        previous = manifest.collections
+        manifest.collections = {}
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            futures = {
+                pool.submit(
+                    self.__export_collection, collection, number, previous.get(collection["name"]), incremental, on_documents_exported
+                ): collection
+                for collection, number in zip(collections, numbers, strict=True)
+            }
+            for future in as_completed(futures):
+                manifest.collections[futures[future]["name"]] = future.result()
+                on_collection_exported()
+
+        manifest.save()
+
+    def __export_collection(
+        self,
+        collection: dict,
+        number: int,
+        previous: dict | None,
+        incremental: bool,
+        on_documents_exported: Callable[[str, int], None] | None,
+    ) -> dict:
+        """Exports the collection, returns its manifest entry. The key ranges are hashed for the next run in the incremental mode."""
+        collection_name = collection["name"]
+
+        def on_documents_written(count: int, written: bool = True) -> None:
+            if written:
+                METRICS.add_documents(count, "export", collection_name)
+            if on_documents_exported is not None:
+                on_documents_exported(collection_name, count)
+
+        with METRICS.phase("export", collection_name):
+            revision = self.client.revision(collection_name)
+            if previous is not None and previous["revision"] == revision:
+                on_documents_written(previous["count"], written=False)
+                return previous
+
+            entry = {
+                "type": collection["type"],
+                "revision": revision,
+                "count": self.client.count(collection_name),
+            }
+
+            if previous is not None and "ranges" in previous:
+                key_ranges = [(r[0], r[1]) for r in previous["ranges"]]
+                hashes = self.client.get_range_hashes(collection_name, key_ranges, [])
+                changed = [r for r, old, new in zip(key_ranges, previous["ranges"], hashes, strict=True) if old[2] != new["hash"]]
+
+                if len(changed) < len(key_ranges):
+                    file_name = self.__generate_file_name(number, collection_name, delta=True)
+                    documents = chain.from_iterable(self.client.iter_documents(collection_name, self.batch_size, key_range=r) for r in changed)
+                    written = self.__write_migration_file(file_name, documents, on_documents_written)
+                    return {
+                        **entry,
+                        "ranges": [[*r, h["hash"]] for r, h in zip(key_ranges, hashes, strict=True)],
+                        "files": [*previous["files"], self.__file_entry(file_name, written, changed)],
+                    }
+
+            if incremental:
+                parts = min(MAX_RANGES, max(1, math.ceil(entry["count"] / RANGE_SIZE)))
+                key_ranges = self.client.get_key_ranges(collection_name, parts)
+                hashes = self.client.get_range_hashes(collection_name, key_ranges, [])
+                entry["ranges"] = [[*r, h["hash"]] for r, h in zip(key_ranges, hashes, strict=True)]
+
+            file_name = self.__generate_file_name(number, collection_name)
+            documents = self.client.iter_documents(collection_name, self.batch_size, parallel=self.scan_jobs)
+            written = self.__write_migration_file(file_name, documents, on_documents_written)
+            return {**entry, "files": [self.__file_entry(file_name, written)]}
+
+    def __file_entry(self, file_name: str, documents: int, delta_ranges: list | None = None) -> dict:
+        entry = {
+            "name": file_name,
+            "sha256": file_sha256(os.path.join(self.migration_path, file_name)),
+            "documents": documents,
+            "index": os.path.basename(index_path(file_name)),
+        }
+        if delta_ranges is not None:
+            entry["delta_ranges"] = [list(r) for r in delta_ranges]
+        return entry
 
-    def __write_migration_file(self, file_name: str, json_content: str) -> None:
-        with open(os.path.join(self.migration_path, file_name), "w") as f:
-            f.write(json_content)
-            self.counter += 1
+    def __write_migration_file(self, file_name: str, documents: Iterable[dict], on_documents_written: Callable[[int], None]) -> int:
+        """Writes the documents to the file, returns the number of written documents."""
+        path = os.path.join(self.migration_path, file_name)
+        with DumpWriter(path, self.file_format, self.compress, self.buffer_size, index=True) as writer:
+            buffered_bytes = 0
+            buffered_documents = 0
+            self.memory_budget.acquire(self.buffer_size)
+            try:
+                for document in documents:
+                    buffered_bytes += writer.write(document)
+                    buffered_documents += 1
+                    if buffered_bytes >= self.buffer_size:
+                        writer.flush()
+                        on_documents_written(buffered_documents)
+                        buffered_bytes = 0
+                        buffered_documents = 0
+                        self.memory_budget.release(self.buffer_size)
+                        self.memory_budget.acquire(self.buffer_size)
+            finally:
+                self.memory_budget.release(self.buffer_size)
+        on_documents_written(buffered_documents)
+        return writer.documents_count
 
-    def __generate_file_name(self, collection_name: str) -> str:
-        return f"{self.counter:016}_{collection_name}.json"
+    def __generate_file_name(self, number: int, collection_name: str, delta: bool = False) -> str:
+        suffix = ".delta" if delta else ""
+        return f"{number:016}_{collection_name}{suffix}{dump_file_extension(self.file_format, self.compress)}"
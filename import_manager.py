@@ -0,0 +1,98 @@
+import threading
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from itertools import batched
+
+from arangodb.arango_client import DEFAULT_BATCH_SIZE, ArangoClient
+from arangodb.dump_client import DumpClient
+
+
+class ImportManager:
+    def __init__(
+        self,
+        client: ArangoClient,
+        dump_path: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        jobs: int = 1,
+        on_duplicate: str = "replace",
+    ) -> None:
+        """
+        Initialize the class instance.
+
+        Args:
+            client (ArangoClient): The ArangoDB client object the dump is restored into.
+            dump_path (str): The dump directory written by `ExportManager`.
+            batch_size (int): Number of documents sent in one bulk import request.
+            jobs (int): Number of collections read and of import requests sent at the same time.
+            on_duplicate (str): What to do with documents whose `_key` exists: error, update, replace or ignore.
+        """
+        self.client = client
+        self.dump = DumpClient(dump_path)
+        self.batch_size = batch_size
+        self.jobs = jobs
+        self.on_duplicate = on_duplicate
+
+    def restore(
+        self,
+        on_collection_restored: Callable[[], None],
+        on_documents_restored: Callable[[str, int], None] | None = None,
+    ) -> dict[str, int]:
+        """
+        Restores all collections of the dump, missing collections are created with their type first.
+        Dump files are parsed incrementally and delta files of incremental dumps are layered on the base files.
+        `jobs` collections are read at the same time, their batches share `jobs` import workers.
+        A reader waits while `2 * jobs` batches are in flight, so the memory does not depend on the size of the files.
+
+        Args:
+            on_collection_restored (Callable): Called when all documents of a collection are imported.
+            on_documents_restored (Callable, optional): Called from the worker threads with the collection name
+                                                        and the number of documents of an imported batch.
+
+        Returns:
+            dict[str, int]: Number of imported documents by collection.
+        """
+        collections = self.dump.get_all_collections()
+        for collection in collections:
+            self.client.create_collection(collection["name"], collection["type"])
+
+        in_flight = threading.BoundedSemaphore(2 * self.jobs)
+        restored = {}
+        with ThreadPoolExecutor(max_workers=self.jobs) as readers, ThreadPoolExecutor(max_workers=self.jobs) as importers:
+            futures = {
+                readers.submit(self.__restore_collection, c["name"], importers, in_flight, on_documents_restored): c["name"] for c in collections
+            }
+            for future in as_completed(futures):
+                restored[futures[future]] = future.result()
+                on_collection_restored()
+
+        return restored
+
+    def __restore_collection(
+        self,
+        collection_name: str,
+        importers: ThreadPoolExecutor,
+        in_flight: threading.BoundedSemaphore,
+        on_documents_restored: Callable[[str, int], None] | None,
+    ) -> int:
+        """Reads the collection from the dump and hands its batches to the import workers, returns the number of documents."""
+
+        def import_batch(documents: list[dict]) -> int:
+            try:
+                self.client.import_documents(collection_name, documents, self.on_duplicate)
+            finally:
+                in_flight.release()
+            if on_documents_restored is not None:
+                on_documents_restored(collection_name, len(documents))
+            return len(documents)
+
+        imported = 0
+        pending: deque[Future] = deque()
+        documents = ({k: v for k, v in d.items() if k not in ("_id", "_rev")} for d in self.dump.iter_documents(collection_name))
+        for batch in batched(documents, self.batch_size):
+            in_flight.acquire()
+            pending.append(importers.submit(import_batch, list(batch)))
+            while pending and pending[0].done():
+                imported += pending.popleft().result()
+
+        return imported + sum(batch.result() for batch in pending)
@@ -1,14 +1,29 @@
 import logging
-from rich.logging import RichHandler
 
 from cli import cli
 
+
+class LazyRichHandler(logging.Handler):
+    """Creates the rich handler on the first record, so commands which never log do not import `rich.logging`."""
+
+    def __init__(self, level: int = logging.NOTSET):
+        super().__init__(level)
+        self.__handler = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.__handler is None:
+            from rich.logging import RichHandler
+
+            self.__handler = RichHandler(level=self.level)
+        self.__handler.handle(record)
+
+
 if __name__ == "__main__":
     logging.basicConfig(
         level="NOTSET",
         format="%(message)s",
         datefmt="[%X]",
-        handlers=[RichHandler(level=logging.INFO)],
+        handlers=[LazyRichHandler(level=logging.INFO)],
     )
 
     log = logging.getLogger("rich")
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import TypeVar
+
+T = TypeVar("T")
+
+# Phase of the requests and documents recorded outside of any phase.
+OTHER_PHASE = "other"
+PHASE_FIELDS = ("seconds", "calls", "requests", "bytes_sent", "bytes_received", "documents", "peak_rss_bytes")
+PROMETHEUS_HELP = {
+    "seconds": "Wall time spent in the phase, nested phases are also counted in the enclosing one.",
+    "calls": "Number of times the phase was entered.",
+    "requests": "Number of HTTP requests sent to ArangoDB.",
+    "bytes_sent": "Bytes of the HTTP request bodies.",
+    "bytes_received": "Bytes of the HTTP response bodies.",
+    "documents": "Number of documents processed.",
+    "peak_rss_bytes": "Highest resident memory of the process seen when the phase ended.",
+}
+
+
+def current_rss() -> int | None:
+    """Returns the resident memory of the process in bytes, None if it is unknown on the platform."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss() -> int | None:
+    """Returns the highest resident memory of the process in bytes, None if it is unknown on the platform."""
+    try:
+        import resource
+    except ImportError:
+        return current_rss()
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class PhaseStats:
+    __slots__ = PHASE_FIELDS
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.documents = 0
+        self.peak_rss_bytes = 0
+
+
+class Metrics:
+    """
+    Wall time, HTTP requests, transferred bytes, documents and memory of a run, by phase and collection.
+    The recorder is disabled by default and then costs nothing, `timed` returns the items as they are.
+    Requests are counted for the innermost phase of the thread sending them, a phase entered by `timed`
+    is the current one only while the next item is produced, so the requests of a lazily read cursor are
+    counted for the phase that reads it.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.command: str | None = None
+        self.__phases: dict[tuple[str, str | None], PhaseStats] = {}
+        self.__current = threading.local()
+        self.__lock = threading.Lock()
+        self.__started = time.perf_counter()
+        self.__started_at = datetime.now(timezone.utc)
+
+    def enable(self, command: str | None = None) -> None:
+        self.enabled = True
+        self.command = command
+        self.__started = time.perf_counter()
+        self.__started_at = datetime.now(timezone.utc)
+
+    @contextmanager
+    def phase(self, name: str, collection_name: str | None = None) -> Iterator[None]:
+        """Records the time spent in the block as the phase of the collection."""
+        if not self.enabled:
+            yield
+            return
+
+        previous = getattr(self.__current, "key", None)
+        self.__current.key = (name, collection_name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.__current.key = previous
+            self.__add((name, collection_name), seconds=time.perf_counter() - started, calls=1, peak_rss_bytes=current_rss() or 0)
+
+    def timed(self, items: Iterable[T], name: str, collection_name: str | None = None) -> Iterable[T]:
+        """Records the time spent producing the items and their number as the phase of the collection."""
+        if not self.enabled:
+            return items
+        return self.__timed(items, (name, collection_name))
+
+    def add_documents(self, count: int, name: str, collection_name: str | None = None) -> None:
+        if self.enabled:
+            self.__add((name, collection_name), documents=count)
+
+    def add_request(self, bytes_sent: int, bytes_received: int) -> None:
+        """Records an HTTP request for the current phase of the thread."""
+        if self.enabled:
+            key = getattr(self.__current, "key", None) or (OTHER_PHASE, None)
+            self.__add(key, requests=1, bytes_sent=bytes_sent, bytes_received=bytes_received)
+
+    def to_dict(self) -> dict:
+        with self.__lock:
+            phases = [
+                {"phase": name, "collection": collection_name, **{f: getattr(stats, f) for f in PHASE_FIELDS}}
+                for (name, collection_name), stats in self.__phases.items()
+            ]
+
+        return {
+            "command": self.command,
+            "started_at": self.__started_at.isoformat(),
+            "seconds": round(time.perf_counter() - self.__started, 6),
+            "peak_rss_bytes": peak_rss(),
+            "requests": sum(p["requests"] for p in phases),
+            "bytes_sent": sum(p["bytes_sent"] for p in phases),
+            "bytes_received": sum(p["bytes_received"] for p in phases),
+            "phases": sorted(phases, key=lambda p: (p["phase"], p["collection"] or "")),
+        }
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Writes the metrics in the Prometheus text format, for the textfile collector of the node exporter.
+        The file is replaced at once, so the collector never reads a partly written file.
+        """
+        metrics = self.to_dict()
+        command = self.__label(metrics["command"] or "")
+        lines = []
+        for name, value, help_text in (
+            ("run_seconds", metrics["seconds"], "Wall time of the run."),
+            ("run_peak_rss_bytes", metrics["peak_rss_bytes"] or 0, "Highest resident memory of the run."),
+            ("run_requests", metrics["requests"], "Number of HTTP requests sent to ArangoDB."),
+            ("run_bytes_received", metrics["bytes_received"], "Bytes of the HTTP response bodies."),
+        ):
+            lines += [f"# HELP migrango_{name} {help_text}", f"# TYPE migrango_{name} gauge", f'migrango_{name}{{command="{command}"}} {value}']
+
+        for field in PHASE_FIELDS:
+            lines += [f"# HELP migrango_phase_{field} {PROMETHEUS_HELP[field]}", f"# TYPE migrango_phase_{field} gauge"]
+            for phase in metrics["phases"]:
+                labels = f'command="{command}",phase="{self.__label(phase["phase"])}",collection="{self.__label(phase["collection"] or "")}"'
+                lines.append(f"migrango_phase_{field}{{{labels}}} {phase[field]}")
+
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temporary, path)
+
+    def __timed(self, items: Iterable[T], key: tuple[str, str | None]) -> Iterator[T]:
+        iterator = iter(items)
+        seconds = 0.0
+        documents = 0
+        try:
+            while True:
+                previous = getattr(self.__current, "key", None)
+                self.__current.key = key
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    seconds += time.perf_counter() - started
+                    self.__current.key = previous
+                documents += 1
+                yield item
+        finally:
+            self.__add(key, seconds=seconds, calls=1, documents=documents, peak_rss_bytes=current_rss() or 0)
+
+    def __add(self, key: tuple[str, str | None], peak_rss_bytes: int = 0, **values) -> None:
+        with self.__lock:
+            stats = self.__phases.get(key)
+            if stats is None:
+                stats = self.__phases[key] = PhaseStats()
+            for field, value in values.items():
+                setattr(stats, field, getattr(stats, field) + value)
+            stats.peak_rss_bytes = max(stats.peak_rss_bytes, peak_rss_bytes)
+
+    @staticmethod
+    def __label(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics()
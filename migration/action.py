@@ -10,6 +10,8 @@ class ActionType(Enum):
 
 
 class Action:
+    __slots__ = ("type", "data", "collection_name")
+
     def __init__(self, action_type: ActionType, data: dict, collection_name: str):
         self.type = action_type
         self.data = data
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Iterable, Iterator
+
+from migration.action import Action, ActionType
+
+
+class ActionGroup:
+    """Actions of one type as the template sees them, sized and iterated lazily without copying the store."""
+
+    __slots__ = ("store", "action_type")
+
+    def __init__(self, store: ActionStore, action_type: ActionType):
+        self.store = store
+        self.action_type = action_type
+
+    def __len__(self) -> int:
+        return self.store.count(self.action_type)
+
+    def __iter__(self) -> Iterator[dict]:
+        for action in self.store.iter_type(self.action_type):
+            yield action.__dict__()
+
+
+class ActionStore:
+    """
+    Compact store of migration actions, grouped by action type and collection.
+    Every action is kept as its compact JSON encoding instead of an `Action` object holding a dict.
+    Past `max_memory` bytes the groups are appended to temporary files, which are read back lazily when iterating.
+
+    Args:
+        max_memory (int, optional): Bytes of encoded actions kept in memory. Unlimited if None.
+        spill_dir (str, optional): Directory for the temporary files, the system temporary directory if None.
+    """
+
+    def __init__(self, max_memory: int | None = None, spill_dir: str | None = None):
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self.memory = 0
+        self.__groups: dict[tuple[ActionType, str], list[bytes]] = {}
+        self.__counts: dict[tuple[ActionType, str], int] = {}
+        self.__spill_files: dict[tuple[ActionType, str], str] = {}
+        self.__temp_dir: str | None = None
+
+    def add(self, action: Action) -> None:
+        self.add_encoded(action.type, action.collection_name, json.dumps(action.data, separators=(",", ":")).encode())
+
+    def add_encoded(self, action_type: ActionType, collection_name: str, data: bytes) -> None:
+        """Add an action whose data is already encoded as JSON."""
+        key = (action_type, collection_name)
+        self.__groups.setdefault(key, []).append(data)
+        self.__counts[key] = self.__counts.get(key, 0) + 1
+        self.memory += len(data)
+
+        if self.max_memory is not None and self.memory > self.max_memory:
+            self.spill()
+
+    def extend(self, actions: Iterable[Action]) -> None:
+        for action in actions:
+            self.add(action)
+
+    def spill(self) -> None:
+        """Append the actions held in memory to the temporary files of their groups."""
+        if self.__temp_dir is None:
+            self.__temp_dir = tempfile.mkdtemp(prefix="migrango-actions-", dir=self.spill_dir)
+
+        for key, encoded in self.__groups.items():
+            if not encoded:
+                continue
+            if key not in self.__spill_files:
+                self.__spill_files[key] = os.path.join(self.__temp_dir, f"{len(self.__spill_files)}.jsonl")
+            with open(self.__spill_files[key], "ab") as f:
+                f.writelines(data + b"\n" for data in encoded)
+            encoded.clear()
+        self.memory = 0
+
+    def __len__(self) -> int:
+        return sum(self.__counts.values())
+
+    def count(self, action_type: ActionType) -> int:
+        return sum(count for (t, _), count in self.__counts.items() if t == action_type)
+
+    def types(self) -> list[ActionType]:
+        """The action types in the order they were first added."""
+        return list(dict.fromkeys(t for t, _ in self.__counts))
+
+    def __iter__(self) -> Iterator[Action]:
+        for action_type in self.types():
+            yield from self.iter_type(action_type)
+
+    def iter_encoded(self) -> Iterator[tuple[ActionType, str, bytes]]:
+        """Yields `(type, collection, JSON data)` of every action, without decoding the data."""
+        for key in self.__counts:
+            yield from ((key[0], key[1], data) for data in self.__iter_group(key))
+
+    def iter_type(self, action_type: ActionType) -> Iterator[Action]:
+        for key in self.__counts:
+            if key[0] == action_type:
+                for data in self.__iter_group(key):
+                    yield Action(action_type, json.loads(data), key[1])
+
+    def grouped(self) -> dict[str, ActionGroup]:
+        """The actions by type value, the shape the migration templates are rendered with."""
+        return {action_type.value: ActionGroup(self, action_type) for action_type in self.types()}
+
+    def close(self) -> None:
+        """Drop the actions and remove the temporary files."""
+        self.__groups.clear()
+        self.__counts.clear()
+        self.__spill_files.clear()
+        self.memory = 0
+        if self.__temp_dir is not None:
+            shutil.rmtree(self.__temp_dir, ignore_errors=True)
+            self.__temp_dir = None
+
+    def __iter_group(self, key: tuple[ActionType, str]) -> Iterator[bytes]:
+        if key in self.__spill_files:
+            with open(self.__spill_files[key], "rb") as f:
+                for line in f:
+                    yield line.rstrip(b"\n")
+        yield from list(self.__groups.get(key, []))
+
+    def __enter__(self) -> ActionStore:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
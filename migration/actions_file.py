@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Iterator
+from itertools import islice
+
+from migration.action import Action, ActionType
+from migration.action_store import ActionStore
+
+
+def write_actions_file(path: str, actions: ActionStore) -> int:
+    """
+    Writes the actions as JSON lines `{"type": ..., "collection": ..., "data": ...}`, the input of the `apply` command.
+    Actions of the same type and collection are written next to each other, so they can be applied in batches.
+    Returns the number of written actions.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    written = 0
+    with open(path, "wb") as f:
+        for action_type, collection_name, data in actions.iter_encoded():
+            f.write(b'{"type":"%s","collection":%s,"data":%s}\n' % (action_type.value.encode(), json.dumps(collection_name).encode(), data))
+            written += 1
+    return written
+
+
+def iter_actions_file(path: str, skip: int = 0) -> Iterator[Action]:
+    """Reads the actions written by `write_actions_file` one line at a time, the first `skip` actions are left out."""
+    with open(path, encoding="utf-8") as f:
+        for line in islice((line for line in f if line.strip()), skip, None):
+            action = json.loads(line)
+            yield Action(ActionType(action["type"]), action["data"], action["collection"])
+
+
+def count_actions_file(path: str) -> int:
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
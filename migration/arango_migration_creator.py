@@ -1,76 +1,105 @@
 import os
 import json
-from typing import ClassVar
-
-from deepdiff.helper import FlatDeltaRow
+from collections.abc import Iterable, Iterator
+from functools import lru_cache
 
 from migration.action import Action, ActionType
-from jinja2 import Environment, FileSystemLoader
+from migration.action_store import ActionStore
+from jinja2 import Environment, FileSystemLoader, Template
+from metrics import METRICS
 
 
-class MigrationCreator:
-    actions: ClassVar[list[Action]] = []
+@lru_cache(maxsize=None)
+def template_environment(template_dir: str) -> Environment:
+    """The Jinja environment of the template directory, created once per run so compiled templates are reused."""
+    return Environment(loader=FileSystemLoader(template_dir))
+
 
-    def __init__(self, create_collections: list[dict[str, str]], remove_collections: list[dict[str, str]], template: str) -> None:
+def chunk_file_path(file_path: str, number: int) -> str:
+    """Path of a numbered chunk file, e.g. `migration_0002.php` for `migration.php`."""
+    root, extension = os.path.splitext(file_path)
+    return f"{root}_{number:04}{extension}"
+
+
+class MigrationCreator:
+    def __init__(
+        self,
+        create_collections: list[dict[str, str]],
+        remove_collections: list[dict[str, str]],
+        template: str,
+        max_memory: int | None = None,
+    ) -> None:
         self.template = template
-        self.diff_dic: dict[str, list[FlatDeltaRow]] = {}
+        self.max_memory = max_memory
+        self.actions = ActionStore(max_memory)
+        self.__compiled: Template | None = None
         for collection in create_collections:
-            self.actions.append(Action(ActionType.COLLECTION_CREATE, {"value": collection}, collection["name"]))
+            self.actions.add(Action(ActionType.COLLECTION_CREATE, {"value": collection}, collection["name"]))
         for collection in remove_collections:
-            self.actions.append(Action(ActionType.DELETE_COLLECTION, {"value": collection}, collection["name"]))
+            self.actions.add(Action(ActionType.DELETE_COLLECTION, {"value": collection}, collection["name"]))
 
-    def add_diff(self, collection_name: str, diff: list[FlatDeltaRow]) -> None:
-        """Add a diff to the list of actions."""
-        self.diff_dic[collection_name] = diff
+    def add_actions(self, actions: Iterable[Action], collection_name: str | None = None) -> None:
+        """Add document actions, e.g. produced by `DocumentDiff.actions`, the time to produce them is recorded as the diff phase."""
+        self.actions.extend(METRICS.timed(actions, "diff", collection_name))
 
     def create_migration(self) -> str:
-        """Create a migration class from a flat diff dictionary."""
-        self.__create_actions()
-
-        return self.__render_template()
-
-    def __create_actions(self) -> None:
-        """Create the actions from the flat diff dictionary."""
-        for collection_name, diff in self.diff_dic.items():
-            self.__create_action_from_diff(collection_name, diff)
-
-    def __create_action_from_diff(self, collection_name: str, diffs: list[FlatDeltaRow]):
-        """Create an action from a flat diff dictionary."""
-        for diff in diffs:
-            match diff["action"]:
-                case "dictionary_item_added":
-                    self.actions.append(MigrationCreator.__create_document_create_action(collection_name, diff))
-                case "dictionary_item_removed":
-                    self.actions.append(Action(ActionType.DOCUMENT_DELETE, {"value": diff["value"]}, collection_name))
-                case "type_changes":
-                    self.actions.append(
-                        Action(ActionType.DOCUMENT_UPDATE, {"id": diff["path"][0], "value": {diff["path"][1]: diff["value"]}}, collection_name)
-                    )
-                case "values_changed":
-                    for _, value in diff["value"].items():
-                        self.actions.append(Action(ActionType.DOCUMENT_CREATE, {"value": value}, collection_name))
-                case _:
-                    raise Exception(f"Unsupported action: {diff['action']}")
-
-    def __render_template(self) -> str:
-        """Render the template with the actions."""
-        grouped_actions = {}
-
-        for action in self.actions:
-            if action.type.value in grouped_actions:
-                grouped_actions[action.type.value].append(action.__dict__())
-            else:
-                grouped_actions[action.type.value] = [action.__dict__()]
-
-        template_dir, template_file = os.path.split(self.template)
-        env = Environment(loader=FileSystemLoader(template_dir))
-        template = env.get_template(template_file)
-
-        return template.render(actions=grouped_actions, json=json)
-
-    @staticmethod
-    def __create_document_create_action(collection_name: str, diff: FlatDeltaRow) -> Action:
-        if isinstance(diff["value"], dict):
-            return Action(ActionType.DOCUMENT_CREATE, {"value": diff["value"]}, collection_name)
-
-        return Action(ActionType.DOCUMENT_UPDATE, {"id": diff["path"][0], "value": {diff["path"][1]: diff["value"]}}, collection_name)
+        """Create a migration class from the actions."""
+        return "".join(self.__render_template(self.actions))
+
+    def write_migration(self, file_path: str, max_actions: int | None = None, max_bytes: int | None = None) -> list[str]:
+        """
+        Render the migration straight into the file, the rendered text is never held in memory as a whole.
+        With `max_actions` or `max_bytes` the actions are split into numbered chunk files, each rendered with the template.
+        `max_bytes` limits the JSON size of the actions data of a chunk, which the rendered size follows closely.
+
+        Args:
+            file_path (str): The migration file, chunk files are numbered after it.
+            max_actions (int, optional): Maximum number of actions in one file.
+            max_bytes (int, optional): Maximum JSON size in bytes of the actions in one file.
+
+        Returns:
+            list[str]: The written files.
+        """
+        METRICS.add_documents(len(self.actions), "render")
+        with METRICS.phase("render"):
+            if max_actions is None and max_bytes is None:
+                self.__write_file(file_path, self.actions)
+                return [file_path]
+
+            paths = []
+            for number, chunk in enumerate(self.__chunks(max_actions, max_bytes), start=1):
+                with chunk:
+                    paths.append(chunk_file_path(file_path, number))
+                    self.__write_file(paths[-1], chunk)
+            return paths
+
+    def close(self) -> None:
+        """Drop the actions and remove their temporary files."""
+        self.actions.close()
+
+    def __chunks(self, max_actions: int | None, max_bytes: int | None) -> Iterator[ActionStore]:
+        chunk, size = ActionStore(self.max_memory), 0
+        for action_type, collection_name, data in self.actions.iter_encoded():
+            if len(chunk) and ((max_actions is not None and len(chunk) >= max_actions) or (max_bytes is not None and size + len(data) > max_bytes)):
+                yield chunk
+                chunk, size = ActionStore(self.max_memory), 0
+            chunk.add_encoded(action_type, collection_name, data)
+            size += len(data)
+        if len(chunk) or not len(self.actions):
+            yield chunk
+
+    def __write_file(self, file_path: str, actions: ActionStore) -> None:
+        if os.path.dirname(file_path):
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w") as file:
+            file.writelines(self.__render_template(actions))
+
+    def __render_template(self, actions: ActionStore) -> Iterator[str]:
+        """Render the template with the actions, piece by piece as Jinja generates it."""
+        return self.__template().generate(actions=actions.grouped(), json=json)
+
+    def __template(self) -> Template:
+        if self.__compiled is None:
+            template_dir, template_file = os.path.split(self.template)
+            self.__compiled = template_environment(template_dir).get_template(template_file)
+        return self.__compiled
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import re
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from itertools import batched, groupby
+
+from arangodb.arango_client import ArangoClient
+from arangodb.settings import DEFAULT_BATCH_SIZE, ON_DUPLICATE
+from migration.action import Action, ActionType
+
+MIGRATIONS_COLLECTION = "migrations"
+
+
+def checkpoint_key(name: str) -> str:
+    """Turns the migration name into a valid document `_key`."""
+    return re.sub(r"[^A-Za-z0-9_\-:.@()+,=;$!*'%]", "_", name)[:254]
+
+
+class MigrationApplier:
+    """
+    Applies migration actions to a database with bulk requests.
+    Consecutive actions of the same type and collection are sent in batches of `batch_size`, `jobs` batches at the same time.
+    After every round of batches the number of applied actions is saved as a checkpoint in the `migrations` collection,
+    so an interrupted run resumes after the last checkpoint. Replaying the actions after it is safe:
+    existing documents are handled by `on_duplicate`, updates are idempotent and missing documents are not deleted twice.
+
+    Args:
+        client (ArangoClient): The target database.
+        name (str): The name of the migration, the checkpoint is stored under it.
+        fingerprint (str): Identifies the actions, a checkpoint with another fingerprint is not resumed.
+        batch_size (int): Number of actions in one request.
+        jobs (int): Number of requests to one collection at the same time.
+        on_duplicate (str): What to do with created documents whose `_key` exists: error, update, replace or ignore.
+    """
+
+    def __init__(
+        self,
+        client: ArangoClient,
+        name: str,
+        fingerprint: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        jobs: int = 1,
+        on_duplicate: str = "replace",
+    ):
+        if on_duplicate not in ON_DUPLICATE:
+            raise Exception(f"Unknown on_duplicate {on_duplicate}, expected one of {', '.join(ON_DUPLICATE)}")
+
+        self.client = client
+        self.name = name
+        self.fingerprint = fingerprint
+        self.batch_size = batch_size
+        self.jobs = jobs
+        self.on_duplicate = on_duplicate
+
+    def checkpoint(self) -> dict | None:
+        """Returns the checkpoint of the migration, None if it was never applied."""
+        self.client.create_collection(MIGRATIONS_COLLECTION)
+        checkpoint = self.client.get_document(MIGRATIONS_COLLECTION, checkpoint_key(self.name))
+        if checkpoint is not None and checkpoint.get("fingerprint") != self.fingerprint:
+            raise Exception(f"Migration {self.name} was applied from other actions, give the migration another name")
+        return checkpoint
+
+    def apply(self, actions: Iterable[Action], total: int, applied: int = 0, on_actions_applied: Callable[[int], None] | None = None) -> int:
+        """
+        Applies the actions and saves checkpoints on the way.
+
+        Args:
+            actions (Iterable[Action]): The actions left after the `applied` ones.
+            total (int): Number of actions of the migration.
+            applied (int): Number of actions applied by earlier runs, the first action of `actions` has this position.
+            on_actions_applied (Callable, optional): Called with the number of actions applied by every round of batches.
+
+        Returns:
+            int: Number of applied actions, `total` when the migration is finished.
+        """
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            for (action_type, collection_name), group in groupby(actions, key=lambda a: (a.type, a.collection_name)):
+                for window in batched(group, self.batch_size * self.jobs):
+                    if collection_name != MIGRATIONS_COLLECTION:
+                        batches = [pool.submit(self.__apply_batch, action_type, collection_name, batch) for batch in batched(window, self.batch_size)]
+                        for batch in batches:
+                            batch.result()
+
+                    applied += len(window)
+                    self.__save_checkpoint(applied, total)
+                    if on_actions_applied is not None:
+                        on_actions_applied(len(window))
+
+        self.__save_checkpoint(applied, total)
+        return applied
+
+    def __apply_batch(self, action_type: ActionType, collection_name: str, actions: tuple[Action, ...]) -> None:
+        if action_type == ActionType.COLLECTION_CREATE:
+            for action in actions:
+                self.client.create_collection(action.data["value"]["name"], action.data["value"]["type"])
+        elif action_type == ActionType.DELETE_COLLECTION:
+            for action in actions:
+                self.client.delete_collection(action.data["value"]["name"])
+        elif action_type == ActionType.DOCUMENT_CREATE:
+            documents = [{k: v for k, v in a.data["value"].items() if k not in ("_id", "_rev")} for a in actions]
+            self.client.import_documents(collection_name, documents, self.on_duplicate)
+        elif action_type == ActionType.DOCUMENT_UPDATE:
+            documents = [{**a.data["value"], "_key": a.data["id"].split("/", 1)[1]} for a in actions]
+            self.client.update_documents(collection_name, documents)
+        elif action_type == ActionType.DOCUMENT_DELETE:
+            self.client.delete_documents(collection_name, [a.data["value"]["_key"] for a in actions])
+
+    def __save_checkpoint(self, applied: int, total: int) -> None:
+        self.client.save_document(
+            MIGRATIONS_COLLECTION,
+            {
+                "_key": checkpoint_key(self.name),
+                "name": self.name,
+                "fingerprint": self.fingerprint,
+                "applied": applied,
+                "total": total,
+                "finished": applied >= total,
+                "updated_at": time.time(),
+            },
+        )
@@ -0,0 +1,45 @@
+import os
+
+from migration.action import Action, ActionType
+from migration.action_store import ActionStore
+
+
+def actions() -> list[Action]:
+    return [
+        Action(ActionType.DOCUMENT_CREATE, {"value": {"_key": "a"}}, "first"),
+        Action(ActionType.DOCUMENT_DELETE, {"value": {"_key": "b"}}, "first"),
+        Action(ActionType.DOCUMENT_CREATE, {"value": {"_key": "c"}}, "second"),
+        Action(ActionType.DOCUMENT_CREATE, {"value": {"_key": "d"}}, "first"),
+    ]
+
+
+def contents(store: ActionStore) -> list[tuple[ActionType, str, dict]]:
+    return [(a.type, a.collection_name, a.data) for a in store]
+
+
+def test_actions_are_grouped_by_type_and_collection():
+    with ActionStore() as store:
+        store.extend(actions())
+        assert len(store) == 4
+        assert store.types() == [ActionType.DOCUMENT_CREATE, ActionType.DOCUMENT_DELETE]
+        assert [a.data["value"]["_key"] for a in store] == ["a", "d", "c", "b"]
+        assert {t: len(group) for t, group in store.grouped().items()} == {"create_document": 3, "delete_document": 1}
+
+
+def test_spilled_actions_are_read_back_in_the_same_order(tmp_path):
+    with ActionStore() as in_memory:
+        in_memory.extend(actions())
+        expected = contents(in_memory)
+
+    store = ActionStore(max_memory=20, spill_dir=str(tmp_path))
+    store.extend(actions())
+    store.add(Action(ActionType.DOCUMENT_CREATE, {"value": {"_key": "e"}}, "first"))
+    assert os.listdir(tmp_path) != []
+    assert store.memory <= 20 + len(b'{"value":{"_key":"e"}}')
+
+    assert contents(store)[:3] == expected[:2] + [(ActionType.DOCUMENT_CREATE, "first", {"value": {"_key": "e"}})]
+    assert len(store) == 5
+    assert store.count(ActionType.DOCUMENT_CREATE) == 4
+
+    store.close()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,21 @@
+from arangodb.arango_client import range_hash, sample_boundaries
+
+
+def test_boundaries_split_the_sample_into_parts_of_the_same_size():
+    sample = [f"{i:03}" for i in range(100)]
+    assert sample_boundaries(sample, 4) == ["025", "050", "075"]
+    assert sample_boundaries(sample, 1) == []
+
+
+def test_boundaries_of_a_small_sample_are_not_repeated():
+    assert sample_boundaries(["a", "b"], 8) == ["b"]
+    assert sample_boundaries(["a", "a", "a", "b"], 4) == ["a", "b"]
+    assert sample_boundaries([], 8) == []
+
+
+def test_range_hash_of_joined_ranges_is_the_hash_of_the_summed_ranges():
+    left, right = [2, 10, 20, 30, 40], [3, 1, 2, 3, 4]
+    joined = range_hash(map(sum, zip(left, right, strict=True)))
+    assert joined == range_hash([5, 11, 22, 33, 44])
+    assert joined["count"] == 5
+    assert range_hash(left) != range_hash(right)
@@ -0,0 +1,21 @@
+import pytest
+from click.testing import CliRunner
+
+from cli import cli
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["dump", "c", "out", "--batch-size", "0"],
+        ["compare", "a", "b", "--batch-size", "-1"],
+        ["compare", "a", "b", "--jobs", "0"],
+        ["compare", "a", "b", "--scan-jobs", "0"],
+        ["make-migrations", "a", "b", "--target-jobs", "0"],
+        ["restore", "c", ".", "--jobs", "0"],
+    ],
+)
+def test_sizes_below_one_are_rejected(args):
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 2
+    assert "is not in the range x>=1" in result.output
@@ -0,0 +1,79 @@
+import pytest
+
+from diff.document_diff import DocumentDiff, key_order
+from migration.action import ActionType
+
+
+def documents(*keys: str, **values) -> list[dict]:
+    return [{"_key": key, "_id": f"c/{key}", "_rev": "1", "value": values.get(key, 0)} for key in keys]
+
+
+def changes(reference: list[dict], compared: list[dict]) -> list[tuple[str, bool, bool, list[str]]]:
+    return [(c.key, c.reference is not None, c.compared is not None, c.fields) for c in DocumentDiff("c", reference, compared).changes()]
+
+
+def test_key_order_follows_the_server_collation():
+    keys = ["Banana", "apple", "ab", "a-b", "A", "a", "10", "9", "_x", "a.b", "B", "b"]
+    assert sorted(keys, key=key_order) == ["_x", "10", "9", "a", "A", "a-b", "a.b", "ab", "apple", "b", "B", "Banana"]
+
+
+def test_key_order_tells_keys_apart_by_case():
+    assert key_order("a") != key_order("A")
+    assert key_order("a") < key_order("A") < key_order("ab")
+
+
+def test_equal_collections_have_no_changes():
+    assert changes(documents("a", "b"), documents("a", "b")) == []
+
+
+def test_empty_sides():
+    assert changes([], []) == []
+    assert changes([], documents("a", "b")) == [("a", False, True, []), ("b", False, True, [])]
+    assert changes(documents("a", "b"), []) == [("a", True, False, []), ("b", True, False, [])]
+
+
+def test_all_deleted_and_recreated_with_other_keys():
+    assert changes(documents("a", "c"), documents("b", "d")) == [
+        ("a", True, False, []),
+        ("b", False, True, []),
+        ("c", True, False, []),
+        ("d", False, True, []),
+    ]
+
+
+def test_changed_fields_only_for_documents_whose_content_differs():
+    reference = documents("a", "b", "c")
+    compared = documents("a", "b", "c", b=1)
+    compared[0]["_rev"] = "2"
+    compared[2]["added"] = True
+    assert changes(reference, compared) == [("b", True, True, ["value"]), ("c", True, True, ["added"])]
+
+
+def test_removed_attribute_is_updated_to_none():
+    reference = documents("a")
+    compared = [{k: v for k, v in reference[0].items() if k != "value"}]
+    [action] = DocumentDiff("c", reference, compared).actions()
+    assert action.type == ActionType.DOCUMENT_UPDATE
+    assert action.data == {"id": "c/a", "value": {"value": None}}
+
+
+def test_keys_that_collate_differently_are_joined():
+    keys = sorted(["Banana", "apple", "a-b", "ab", "A", "a"], key=key_order)
+    reference = documents(*keys)
+    compared = documents(*[k for k in keys if k != "ab"], apple=1)
+    assert changes(reference, compared) == [("ab", True, False, []), ("apple", True, True, ["value"])]
+
+
+def test_code_point_order_is_rejected():
+    with pytest.raises(Exception, match="not sorted by _key"):
+        changes(documents("Banana", "apple"), [])
+
+
+def test_unsorted_input_fails():
+    with pytest.raises(Exception, match="not sorted by _key"):
+        changes([], documents("b", "a"))
+
+
+def test_duplicate_keys_fail():
+    with pytest.raises(Exception, match="not sorted by _key"):
+        changes(documents("a", "a"), [])
@@ -0,0 +1,117 @@
+import gzip
+import io
+import json
+import os
+
+import pytest
+
+from arangodb.dump_client import IndexFile
+from diff.document_diff import key_order
+from dump_io import DumpWriter, _iter_json_array, dump_file_extension, index_path, iter_dump_documents, open_dump_reader, read_dump_document
+
+DOCUMENTS = [{"_key": key, "text": f'{key} ü, [x] "y"', "nested": {"list": [1, 2.5, None]}} for key in ["a", "A", "a-b", "ab", "B"]]
+
+
+def parse(content: str, chunk_size: int) -> list:
+    return list(_iter_json_array(io.BytesIO(content.encode()), chunk_size))
+
+
+def read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        content = f.read()
+    return gzip.decompress(content) if path.endswith(".gz") else content
+
+
+@pytest.mark.parametrize(("file_format", "compress"), [("json", "none"), ("jsonl", "none"), ("json", "gzip"), ("jsonl", "gzip")])
+def test_written_documents_are_read_back(tmp_path, file_format, compress):
+    path = str(tmp_path / f"c{dump_file_extension(file_format, compress)}")
+    with DumpWriter(path, file_format, compress, buffer_size=16) as writer:
+        writer.write_all(DOCUMENTS)
+
+    content = read(path)
+    if file_format == "json":
+        assert json.loads(content) == DOCUMENTS
+    else:
+        assert [json.loads(line) for line in content.splitlines()] == DOCUMENTS
+    assert writer.documents_count == len(DOCUMENTS)
+
+
+@pytest.mark.parametrize("file_format", ["json", "jsonl"])
+def test_empty_dump(tmp_path, file_format):
+    path = str(tmp_path / f"c.{file_format}")
+    with DumpWriter(path, file_format):
+        pass
+    assert read(path) == (b"[]" if file_format == "json" else b"")
+
+
+def test_failed_write_leaves_no_files(tmp_path):
+    path = str(tmp_path / "c.json")
+    with pytest.raises(RuntimeError), DumpWriter(path, index=True) as writer:
+        writer.write(DOCUMENTS[0])
+        raise RuntimeError("cursor failed")
+    assert os.listdir(tmp_path) == []
+
+
+def test_unsupported_format_fails(tmp_path):
+    with pytest.raises(Exception, match="Unsupported dump format"):
+        DumpWriter(str(tmp_path / "c.csv"), "csv")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 4096])
+def test_json_array_is_parsed_across_chunks(chunk_size):
+    content = json.dumps(DOCUMENTS, ensure_ascii=False, indent=1)
+    assert parse(content, chunk_size) == DOCUMENTS
+
+
+def test_empty_json_array():
+    assert parse(" [ ] ", 1) == []
+
+
+@pytest.mark.parametrize("content", ["[", '[{"a": 1}', '[{"a": 1},', '[{"a": 1} {"b": 2}]', '{"a": 1}'])
+def test_malformed_json_array_fails(content):
+    with pytest.raises(Exception, match="dump file"):
+        parse(content, 3)
+
+
+@pytest.mark.parametrize(("file_format", "compress"), [("json", "none"), ("jsonl", "none"), ("json", "gzip"), ("jsonl", "gzip")])
+def test_written_documents_are_read_back_by_offset(tmp_path, file_format, compress):
+    path = str(tmp_path / f"c{dump_file_extension(file_format, compress)}")
+    with DumpWriter(path, file_format, compress, index=True) as writer:
+        writer.write_all(DOCUMENTS)
+
+    assert list(iter_dump_documents(path, buffer_size=16)) == DOCUMENTS
+    index = IndexFile(index_path(path))
+    try:
+        with open_dump_reader(path) as f:
+            assert [read_dump_document(f, entry[2], entry[3]) for entry in index] == DOCUMENTS
+    finally:
+        index.close()
+
+
+def test_index_file_finds_keys_in_the_server_order(tmp_path):
+    keys = sorted(["a", "A", "a-b", "a.b", "ab", "apple", "B", "Banana", "_x", "10", "9"], key=key_order)
+    path = str(tmp_path / "c.jsonl")
+    with DumpWriter(path, "jsonl", index=True) as writer:
+        writer.write_all({"_key": key} for key in keys)
+
+    index = IndexFile(index_path(path))
+    try:
+        assert [index.find(key)[0] for key in keys] == keys
+        assert index.find("b") is None
+        assert index.find("zzz") is None
+        assert index.find("") is None
+    finally:
+        index.close()
+
+
+def test_index_file_of_an_empty_dump(tmp_path):
+    path = str(tmp_path / "c.jsonl")
+    with DumpWriter(path, "jsonl", index=True):
+        pass
+
+    index = IndexFile(index_path(path))
+    try:
+        assert index.find("a") is None
+        assert list(index) == []
+    finally:
+        index.close()
@@ -0,0 +1,48 @@
+import os
+import random
+
+from diff.document_diff import DocumentDiff, key_order
+from diff.external_diff import ExternalDiff
+
+
+def documents(keys: list[str], **values) -> list[dict]:
+    return [{"_key": key, "_id": f"c/{key}", "value": values.get(key, 0)} for key in keys]
+
+
+def changes(diff) -> list[tuple[str, bool, bool, list[str]]]:
+    return [(c.key, c.reference is not None, c.compared is not None, c.fields) for c in diff.changes()]
+
+
+def test_empty_sides(tmp_path):
+    assert changes(ExternalDiff("c", [], [], spill_dir=str(tmp_path))) == []
+    assert changes(ExternalDiff("c", [], documents(["a"]), spill_dir=str(tmp_path))) == [("a", False, True, [])]
+    assert changes(ExternalDiff("c", documents(["a"]), [], spill_dir=str(tmp_path))) == [("a", True, False, [])]
+    assert os.listdir(tmp_path) == []
+
+
+def test_all_deleted(tmp_path):
+    diff = ExternalDiff("c", documents(["b", "a", "c"]), [], spill_dir=str(tmp_path))
+    assert changes(diff) == [("a", True, False, []), ("b", True, False, []), ("c", True, False, [])]
+
+
+def test_unordered_input_spilled_in_many_runs_matches_the_in_memory_diff(tmp_path):
+    rnd = random.Random(1)
+    keys = sorted({"".join(rnd.choice("abAB09_-.") for _ in range(rnd.randint(1, 5))) for _ in range(2000)}, key=key_order)
+    reference = documents(keys)
+    compared = documents([k for i, k in enumerate(keys) if i % 7] + ["new"], **{k: 1 for k in keys[::11]})
+
+    expected = changes(DocumentDiff("c", reference, sorted(compared, key=lambda d: key_order(d["_key"]))))
+    rnd.shuffle(reference)
+    rnd.shuffle(compared)
+    external = ExternalDiff("c", reference, compared, max_memory=2000, spill_dir=str(tmp_path))
+
+    assert changes(external) == expected
+    assert os.listdir(tmp_path) == []
+
+
+def test_spill_files_are_removed_when_reading_stops_early(tmp_path):
+    diff = ExternalDiff("c", documents(["a", "b", "c"]), [], max_memory=1, spill_dir=str(tmp_path))
+    changes_iterator = diff.changes()
+    next(changes_iterator)
+    changes_iterator.close()
+    assert os.listdir(tmp_path) == []
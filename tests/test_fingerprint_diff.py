@@ -0,0 +1,62 @@
+import pytest
+
+from diff.document_diff import document_hash, key_order
+from diff.fingerprint_diff import FingerprintDiff
+
+
+def collection(*keys: str, **values) -> dict[str, dict]:
+    return {key: {"_key": key, "_id": f"c/{key}", "value": values.get(key, 0)} for key in keys}
+
+
+def fingerprints(documents: dict[str, dict]) -> list[tuple[str, str]]:
+    return [(key, document_hash(documents[key])) for key in sorted(documents, key=key_order)]
+
+
+def diff(reference: dict[str, dict], compared: dict[str, dict], fetched: list | None = None, **kwargs) -> FingerprintDiff:
+    def fetch(documents: dict[str, dict]):
+        def fetch_keys(keys: list[str]) -> dict[str, dict]:
+            if fetched is not None:
+                fetched.append(list(keys))
+            return {k: documents[k] for k in keys if k in documents}
+
+        return fetch_keys
+
+    return FingerprintDiff("c", fingerprints(reference), fingerprints(compared), fetch(reference), fetch(compared), **kwargs)
+
+
+def changes(reference: dict[str, dict], compared: dict[str, dict], **kwargs) -> list[tuple[str, bool, bool, list[str]]]:
+    return [(c.key, c.reference is not None, c.compared is not None, c.fields) for c in diff(reference, compared, **kwargs).changes()]
+
+
+def test_empty_sides():
+    assert changes({}, {}) == []
+    assert changes({}, collection("a")) == [("a", False, True, [])]
+    assert changes(collection("a"), {}) == [("a", True, False, [])]
+
+
+def test_all_deleted():
+    assert changes(collection("a", "b", "c"), {}) == [("a", True, False, []), ("b", True, False, []), ("c", True, False, [])]
+
+
+def test_only_differing_keys_are_fetched():
+    fetched = []
+    reference = collection("a", "b", "c", "d")
+    compared = collection("a", "b", "c", "e", c=1)
+    assert changes(reference, compared, fetched=fetched, fetch_batch=2) == [
+        ("c", True, True, ["value"]),
+        ("d", True, False, []),
+        ("e", False, True, []),
+    ]
+    assert fetched == [["c", "d"], ["c"], [], ["e"]]
+
+
+def test_keys_that_collate_differently_are_joined():
+    reference = collection("a", "A", "a-b", "ab", "apple", "Banana")
+    compared = collection("a", "A", "a-b", "apple", "Banana", "banana", A=1)
+    assert changes(reference, compared) == [("A", True, True, ["value"]), ("ab", True, False, []), ("banana", False, True, [])]
+
+
+def test_unsorted_input_fails():
+    reversed_fingerprints = list(reversed(fingerprints(collection("a", "b"))))
+    with pytest.raises(Exception, match="not sorted by _key"):
+        list(FingerprintDiff("c", reversed_fingerprints, [], dict, dict).changes())
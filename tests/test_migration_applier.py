@@ -0,0 +1,103 @@
+from itertools import islice
+
+import pytest
+
+from migration.action import Action, ActionType
+from migration.migration_applier import MIGRATIONS_COLLECTION, MigrationApplier, checkpoint_key
+
+
+class MemoryClient:
+    """The part of `ArangoClient` the applier uses, over dicts. Fails the import after `fail_after` documents."""
+
+    def __init__(self, fail_after: int | None = None):
+        self.collections: dict[str, dict[str, dict]] = {}
+        self.fail_after = fail_after
+        self.imported = 0
+
+    def create_collection(self, collection_name: str, collection_type: str = "document") -> bool:
+        if collection_name in self.collections:
+            return False
+        self.collections[collection_name] = {}
+        return True
+
+    def delete_collection(self, collection_name: str) -> bool:
+        return self.collections.pop(collection_name, None) is not None
+
+    def import_documents(self, collection_name: str, documents: list[dict], on_duplicate: str = "error") -> dict:
+        for document in documents:
+            if self.fail_after is not None and self.imported >= self.fail_after:
+                raise ConnectionError("connection lost")
+            self.collections[collection_name][document["_key"]] = document
+            self.imported += 1
+        return {}
+
+    def update_documents(self, collection_name: str, documents: list[dict]) -> None:
+        for document in documents:
+            self.collections[collection_name][document["_key"]].update(document)
+
+    def delete_documents(self, collection_name: str, keys: list[str]) -> None:
+        for key in keys:
+            self.collections[collection_name].pop(key, None)
+
+    def get_document(self, collection_name: str, key: str) -> dict | None:
+        return self.collections.get(collection_name, {}).get(key)
+
+    def save_document(self, collection_name: str, document: dict) -> None:
+        self.collections[collection_name][document["_key"]] = document
+
+
+def actions() -> list[Action]:
+    return [
+        Action(ActionType.COLLECTION_CREATE, {"value": {"name": "c", "type": "document"}}, "c"),
+        *(Action(ActionType.DOCUMENT_CREATE, {"value": {"_key": str(i), "_id": f"c/{i}", "value": i}}, "c") for i in range(10)),
+        Action(ActionType.DOCUMENT_UPDATE, {"id": "c/3", "value": {"value": -3}}, "c"),
+        Action(ActionType.DOCUMENT_DELETE, {"value": {"_key": "4"}}, "c"),
+    ]
+
+
+def test_actions_are_applied_in_batches():
+    client = MemoryClient()
+    applier = MigrationApplier(client, "m", "f", batch_size=3, jobs=2)
+    applied = []
+
+    assert applier.checkpoint() is None
+    assert applier.apply(actions(), len(actions()), on_actions_applied=applied.append) == len(actions())
+    assert sum(applied) == len(actions())
+    assert client.collections["c"]["3"]["value"] == -3
+    assert "4" not in client.collections["c"]
+    assert len(client.collections["c"]) == 9
+    assert applier.checkpoint()["finished"]
+
+
+def test_interrupted_migration_resumes_after_the_checkpoint():
+    client = MemoryClient(fail_after=5)
+    interrupted = MigrationApplier(client, "m", "f", batch_size=2)
+    assert interrupted.checkpoint() is None
+    with pytest.raises(ConnectionError):
+        interrupted.apply(actions(), len(actions()))
+
+    checkpoint = client.get_document(MIGRATIONS_COLLECTION, checkpoint_key("m"))
+    assert 0 < checkpoint["applied"] < len(actions())
+    assert not checkpoint["finished"]
+
+    client.fail_after = None
+    applier = MigrationApplier(client, "m", "f", batch_size=2)
+    applied = applier.checkpoint()["applied"]
+    assert applier.apply(islice(actions(), applied, None), len(actions()), applied) == len(actions())
+
+    assert sorted(client.collections["c"]) == ["0", "1", "2", "3", "5", "6", "7", "8", "9"]
+    assert client.collections["c"]["3"]["value"] == -3
+    assert applier.checkpoint()["finished"]
+
+
+def test_checkpoint_of_other_actions_is_not_resumed():
+    client = MemoryClient()
+    applier = MigrationApplier(client, "m", "f")
+    applier.checkpoint()
+    applier.apply(actions(), len(actions()))
+    with pytest.raises(Exception, match="applied from other actions"):
+        MigrationApplier(client, "m", "other").checkpoint()
+
+
+def test_checkpoint_key_is_a_valid_key():
+    assert checkpoint_key("2024-01-01 init/users.jsonl") == "2024-01-01_init_users.jsonl"
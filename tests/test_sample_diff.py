@@ -0,0 +1,60 @@
+import pytest
+
+from diff.sample_diff import SampleEstimate, SampleSize, in_sample, sample_threshold, wilson_interval
+
+
+@pytest.mark.parametrize(
+    ("value", "rate", "count"),
+    [("0.01", 0.01, None), ("1%", 0.01, None), (".5", 0.5, None), ("100%", 1.0, None), ("1", None, 1), (" 10000 ", None, 10000)],
+)
+def test_sample_size_is_parsed(value, rate, count):
+    sample = SampleSize.parse(value)
+    assert (sample.rate, sample.count) == (rate, count)
+
+
+@pytest.mark.parametrize("value", ["0", "0%", "0.0", "1.5", "101%", "abc", "-1", "1e-3", ""])
+def test_invalid_sample_size_fails(value):
+    with pytest.raises(ValueError):
+        SampleSize.parse(value)
+
+
+def test_sample_of_documents_is_a_share_of_the_collection():
+    assert SampleSize(count=100).rate_of(1000) == 0.1
+    assert SampleSize(count=100).rate_of(50) == 1.0
+    assert SampleSize(rate=0.2).rate_of(1000) == 0.2
+
+
+def test_whole_collection_has_no_threshold():
+    assert sample_threshold(1.0) is None
+    assert in_sample("any", 0, None)
+
+
+def test_sample_holds_about_its_share_of_the_keys():
+    threshold = sample_threshold(0.1)
+    sampled = sum(in_sample(str(i), 7, threshold) for i in range(20000))
+    assert 1800 < sampled < 2200
+
+
+def test_smallest_rate_keeps_a_threshold():
+    assert sample_threshold(1e-12) == "00000001"
+
+
+def test_wilson_interval_contains_the_share():
+    low, high = wilson_interval(15, 100)
+    assert low < 0.15 < high
+    assert low == pytest.approx(0.0931, abs=1e-3)
+    assert high == pytest.approx(0.2328, abs=1e-3)
+
+
+def test_wilson_interval_stays_within_bounds():
+    assert wilson_interval(0, 10)[0] == 0.0
+    assert wilson_interval(10, 10)[1] == 1.0
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+
+
+def test_estimate_scales_the_bounds_to_the_collection():
+    estimate = SampleEstimate("c", 10000, 100, 15, ["a"])
+    assert estimate.drift_rate == 0.15
+    fewest, most = estimate.estimated_documents
+    assert fewest <= 1500 <= most
+    assert SampleEstimate("c", 0, 0, 0, []).drift_rate == 0.0
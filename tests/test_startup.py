@@ -0,0 +1,29 @@
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.startup import ROOT, heavy_modules
+
+# Runs the command line in a fresh interpreter and prints the modules it imported, one per line, to stderr.
+SCRIPT = """
+import sys
+import cli
+try:
+    cli.cli(sys.argv[1:], standalone_mode=False)
+except SystemExit:
+    pass
+sys.stderr.write("\\n".join(sys.modules))
+"""
+
+
+def imported_modules(*args: str) -> set[str]:
+    result = subprocess.run([sys.executable, "-c", SCRIPT, *args], cwd=ROOT, capture_output=True, text=True, check=True)
+    return set(result.stderr.splitlines())
+
+
+@pytest.mark.parametrize("args", [(), ("--help",), ("compare", "--help"), ("make-migrations", "--help"), ("dump", "--help")])
+def test_cli_help_loads_no_heavy_modules(args):
+    modules = imported_modules(*args)
+    assert "cli" in modules
+    assert heavy_modules(modules) == []